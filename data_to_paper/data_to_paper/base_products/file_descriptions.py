@@ -1,9 +1,9 @@
 from __future__ import annotations
 
+import io
 import os
-import shutil
-import zipfile
 from dataclasses import dataclass, field
+from functools import lru_cache
 from pathlib import Path
 from typing import Optional, List, Union
 
@@ -12,12 +12,66 @@ import pandas as pd
 from data_to_paper.code_and_output_files.file_view_params import ContentView
 from data_to_paper.env import FOLDER_FOR_RUN
 from data_to_paper.latex.clean_latex import wrap_as_latex_code_output
+from data_to_paper.run_gpt_code.data_staging import stage_file, stage_zip_archive
 from data_to_paper.utils.file_utils import run_in_directory, clear_directory
 from data_to_paper.utils.mutable import Mutable
 from data_to_paper.code_and_output_files.referencable_text import NumericReferenceableText, \
     hypertarget_if_referencable_text
 
 TEXT_EXTS = ['.txt', '.md', '.csv', '.xls', '.xlsx']
+EXCEL_EXTS = ['.xlsx', '.xls']
+
+# Text-file previews read at most this many bytes, so that files with very long lines are not read in full:
+MAX_PREVIEW_BYTES = 1_000_000
+
+
+def _get_excel_preview(file_path: str, num_lines: int) -> str:
+    # `nrows` lets the excel readers stop after the first rows of each sheet, rather than parse the whole workbook:
+    df = pd.read_excel(file_path, sheet_name=None, nrows=num_lines)
+    s = f'This is an Excel file with {len(df)} sheets. Here is the first few rows for each sheet:\n\n'
+    for sheet_name in df.keys():
+        s += f'### Sheet: "{sheet_name}"\n'
+        s += f'```output\n{df[sheet_name].head(num_lines).to_string(index=False)}\n```\n'
+    s += '\n'
+    return s
+
+
+def _get_text_preview(file_path: str, num_lines: int) -> str:
+    with open(file_path, 'rb') as f:
+        chunk = f.read(MAX_PREVIEW_BYTES)
+        is_truncated = f.read(1) != b''
+    head = []
+    with io.TextIOWrapper(io.BytesIO(chunk)) as f:
+        for _ in range(num_lines):
+            try:
+                line = next(f)
+            except StopIteration:
+                break
+            except UnicodeDecodeError:
+                line = 'UnicodeDecodeError\n'
+            if is_truncated and not line.endswith('\n'):
+                line += ' ...\n'
+            head.append(line)
+    return f'Here are the first few lines of the file:\n' \
+           f'```output\n{"".join(head)}\n```\n'
+
+
+@lru_cache(maxsize=256)
+def _get_file_preview(file_path: str, num_lines: int, size: int, mtime_ns: int) -> str:
+    if Path(file_path).suffix in EXCEL_EXTS:
+        return _get_excel_preview(file_path, num_lines)
+    return _get_text_preview(file_path, num_lines)
+
+
+def get_file_preview(file_path: Union[str, Path], num_lines: int = 4) -> str:
+    """
+    Return a preview of the first `num_lines` rows of the file (of each sheet, for excel files).
+    Previews are cached by the file's path, size and modification time, so that repeated rendering of the
+    data file descriptions does not re-read the files.
+    """
+    file_path = os.path.abspath(file_path)
+    stat = os.stat(file_path)
+    return _get_file_preview(file_path, num_lines, stat.st_size, stat.st_mtime_ns)
 
 
 @dataclass(frozen=True)
@@ -37,33 +91,13 @@ class DataFileDescription:
         return Path(self.file_path).suffix not in TEXT_EXTS
 
     def is_excel(self):
-        return Path(self.file_path).suffix in ['.xlsx', '.xls']
+        return Path(self.file_path).suffix in EXCEL_EXTS
 
     def get_file_header(self, num_lines: int = 4):
         """
         Return the first `num_lines` lines of the file (if they exist).
         """
-        if self.is_excel():
-            # go over all sheets and return all of them:
-            df = pd.read_excel(self.file_path, sheet_name=None)
-            s = f'This is an Excel file with {len(df)} sheets. Here is the first few rows for each sheet:\n\n'
-            for sheet_name in df.keys():
-                s += f'### Sheet: "{sheet_name}"\n'
-                s += f'```output\n{df[sheet_name].head(num_lines).to_string(index=False)}\n```\n'
-            s += '\n'
-            return s
-
-        with open(self.file_path) as f:
-            head = []
-            for _ in range(num_lines):
-                try:
-                    head.append(next(f))
-                except StopIteration:
-                    break
-                except UnicodeDecodeError:
-                    head.append('UnicodeDecodeError\n')
-            return f'Here are the first few lines of the file:\n' \
-                   f'```output\n{"".join(head)}\n```\n'
+        return get_file_preview(self.file_path, num_lines)
 
     def pretty_repr(self, num_lines: int = 4, content_view: ContentView = None, file_num: Optional[int] = None) -> str:
         if file_num is not None:
@@ -240,12 +274,11 @@ class CreateDataFileDescriptions:
             data_file_path = self._convert_data_file_path_str_to_path(data_file_str_path)
             data_file_path_zip = data_file_path.with_name(data_file_path.name + '.zip')
             if os.path.exists(data_file_path):
-                # copy file to data folder
-                shutil.copyfile(data_file_path, self.temp_folder_to_run_in / data_file_path.name)
+                # stage file in data folder (link, rather than copy, where possible)
+                stage_file(data_file_path, self.temp_folder_to_run_in / data_file_path.name)
             elif os.path.exists(data_file_path_zip):
-                # unzip file to data folder
-                with zipfile.ZipFile(data_file_path_zip, 'r') as zip_ref:
-                    zip_ref.extractall(self.temp_folder_to_run_in)
+                # unzip file to data folder (extracted once per archive content)
+                stage_zip_archive(data_file_path_zip, self.temp_folder_to_run_in)
             else:
                 raise FileNotFoundError(f"File {data_file_path.name} or {data_file_path.name}.zip "
                                         f"not found in {data_file_path.parent}")
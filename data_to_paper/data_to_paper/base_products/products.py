@@ -1,5 +1,5 @@
 from dataclasses import dataclass
-from typing import NamedTuple, Union, Callable, Tuple, Dict, List, Any
+from typing import NamedTuple, Union, Callable, Tuple, Dict, List, Any, Optional
 
 from data_to_paper.base_products.product import Product
 from data_to_paper.conversation.stage import Stage
@@ -23,6 +23,7 @@ class NameDescriptionStageGenerator(NamedTuple):
 class ProductGenerator(NamedTuple):
     product: Union[Product, Callable]
     kwargs: Union[Dict[str, Any], Callable]
+    stage: Union[Stage, Callable, None] = None  # the stage creating the product (see `get_producing_stage`)
 
 
 UnifiedProduct = Union[NameDescriptionStage, Product]
@@ -78,6 +79,21 @@ class Products:
         """
         return self._get_name_description_stage(product_field).stage
 
+    def get_producing_stage(self, product_field: str) -> Optional[Stage]:
+        """
+        Return the stage that creates the given product.
+        Unlike `get_stage`, the product does not need to be available (used for scheduling stages ahead of time).
+        Return None if the product is not created by any known stage.
+        """
+        unified_product_generator, args = self._get_unified_product_generator_and_args(product_field)
+        stage = unified_product_generator.stage
+        try:
+            if stage is not None and not isinstance(stage, Stage):
+                stage = stage(*args)
+        except (KeyError, AttributeError):
+            return None
+        return stage
+
     @staticmethod
     def extract_subfields(field: str) -> List[str]:
         """
@@ -100,7 +116,7 @@ class Products:
                 variables = (variables, )
             return NameDescriptionStage(name, description, stage), variables
         elif isinstance(unified_product_generator, ProductGenerator):
-            product, kwargs = unified_product_generator
+            product, kwargs, _ = unified_product_generator
             if not isinstance(product, Product):
                 product = product(*args)
             if not isinstance(product, Product):
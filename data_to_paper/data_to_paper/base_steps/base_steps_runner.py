@@ -2,25 +2,32 @@ import glob
 import json
 import os
 import shutil
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from contextlib import nullcontext
 from dataclasses import dataclass, field
 
 from pathlib import Path
-from typing import Union, Type, Optional, Dict, Callable
+from typing import Union, Type, Optional, Dict, Callable, List, Set, Collection
 
 from data_to_paper.base_products.file_descriptions import CreateDataFileDescriptions
-from data_to_paper.env import FOLDER_FOR_RUN
+from data_to_paper.env import FOLDER_FOR_RUN, MAX_CONCURRENT_STAGES, LATEX_TO_HTML_CACHE_FOLDER
 from data_to_paper.interactive.base_app_startup import BaseStartDialog
 from data_to_paper.servers.api_cost import StageToCost
 from data_to_paper.utils.file_utils import clear_directory
-from data_to_paper.utils.print_to_file import print_and_log, console_log_file_context
+from data_to_paper.utils.highlighted_text import RENDER_CACHE
+from data_to_paper.utils.print_to_file import print_and_log, console_log_file_context, flush_console_log
 from data_to_paper.servers.llm_call import OPENAI_SERVER_CALLER, OpenaiServerCaller
 from data_to_paper.servers.crossref import CROSSREF_SERVER_CALLER
 from data_to_paper.servers.semantic_scholar import SEMANTIC_SCHOLAR_SERVER_CALLER
+from data_to_paper.servers.records_journal import RecordsJournal
 from data_to_paper.conversation.stage import Stage, get_all_keys_following_stage
 from data_to_paper.conversation.actions_and_conversations import ActionsAndConversations
 from data_to_paper.exceptions import TerminateException, ResetStepException
 from data_to_paper.base_products import DataFileDescriptions
 from data_to_paper.run_gpt_code.code_runner import RUN_CACHE_FILEPATH
+from data_to_paper.run_gpt_code.run_cache_store import RunCacheStore
 from data_to_paper.utils import dedent_triple_quote_str
 from data_to_paper.utils.replacer import Replacer
 
@@ -29,16 +36,154 @@ from data_to_paper.interactive.app_interactor import AppInteractor
 from data_to_paper.interactive import PanelNames, BaseApp
 
 
+def get_stages_to_dependencies(stages: List[Stage],
+                               stages_to_background_product_fields: Dict[Stage, Optional[Collection[str]]],
+                               get_producing_stage: Callable[[str], Optional[Stage]]) -> Dict[Stage, Set[Stage]]:
+    """
+    Derive the dependency graph of the stages from the product fields that each stage reads.
+
+    A stage depends on the earlier stages that create the products it reads.
+    A stage reading a product that is created by a later stage (namely, a product that is not yet available to it,
+    or is available in an earlier version) is a dependency of that later stage.
+    A stage whose product fields are not declared (None) runs alone: it depends on all the earlier stages, and all
+    the later stages depend on it. Stages that may redirect the run to another stage should be declared this way.
+    """
+    stages_to_dependencies = {stage: set() for stage in stages}
+    for index, stage in enumerate(stages):
+        product_fields = stages_to_background_product_fields.get(stage)
+        if product_fields is None:
+            stages_to_dependencies[stage].update(stages[:index])
+            for later_stage in stages[index + 1:]:
+                stages_to_dependencies[later_stage].add(stage)
+            continue
+        for product_field in product_fields:
+            producing_stage = get_producing_stage(product_field)
+            if producing_stage is None or producing_stage == stage or producing_stage not in stages_to_dependencies:
+                continue
+            if producing_stage < stage:
+                stages_to_dependencies[stage].add(producing_stage)
+            else:
+                stages_to_dependencies[producing_stage].add(stage)
+    return stages_to_dependencies
+
+
+@dataclass
+class StagesScheduler:
+    """
+    Run the stages, concurrently where allowed by their dependencies (see `get_stages_to_dependencies`).
+
+    Stages whose dependencies are done are started in the order of the stages, up to `max_workers` at a time.
+    Each stage returns the next stage to run:
+        `None` to continue with the following stages.
+        A stage, to redirect the run to this stage (the stages before it are considered done; the stage itself and
+        the stages after it are run again).
+        `True` to complete the run.
+    Upon a redirect or an exception, no new stages are started, and the running stages are allowed to finish.
+
+    The run time of each stage is kept, for reporting the speedup (see `get_speedup_report`).
+    """
+    stages_to_dependencies: Dict[Stage, Set[Stage]]
+    run_stage: Callable[[Stage], Union[Stage, bool, None]]
+    max_workers: int = 1
+
+    stages_to_run_times: Dict[Stage, float] = field(default_factory=dict)
+    run_time: float = 0.
+
+    def _run_stage_and_time_it(self, stage: Stage) -> Union[Stage, bool, None]:
+        start_time = time.perf_counter()
+        try:
+            return self.run_stage(stage)
+        finally:
+            self.stages_to_run_times[stage] = \
+                self.stages_to_run_times.get(stage, 0.) + time.perf_counter() - start_time
+
+    def _start_stage(self, executor: Optional[ThreadPoolExecutor], stage: Stage) -> Future:
+        if executor is not None:
+            return executor.submit(self._run_stage_and_time_it, stage)
+        # A single worker runs the stage in the calling thread:
+        future = Future()
+        try:
+            future.set_result(self._run_stage_and_time_it(stage))
+        except Exception as e:
+            future.set_exception(e)
+        return future
+
+    def _run_from_stage(self, first_stage: Stage) -> Union[Stage, bool]:
+        """
+        Run the stages from the given stage.
+        Return the stage to redirect the run to, or True if the run is completed.
+        """
+        done = {stage for stage in self.stages_to_dependencies if stage < first_stage}
+        pending = [stage for stage in self.stages_to_dependencies if stage >= first_stage]
+        running: Dict[Future, Stage] = {}
+        next_stage = None
+        exception = None
+        executor = ThreadPoolExecutor(max_workers=self.max_workers) if self.max_workers > 1 else None
+        with executor or nullcontext():
+            while True:
+                if next_stage is None and exception is None:
+                    for stage in list(pending):
+                        if len(running) < self.max_workers and self.stages_to_dependencies[stage] <= done:
+                            pending.remove(stage)
+                            running[self._start_stage(executor, stage)] = stage
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in sorted(finished, key=lambda f: running[f]):
+                    stage = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        exception = exception or e
+                        continue
+                    done.add(stage)
+                    if result is not None and next_stage is None:
+                        next_stage = result
+        if exception is not None:
+            raise exception
+        return True if next_stage is None else next_stage
+
+    def run(self, first_stage: Stage):
+        start_time = time.perf_counter()
+        try:
+            next_stage = first_stage
+            while next_stage is not True:
+                next_stage = self._run_from_stage(next_stage)
+        finally:
+            self.run_time += time.perf_counter() - start_time
+
+    def get_critical_path_time(self) -> float:
+        """
+        Return the run time of the longest chain of dependent stages (the shortest possible run time).
+        """
+        stages_to_finish_times = {}
+        for stage, dependencies in self.stages_to_dependencies.items():  # dependencies precede their stages
+            if stage in self.stages_to_run_times:
+                stages_to_finish_times[stage] = self.stages_to_run_times[stage] + max(
+                    (stages_to_finish_times.get(dependency, 0.) for dependency in dependencies), default=0.)
+        return max(stages_to_finish_times.values(), default=0.)
+
+    def get_speedup_report(self) -> str:
+        total_stages_time = sum(self.stages_to_run_times.values())
+        critical_path_time = self.get_critical_path_time()
+        return (f'Ran {len(self.stages_to_run_times)} stages in {self.run_time:.1f} sec, '
+                f'with up to {self.max_workers} concurrent stages '
+                f'(total stage time: {total_stages_time:.1f} sec; critical path: {critical_path_time:.1f} sec).\n'
+                f'Speedup: {total_stages_time / max(self.run_time, 1e-9):.2f}x '
+                f'(critical-path bound: {total_stages_time / max(critical_path_time, 1e-9):.2f}x).')
+
+
 @dataclass
 class BaseStepsRunner(ProductsHandler, AppInteractor):
     """
     A base class for running a series of steps whose Products gradually accumulate towards a high level goal.
     """
-    ACTIONS_FILENAME = 'conversation_actions.pkl'
+    ACTIONS_FILENAME = 'conversation_actions.log'
     OPENAI_RESPONSES_FILENAME = 'openai_responses.txt'
     CROSSREF_RESPONSES_FILENAME = 'crossref_responses.bin'
     SEMANTIC_SCHOLAR_RESPONSES_FILENAME = 'semantic_scholar_responses.bin'
     CODE_RUNNER_CACHE_FILENAME = 'code_runner_cache.pkl'
+    LATEX_TO_HTML_CACHE_FOLDERNAME = 'latex_to_html_cache'
     API_USAGE_COST_FILENAME = 'api_usage_cost.json'
 
     PROJECT_PARAMETERS_FILENAME = 'data-to-paper.json'
@@ -65,6 +210,12 @@ class BaseStepsRunner(ProductsHandler, AppInteractor):
     _stages_to_api_usage_cost: StageToCost = field(default_factory=StageToCost)
     stages_to_funcs: Dict[Stage, Callable] = None
 
+    # The product fields that each stage reads, from which we derive which stages can run concurrently.
+    # Stages that are not declared (or declared as None) run alone (see `get_stages_to_dependencies`):
+    stages_to_background_product_fields: Dict[Stage, Optional[Collection[str]]] = None
+    _threads_to_stages: Dict[int, Stage] = field(default_factory=dict)
+    _stages_lock: threading.RLock = field(default_factory=threading.RLock)
+
     server_caller: OpenaiServerCaller = None
 
     failure_message = dedent_triple_quote_str("""
@@ -103,12 +254,14 @@ class BaseStepsRunner(ProductsHandler, AppInteractor):
         """)
 
     def _get_current_stage(self):
-        return self.current_stage
+        # when stages run concurrently, each thread is running its own stage:
+        return self._threads_to_stages.get(threading.get_ident(), self.current_stage)
 
     def advance_stage(self, stage: Union[Stage, bool]):
         """
         Advance the stage.
         """
+        flush_console_log()
         self.current_stage = stage
         self._app_advance_stage(stage=stage)
         if isinstance(stage, Stage):
@@ -152,27 +305,48 @@ class BaseStepsRunner(ProductsHandler, AppInteractor):
     def _pre_run_preparations(self):
         self._update_project_parameters()
 
+    def _get_max_concurrent_stages(self) -> int:
+        # The app shows one stage at a time:
+        return 1 if self.app is not None else max(MAX_CONCURRENT_STAGES.val or 1, 1)
+
+    def _get_stages_to_dependencies(self) -> Dict[Stage, Set[Stage]]:
+        return get_stages_to_dependencies(list(self.stages), self.stages_to_background_product_fields or {},
+                                          self.products.get_producing_stage)
+
     def _run_all_steps(self):
         """
         Run all the steps towards the high level goal.
-        """
-        stage = self.stages.get_first()
-        while True:
+        Stages run concurrently where their dependencies allow (see `stages_to_background_product_fields`).
+        The LLM responses are recorded per stage, so that the run can be replayed regardless of how
+        the calls of concurrent stages were interleaved.
+        """
+        RENDER_CACHE.clear()  # the render cache is shared by runs in the same process; we report this run's stats
+        max_workers = self._get_max_concurrent_stages()
+        scheduler = StagesScheduler(
+            stages_to_dependencies=self._get_stages_to_dependencies(),
+            run_stage=self._run_scheduled_stage,
+            max_workers=max_workers,
+        )
+        scheduler.run(self.stages.get_first())
+        self.advance_stage(True)
+        if max_workers > 1:  # sequential runs have no speedup to report
+            print_and_log(scheduler.get_speedup_report())
+        print_and_log(RENDER_CACHE.get_stats(), should_print=False)
+
+    def _run_scheduled_stage(self, stage: Stage) -> Union[Stage, bool, None]:
+        thread_id = threading.get_ident()
+        with self._stages_lock:
+            self._threads_to_stages[thread_id] = stage
             self.advance_stage(stage)
-            if stage is True:
-                break
-            try:
-                next_stage = self._run_stage(stage)
-            except ResetStepException as e:
-                print_and_log(f'Resetting to stage {e.stage.name}')
-                next_stage = e.stage
-                self.reset_to_stage(next_stage)
-            if next_stage is None:
-                try:
-                    next_stage = stage.get_next()
-                except ValueError:
-                    next_stage = True
-            stage = next_stage
+        try:
+            return self._run_stage(stage)
+        except ResetStepException as e:
+            print_and_log(f'Resetting to stage {e.stage.name}')
+            self.reset_to_stage(e.stage)
+            return e.stage
+        finally:
+            with self._stages_lock:
+                del self._threads_to_stages[thread_id]
 
     def _run_stage(self, stage: Stage) -> Optional[Stage]:
         """
@@ -186,13 +360,22 @@ class BaseStepsRunner(ProductsHandler, AppInteractor):
         """
         Get the files to keep after the run.
         """
+        server_recording_files = [
+            self.OPENAI_RESPONSES_FILENAME,
+            self.CROSSREF_RESPONSES_FILENAME,
+            self.SEMANTIC_SCHOLAR_RESPONSES_FILENAME,
+        ]
+        # keep also the journals of responses that were not yet compacted into the recording files:
+        journal_files = [RecordsJournal.get_journal_file_path(recording_file).name
+                         for recording_file in server_recording_files]
         return [str(self.output_directory / recording_file)
                 for recording_file in [
                     self.CODE_RUNNER_CACHE_FILENAME,
-                    self.OPENAI_RESPONSES_FILENAME,
-                    self.CROSSREF_RESPONSES_FILENAME,
-                    self.SEMANTIC_SCHOLAR_RESPONSES_FILENAME,
+                    RunCacheStore.get_store_directory(self.CODE_RUNNER_CACHE_FILENAME).name,
+                    *server_recording_files,
+                    *journal_files,
                     self.API_USAGE_COST_FILENAME,
+                    self.LATEX_TO_HTML_CACHE_FOLDERNAME,
                 ]]
 
     def _create_or_clean_output_folder(self):
@@ -227,9 +410,12 @@ class BaseStepsRunner(ProductsHandler, AppInteractor):
         self.server_caller = OPENAI_SERVER_CALLER
         self.server_caller.set_current_stage_callback(self._get_current_stage)
         self.server_caller.set_api_cost_callback(self._add_cost_to_stage)
+        # the calls of concurrent stages are interleaved; we replay the responses of each stage separately:
+        self.server_caller.replay_by_key = self._get_max_concurrent_stages() > 1
 
         @RUN_CACHE_FILEPATH.temporary_set(
             self._get_path_in_output_directory(self.CODE_RUNNER_CACHE_FILENAME))
+        @LATEX_TO_HTML_CACHE_FOLDER.temporary_set(self.output_directory / self.LATEX_TO_HTML_CACHE_FOLDERNAME)
         @SEMANTIC_SCHOLAR_SERVER_CALLER.record_or_replay(
             self._get_path_in_output_directory(self.SEMANTIC_SCHOLAR_RESPONSES_FILENAME))
         @OPENAI_SERVER_CALLER.record_or_replay(
@@ -258,12 +444,16 @@ class BaseStepsRunner(ProductsHandler, AppInteractor):
 
         self._create_or_clean_output_folder()
         self._create_temp_folder_to_run_in()
+        actions = self.actions_and_conversations.actions
+        actions.log_to_file(self.output_directory / self.ACTIONS_FILENAME, get_stage=self._get_current_stage)
         with console_log_file_context(self.output_directory / 'console_log.txt'):
             try:
                 run()
             finally:
+                actions.stop_logging()
                 self.server_caller.set_current_stage_callback()
                 self.server_caller.set_api_cost_callback()
+                self.server_caller.replay_by_key = False
                 if self.should_remove_temp_folder:
                     # remove temp folder and all its content:
                     shutil.rmtree(self.temp_folder_to_run_in, ignore_errors=True)
@@ -319,9 +509,10 @@ class BaseStepsRunner(ProductsHandler, AppInteractor):
     """
 
     def _add_cost_to_stage(self, cost: float = 0, stage: Optional[Stage] = None):
-        stage = stage or self.current_stage
-        self._stages_to_api_usage_cost[stage] = self._stages_to_api_usage_cost.get(stage, 0) + cost
-        self._stages_to_api_usage_cost.save_to_json(self.output_directory / self.API_USAGE_COST_FILENAME)
+        stage = stage or self._get_current_stage()
+        with self._stages_lock:
+            self._stages_to_api_usage_cost[stage] = self._stages_to_api_usage_cost.get(stage, 0) + cost
+            self._stages_to_api_usage_cost.save_to_json(self.output_directory / self.API_USAGE_COST_FILENAME)
         self.app_send_api_usage_cost()
 
     def app_send_api_usage_cost(self):
@@ -14,6 +14,7 @@ from data_to_paper.interactive import PanelNames
 from data_to_paper.interactive.app_interactor import AppInteractor
 from data_to_paper.servers.model_engine import ModelEngine
 from data_to_paper.utils.copier import Copier
+from data_to_paper.utils.formatted_sections import is_second_block_started
 from data_to_paper.utils.replacer import StrOrReplacer, format_value
 from data_to_paper.utils.print_to_file import print_and_log_red, print_and_log_magenta
 from data_to_paper.base_cast import Agent
@@ -41,6 +42,9 @@ class Converser(Copier, AppInteractor):
     COPY_ATTRIBUTES = {'actions_and_conversations', 'conversation_name', 'assistant_agent',
                        'user_agent'}
     LLM_PARAMETERS = {}  # default parameters to pass to the LLM. e.g. {'temperature': 0.0, 'max_tokens': 30}
+    STOP_STREAMING_UPON_SECOND_BLOCK = False
+    # if True, the response is stopped once a second triple-backtick block starts (for conversers that expect
+    # a single block, and reject responses with more than one block anyway).
     actions_and_conversations: ActionsAndConversations = None
 
     model_engine: ModelEngine = field(default_factory=lambda: ModelEngine.DEFAULT)
@@ -134,6 +138,13 @@ class Converser(Copier, AppInteractor):
         else:
             print_and_log_red(comment)
 
+    def _should_stop_streaming_response(self, partial_response: str) -> bool:
+        """
+        Return True if the part of the LLM response received so far already determines how we will respond to it
+        (e.g. it is already known to be invalid), so that we can stop receiving, and paying for, the rest.
+        """
+        return self.STOP_STREAMING_UPON_SECOND_BLOCK and is_second_block_started(partial_response)
+
     @_raise_if_reset()
     def apply_get_and_append_assistant_message(self, tag: Optional[StrOrReplacer] = None,
                                                comment: Optional[StrOrReplacer] = None,
@@ -153,7 +164,7 @@ class Converser(Copier, AppInteractor):
                 model_engine=model_engine,
                 expected_tokens_in_response=expected_tokens_in_response,
                 hidden_messages=hidden_messages,
-                **{**self.llm_parameters, **kwargs})
+                **{'stop_streaming_when': self._should_stop_streaming_response, **self.llm_parameters, **kwargs})
             if send_to_app and self.app:
                 self._app_send_prompt(PanelNames.RESPONSE, message.pretty_content(with_header=False, is_html=True),
                                       provided_as_html=True)
@@ -18,6 +18,7 @@ from data_to_paper.run_gpt_code.run_issues import CodeProblem, RunIssue, RunIssu
 from data_to_paper.code_and_output_files.output_file_requirements import BaseContentOutputFileRequirement, \
     OutputFileRequirements
 from data_to_paper.run_gpt_code.code_runner import CodeRunner, BaseCodeRunner
+from data_to_paper.run_gpt_code.code_execution_engine import CODE_EXECUTION_ENGINE
 from data_to_paper.run_gpt_code.code_utils import FailedExtractingBlock, IncompleteBlockFailedExtractingBlock
 from data_to_paper.run_gpt_code.exceptions import FailedRunningCode, UnAllowedFilesCreated, \
     CodeUsesForbiddenFunctions, CodeWriteForbiddenFile, CodeReadForbiddenFile, CodeImportForbiddenModule
@@ -74,6 +75,7 @@ class DebuggerConverser(BackgroundProductsConverser):
     * too long runs (timeout)
     * output file not created
     """
+    STOP_STREAMING_UPON_SECOND_BLOCK = True
 
     # input files:
     data_folder: Path = None
@@ -622,6 +624,7 @@ class DebuggerConverser(BackgroundProductsConverser):
         Otherwise, return the code and output.
         """
         self.initialize_conversation_if_needed()
+        CODE_EXECUTION_ENGINE.prewarm()  # while waiting for the LLM to write the code
         for self.debug_iteration in range(1, self.max_debug_iterations + 1):
             response = self.apply_get_and_append_assistant_message(is_code=True,
                                                                    previous_code=self.previous_code).content
@@ -409,6 +409,7 @@ class QuotedReviewDialogDualConverserGPT(ReviewDialogDualConverserGPT):
     a task towards a certain "goal", and the other is a "reviewer" who provides constructive feedback.
     The performer is expected to return the goal as a triple-backtick block, so that it can be extracted.
     """
+    STOP_STREAMING_UPON_SECOND_BLOCK = True
 
     your_response_should_be_formatted_as: str = 'a triple-backtick block (but send text, not code).'
     mission_prompt: str = ReviewDialogDualConverserGPT.mission_prompt \
@@ -37,6 +37,74 @@ def unite_citation_lists(citations_lists: Iterable[Iterable[Citation]], total: i
     return list(bibtex_ids_to_citations.values())
 
 
+class CitationEmbeddingIndex:
+    """
+    An index of the embeddings of citations, for ranking citations by their similarity to a target embedding.
+
+    The embeddings are normalized and stacked, once, into a float32 matrix (one row per bibtex_id).
+    The similarities of all the citations to a target are then computed with a single matrix-vector product,
+    and are cached per target.
+    """
+
+    def __init__(self, citations: Iterable[Citation]):
+        self.bibtex_ids_to_rows: Dict[str, int] = {}
+        embeddings = []
+        for citation in citations:
+            if citation.embedding is None or citation.bibtex_id in self.bibtex_ids_to_rows:
+                continue
+            self.bibtex_ids_to_rows[citation.bibtex_id] = len(embeddings)
+            embeddings.append(citation.embedding)
+        self.bibtex_ids = list(self.bibtex_ids_to_rows)
+        matrix = np.array(embeddings, dtype=np.float32).reshape(len(embeddings), -1) if embeddings \
+            else np.zeros((0, 0), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.matrix = np.divide(matrix, norms, out=np.zeros_like(matrix), where=norms > 0)
+        self._targets_to_similarities: Dict[bytes, np.ndarray] = {}
+
+    def __len__(self):
+        return len(self.bibtex_ids)
+
+    def get_similarities(self, embedding_target: np.ndarray) -> np.ndarray:
+        """
+        Return the similarity of each row of the index to the target.
+        """
+        key = np.asarray(embedding_target).tobytes()
+        if key not in self._targets_to_similarities:
+            target = np.asarray(embedding_target, dtype=np.float32)
+            norm = np.linalg.norm(target)
+            self._targets_to_similarities[key] = self.matrix @ (target / norm) if norm > 0 and len(self) \
+                else np.zeros(len(self), dtype=np.float32)
+        return self._targets_to_similarities[key]
+
+    def get_citations_similarities(self, citations: Iterable[Citation],
+                                   embedding_target: Optional[np.ndarray]) -> List[float]:
+        """
+        Return the similarities of the citations to the target (0 for citations without embedding).
+        """
+        if embedding_target is None:
+            return [0 for _ in citations]
+        similarities = self.get_similarities(embedding_target)
+        rows = (self.bibtex_ids_to_rows.get(citation.bibtex_id) for citation in citations)
+        return [0 if row is None else float(similarities[row]) for row in rows]
+
+    def get_most_similar_citations(self, citations: List[Citation], embedding_target: np.ndarray,
+                                   total: int) -> List[Citation]:
+        """
+        Return the `total` citations most similar to the target, from the most similar.
+        The order is that of a stable sort by similarity, but only the top `total` citations are sorted.
+        """
+        similarities = -np.array(self.get_citations_similarities(citations, embedding_target))
+        total = min(total, len(citations))
+        if total <= 0:
+            return []
+        # the rows tied with the least similar of the top citations are all candidates, so that ties are
+        # broken by order, as in a stable sort:
+        threshold = np.partition(similarities, total - 1)[total - 1]
+        candidates = np.flatnonzero(similarities <= threshold)
+        rows = candidates[np.argsort(similarities[candidates], kind='stable')][:total]
+        return [citations[row] for row in rows]
+
+
 CITATION_REPR_FIELDS_FOR_LLM = \
     ('bibtex_id', 'title', 'journal_and_year', 'tldr', 'influence')
 CITATION_REPR_FIELDS_FOR_PRINT = \
@@ -129,6 +197,26 @@ class LiteratureSearch(ValueProduct):
     embedding_target: Optional[np.ndarray] = None
     scopes_to_search_params: Dict[str, LiteratureSearchParams] = field(default_factory=dict)
 
+    _embedding_index: Optional[CitationEmbeddingIndex] = field(default=None, init=False, repr=False, compare=False)
+    _embedding_index_signature: Optional[tuple] = field(default=None, init=False, repr=False, compare=False)
+
+    def get_all_citations(self) -> Iterable[Citation]:
+        for queries_to_citations in self.values():
+            for citations in queries_to_citations.values():
+                yield from citations
+
+    def get_embedding_index(self) -> CitationEmbeddingIndex:
+        """
+        Return the embedding index of all the citations, building it only if the citations have changed.
+        """
+        signature = tuple((scope, query, id(citations), len(citations))
+                          for scope, queries_to_citations in self.items()
+                          for query, citations in queries_to_citations.items())
+        if self._embedding_index is None or signature != self._embedding_index_signature:
+            self._embedding_index = CitationEmbeddingIndex(self.get_all_citations())
+            self._embedding_index_signature = signature
+        return self._embedding_index
+
     def get_queries(self, scope: Optional[str] = None) -> List[str]:
         """
         Return the queries in the given scope.
@@ -177,8 +265,12 @@ class LiteratureSearch(ValueProduct):
             citations = [citation for citation in citations if citation.influence >= minimal_influence]
 
         if sort_by_similarity and self.embedding_target is not None:
-            citations = sorted(citations, key=lambda citation: citation.get_embedding_similarity(self.embedding_target),
-                               reverse=True)
+            index = self.get_embedding_index()
+            if total is not None and total >= 0:
+                citations = index.get_most_similar_citations(citations, self.embedding_target, total)
+            else:
+                similarities = index.get_citations_similarities(citations, self.embedding_target)
+                citations = [citations[i] for i in np.argsort(-np.array(similarities), kind='stable')]
         else:
             citations = sorted(citations, key=lambda citation: citation.search_rank)
 
@@ -229,11 +321,14 @@ class LiteratureSearch(ValueProduct):
                                        )
         if GET_LITERATURE_SEARCH_FOR_PRINT:
             style = 'print'
+        fields = CITATION_REPR_FIELDS_FOR_LLM if style == 'llm' else CITATION_REPR_FIELDS_FOR_PRINT
+        similarities = self.get_embedding_index().get_citations_similarities(citations, self.embedding_target) \
+            if 'embedding_similarity' in fields else [None] * len(citations)
         return '\n'.join(citation.pretty_repr(
-            fields=CITATION_REPR_FIELDS_FOR_LLM if style == 'llm' else CITATION_REPR_FIELDS_FOR_PRINT,
+            fields=fields,
             is_html=style == 'html',
-            embedding_target=self.embedding_target,
-        ) for citation in citations)
+            embedding_similarity=similarity,
+        ) for citation, similarity in zip(citations, similarities))
 
     def get_header(self, scope: Optional[str] = None, **kwargs):
         #
@@ -1,7 +1,7 @@
 from dataclasses import dataclass, field
 from typing import Dict, List, Collection, Optional, Any
 
-from data_to_paper.env import PAUSE_AFTER_LITERATURE_SEARCH
+from data_to_paper.env import PAUSE_AFTER_LITERATURE_SEARCH, LITERATURE_SEARCH_MAX_CONCURRENT_QUERIES
 
 from data_to_paper.utils import dedent_triple_quote_str, word_count
 from data_to_paper.utils.nice_list import NiceDict, NiceList
@@ -136,18 +136,25 @@ class BaseLiteratureSearchReviewGPT(PythonDictWithDefinedKeysReviewBackgroundPro
         html = f'<h2>Querying Citations</h2>'
         html += f'<p>Searching "{server_name}" ' \
                 f'for papers related to our study in the following areas:</p>'
+        is_first_html = True  # the html of each query is appended to the panel
         with self._app_temporarily_set_panel_status(PanelNames.FEEDBACK, 'Querying citations...'):
+            # We send all the queries at once (concurrently), and then go over the results in the order of the queries:
+            all_queries = [query for queries in scopes_to_list_of_queries.values() for query in queries]
+            queries_to_all_citations = dict(zip(all_queries, SEMANTIC_SCHOLAR_SERVER_CALLER.get_server_responses(
+                [((query, ), {'rows': self.number_of_papers_per_query}) for query in all_queries],
+                max_workers=LITERATURE_SEARCH_MAX_CONCURRENT_QUERIES.val)))
             for scope, queries in scopes_to_list_of_queries.items():
                 queries_to_citations = {}
                 html += f'<h3>{scope.title()}-related queries:</h3>'
                 for query in queries:
-                    citations = SEMANTIC_SCHOLAR_SERVER_CALLER.get_server_response(query,
-                                                                                   rows=self.number_of_papers_per_query)
+                    citations = queries_to_all_citations[query]
                     num_citations = len(citations)
                     html += f'<p><b style="color: #1E90FF;">Query:</b> "{query}". '
                     html += f'<br><b style="color: #1E90FF;">Found:</b> {num_citations} citations.</p>'
                     self._app_send_prompt(PanelNames.FEEDBACK, html, provided_as_html=True,
-                                          scroll_to_bottom=True)
+                                          scroll_to_bottom=True, append=not is_first_html)
+                    html = ''
+                    is_first_html = False
                     self.comment(f'\nQuerying Semantic Scholar. '
                                  f'Found {num_citations} / {self.number_of_papers_per_query} citations. '
                                  f'Query: "{query}".')
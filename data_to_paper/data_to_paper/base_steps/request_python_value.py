@@ -29,6 +29,7 @@ class PythonValueReviewBackgroundProductsConverser(ReviewBackgroundProductsConve
     A base class for agents requesting the LLM to write a python value (like a list of str, or dict).
     Option for reviewing the sections (set max_reviewing_rounds > 0).
     """
+    STOP_STREAMING_UPON_SECOND_BLOCK = True  # (unless in json_mode)
     value_type: type = None
     rewind_after_getting_a_valid_response: Optional[Rewind] = Rewind.AS_FRESH
     json_mode: bool = False
@@ -56,6 +57,9 @@ class PythonValueReviewBackgroundProductsConverser(ReviewBackgroundProductsConve
     def get_valid_result_as_markdown(self) -> str:
         return wrap_text_with_triple_quotes(self.valid_result, 'python')
 
+    def _should_stop_streaming_response(self, partial_response: str) -> bool:
+        return not self.json_mode and super()._should_stop_streaming_response(partial_response)
+
     def _check_response_and_get_extracted_text(self, response: str) -> str:
         """
         Extracts the string of the python value from LLM response.
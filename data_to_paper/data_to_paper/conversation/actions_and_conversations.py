@@ -9,9 +9,12 @@ The dict of conversations is used to keep track of conversations by name, as the
 
 from __future__ import annotations
 
+import functools
+import os
 import pickle
+import threading
 from pathlib import Path
-from typing import Union, Dict, List, Optional, Set
+from typing import Any, Callable, Union, Dict, List, Optional, Set
 from dataclasses import dataclass, field
 
 from data_to_paper.utils.print_to_file import print_and_log
@@ -74,6 +77,46 @@ class Conversations(Dict[str, Conversation]):
             i += 1
 
 
+class ActionsIndex:
+    """
+    Indices of a list of actions, for O(1) lookups:
+        printed message content -> position of the first action printing it
+        conversation name -> positions of the actions changing its messages
+
+    The indices are updated incrementally with the actions appended since the last update.
+    """
+
+    def __init__(self):
+        self.num_indexed_actions = 0
+        self.printed_contents_to_first_positions: Dict[str, int] = {}
+        self.conversation_names_to_positions: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+
+    def update(self, actions: List[Action]):
+        from .conversation_actions import AppendMessage, ChangeMessagesConversationAction
+        with self._lock:
+            for position in range(self.num_indexed_actions, len(actions)):
+                action = actions[position]
+                if isinstance(action, ChangeMessagesConversationAction):
+                    self.conversation_names_to_positions.setdefault(action.conversation_name, []).append(position)
+                if isinstance(action, AppendMessage) and action.should_print and action.should_add_to_conversation():
+                    self.printed_contents_to_first_positions.setdefault(action.message.content, position)
+            self.num_indexed_actions = len(actions)
+
+
+def _invalidates_index(method):
+    """
+    Decorator for methods that modify the list other than by appending (which the index follows incrementally).
+    """
+
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.__dict__.pop('_index', None)
+        return method(self, *args, **kwargs)
+
+    return wrapper
+
+
 @dataclass(frozen=True)
 class Actions(List[Action]):
     """
@@ -82,13 +125,40 @@ class Actions(List[Action]):
 
     abbreviate_repeated_printed_content: bool = True
 
+    __setitem__ = _invalidates_index(list.__setitem__)
+    __delitem__ = _invalidates_index(list.__delitem__)
+    __imul__ = _invalidates_index(list.__imul__)
+    insert = _invalidates_index(list.insert)
+    pop = _invalidates_index(list.pop)
+    remove = _invalidates_index(list.remove)
+    clear = _invalidates_index(list.clear)
+    sort = _invalidates_index(list.sort)
+    reverse = _invalidates_index(list.reverse)
+
+    def __getstate__(self):
+        # the index is not saved (it is rebuilt upon the first lookup), nor is the log writer:
+        return {key: value for key, value in self.__dict__.items() if key not in ('_index', '_log_writer')}
+
+    def _get_index(self) -> ActionsIndex:
+        index = self.__dict__.get('_index')
+        if index is None:
+            index = self.__dict__['_index'] = ActionsIndex()
+        index.update(self)
+        return index
+
+    def is_content_printed(self, content: str) -> bool:
+        """
+        Return whether a message with the given content was already printed.
+        """
+        return content in self._get_index().printed_contents_to_first_positions
+
     def apply_action(self, action: Action, is_color: bool = True,
                      should_append: bool = True):
         if action.should_print:
             from .conversation_actions import AppendMessage
             if self.abbreviate_repeated_printed_content \
                     and isinstance(action, AppendMessage) \
-                    and action.message.content in self.get_all_message_contents(only_printed=True):
+                    and self.is_content_printed(action.message.content):
                 s = action.pretty_repr(is_color=is_color, abbreviate_content=True)
                 s_bw = action.pretty_repr(is_color=False, abbreviate_content=True)
             else:
@@ -98,31 +168,59 @@ class Actions(List[Action]):
                 print_and_log(s_bw, text_in_color=s, end='\n\n')
         if should_append:
             self.append(action)
+            log_writer = self.__dict__.get('_log_writer')
+            if log_writer is not None:
+                log_writer.append(action)
         action.apply()
 
-    def save_actions_to_file(self, file_path: Union[str, Path]):
+    def log_to_file(self, file_path: Union[str, Path], get_stage: Optional[Callable[[], Any]] = None):
         """
-        Save the primary list of actions to a json file.
+        Append each applied action to an actions log file (see `actions_log`).
+        `get_stage` returns the current stage, which is logged with each action.
         """
-        with open(file_path, 'wb') as f:
-            pickle.dump(self, f)
+        from .actions_log import ActionsLogWriter
+        self.stop_logging()
+        self.__dict__['_log_writer'] = ActionsLogWriter(file_path, get_stage)
 
-    def load_actions_from_file(self, file_path: Union[str, Path]):
+    def stop_logging(self):
+        log_writer = self.__dict__.pop('_log_writer', None)
+        if log_writer is not None:
+            log_writer.close()
+
+    def save_actions_to_file(self, file_path: Union[str, Path]):
+        """
+        Save the primary list of actions to an actions log file (see `actions_log`).
+        """
+        from .actions_log import ActionsLogWriter
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        log_writer = ActionsLogWriter(file_path)
+        try:
+            for action in self:
+                log_writer.append(action)
+        finally:
+            log_writer.close()
+
+    def load_actions_from_file(self, file_path: Union[str, Path], conversations: Optional[Conversations] = None):
         """
-        Load a list of actions from a json file.
+        Load a list of actions from an actions log file, or from a legacy pickle file.
+        Actions loaded from an actions log act on the given conversations.
         """
-        with open(file_path, 'rb') as f:
-            self.clear()
-            self.extend(pickle.load(f))
+        from .actions_log import ActionsLogReader, is_actions_log_file
+        self.clear()
+        if is_actions_log_file(file_path):
+            self.extend(action for _, action in ActionsLogReader(file_path, conversations).iterate_actions())
+        else:
+            with open(file_path, 'rb') as f:
+                self.extend(pickle.load(f))
         return self
 
     def get_actions_for_conversation(self, conversation_name: str) -> List[Action]:
         """
         Return a list of actions that were applied to the conversation with the provided name.
         """
-        from .conversation_actions import ChangeMessagesConversationAction
-        return [action for action in self if
-                isinstance(action, ChangeMessagesConversationAction) and action.conversation_name == conversation_name]
+        return [self[position] for position in
+                self._get_index().conversation_names_to_positions.get(conversation_name, [])]
 
     def get_all_message_contents(self, only_printed: bool = False) -> List[str]:
         """
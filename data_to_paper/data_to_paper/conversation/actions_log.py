@@ -0,0 +1,254 @@
+"""
+A compact, append-only file format for the log of conversation actions.
+
+The file starts with a magic line, followed by frames. Each frame is: kind (1 byte), payload size (4 bytes), payload.
+
+Frame kinds:
+    BODY: body digest + message content (utf-8). Message contents are content-addressed, and are saved once.
+    CONTEXT: context digest + message ids. Message contexts are saved once, as lists of message ids.
+    MESSAGE: message id + the pickled message, with its content and context replaced by their digests.
+    ACTION: the pickled (stage, conversation name, pickled action), with the messages of the action replaced
+        by their ids.
+
+Actions refer to the conversations on which they act; these are not saved. Upon reading, actions are bound to
+the conversations into which they are replayed.
+Frames are only appended, so that logging an action writes only the action and its new messages.
+An incomplete last frame (e.g. due to a crash while writing) is ignored.
+"""
+import hashlib
+import io
+import os
+import pickle
+import struct
+import threading
+from pathlib import Path
+from typing import Any, Callable, Collection, Dict, Iterator, List, Optional, Tuple, Union
+
+from .actions_and_conversations import Action, Conversations
+from .message import Message
+from .stage import Stage
+
+MAGIC = b'data-to-paper actions log v1\n'
+FRAME_HEADER = struct.Struct('<BI')
+DIGEST_SIZE = 16
+MESSAGE_ID = struct.Struct('<I')
+
+BODY, CONTEXT, MESSAGE, ACTION = range(4)
+
+
+def is_actions_log_file(file_path: Union[str, Path]) -> bool:
+    """
+    Return whether the file is an actions log (rather than a legacy pickle of the list of actions).
+    """
+    with open(file_path, 'rb') as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def _get_digest(data: bytes) -> bytes:
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest()
+
+
+def _pack_message_ids(message_ids: List[int]) -> bytes:
+    return struct.pack(f'<{len(message_ids)}I', *message_ids)
+
+
+def _unpack_message_ids(data: bytes) -> Tuple[int, ...]:
+    return struct.unpack(f'<{len(data) // MESSAGE_ID.size}I', data)
+
+
+def iterate_frames(file_path: Union[str, Path]) -> Iterator[Tuple[int, bytes, int]]:
+    """
+    Yield (kind, payload, end offset) of each complete frame of the log.
+    """
+    with open(file_path, 'rb') as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f'{file_path} is not an actions log.')
+        while True:
+            header = file.read(FRAME_HEADER.size)
+            if len(header) < FRAME_HEADER.size:
+                return
+            kind, size = FRAME_HEADER.unpack(header)
+            payload = file.read(size)
+            if len(payload) < size:
+                return
+            yield kind, payload, file.tell()
+
+
+class _ReferencingPickler(pickle.Pickler):
+    def __init__(self, file, get_reference: Callable[[Any], Optional[tuple]]):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self._get_reference = get_reference
+
+    def persistent_id(self, obj):
+        return self._get_reference(obj)
+
+
+class _ReferencingUnpickler(pickle.Unpickler):
+    def __init__(self, file, load_reference: Callable[[tuple], Any]):
+        super().__init__(file)
+        self._load_reference = load_reference
+
+    def persistent_load(self, reference):
+        return self._load_reference(reference)
+
+
+class ActionsLogWriter:
+    """
+    Append actions to an actions log file.
+    `get_stage` returns the current stage, which is saved with each action (see `ActionsLogReader`).
+    Appending to an existing log continues its content-addressed tables.
+    """
+
+    def __init__(self, file_path: Union[str, Path], get_stage: Optional[Callable[[], Any]] = None):
+        self.file_path = Path(file_path)
+        self.get_stage = get_stage
+        self._file = None
+        self._digests = set()
+        self._num_messages = 0
+        self._ids_to_messages_and_message_ids: Dict[int, Tuple[Message, int]] = {}  # keeps the messages alive
+        self._lock = threading.Lock()
+
+    def _open(self):
+        if self._file is not None:
+            return
+        end_offset = 0
+        if self.file_path.exists() and os.path.getsize(self.file_path) > 0:
+            end_offset = len(MAGIC)
+            for kind, payload, end_offset in iterate_frames(self.file_path):
+                if kind in (BODY, CONTEXT):
+                    self._digests.add(payload[:DIGEST_SIZE])
+                elif kind == MESSAGE:
+                    self._num_messages = max(self._num_messages, MESSAGE_ID.unpack(payload[:MESSAGE_ID.size])[0] + 1)
+        self.file_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.file_path, 'ab')
+        if end_offset == 0:
+            self._file.write(MAGIC)
+        else:
+            self._file.truncate(end_offset)  # drop an incomplete last frame
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _write_frame(self, kind: int, payload: bytes):
+        self._file.write(FRAME_HEADER.pack(kind, len(payload)) + payload)
+
+    def _dumps(self, obj) -> bytes:
+        buffer = io.BytesIO()
+        _ReferencingPickler(buffer, self._get_reference).dump(obj)
+        return buffer.getvalue()
+
+    def _get_reference(self, obj) -> Optional[tuple]:
+        if isinstance(obj, Conversations):
+            return 'conversations',
+        if isinstance(obj, Message):
+            return 'message', self._add_message(obj)
+        return None
+
+    def _add_content_addressed_frame(self, kind: int, data: bytes) -> bytes:
+        digest = _get_digest(data)
+        if digest not in self._digests:
+            self._write_frame(kind, digest + data)
+            self._digests.add(digest)
+        return digest
+
+    def _add_message(self, message: Message) -> int:
+        message_and_message_id = self._ids_to_messages_and_message_ids.get(id(message))
+        if message_and_message_id is not None:
+            return message_and_message_id[1]
+        message_id = self._num_messages
+        self._num_messages += 1
+        self._ids_to_messages_and_message_ids[id(message)] = (message, message_id)
+        state = dict(vars(message))
+        content, context = state.pop('content'), state.pop('context', None)
+        body_digest = None
+        if isinstance(content, str):
+            body_digest = self._add_content_addressed_frame(BODY, content.encode('utf-8', 'surrogatepass'))
+            content = None
+        context_digest = None
+        if context is not None:
+            context_digest = self._add_content_addressed_frame(
+                CONTEXT, _pack_message_ids([self._add_message(context_message) for context_message in context]))
+        self._write_frame(MESSAGE, MESSAGE_ID.pack(message_id) +
+                          self._dumps((body_digest, content, context_digest, state)))
+        return message_id
+
+    def append(self, action: Action):
+        with self._lock:
+            self._open()
+            stage = self.get_stage() if self.get_stage is not None else None
+            action_data = self._dumps(action)  # writes the frames of the new messages of the action
+            self._write_frame(ACTION, pickle.dumps((stage, getattr(action, 'conversation_name', None), action_data),
+                                                   protocol=pickle.HIGHEST_PROTOCOL))
+            self._file.flush()
+
+
+def _is_before_stage(stage, until_stage: Stage) -> bool:
+    if isinstance(stage, Stage):
+        return stage < until_stage
+    return stage is None  # True is logged after the last stage
+
+
+class ActionsLogReader:
+    """
+    Stream the actions of an actions log.
+    Messages are only un-pickled when referenced by an action that is read.
+    """
+
+    def __init__(self, file_path: Union[str, Path], conversations: Optional[Conversations] = None):
+        self.file_path = Path(file_path)
+        self.conversations = conversations if conversations is not None else Conversations()
+        self._bodies: Dict[bytes, str] = {}
+        self._contexts: Dict[bytes, bytes] = {}
+        self._message_records: Dict[int, bytes] = {}
+        self._messages: Dict[int, Message] = {}
+
+    def _loads(self, data: bytes):
+        return _ReferencingUnpickler(io.BytesIO(data), self._load_reference).load()
+
+    def _load_reference(self, reference: tuple):
+        if reference[0] == 'conversations':
+            return self.conversations
+        if reference[0] == 'message':
+            return self._get_message(reference[1])
+        raise pickle.UnpicklingError(f'Unknown reference: {reference}')
+
+    def _get_message(self, message_id: int) -> Message:
+        message = self._messages.get(message_id)
+        if message is not None:
+            return message
+        body_digest, content, context_digest, state = self._loads(self._message_records[message_id])
+        message = Message.__new__(Message)
+        message.__dict__.update(state)
+        message.content = self._bodies[body_digest] if body_digest is not None else content
+        message.context = None
+        self._messages[message_id] = message
+        if context_digest is not None:
+            context_message_ids = _unpack_message_ids(self._contexts[context_digest])
+            message.context = [self._get_message(context_message_id) for context_message_id in context_message_ids]
+        return message
+
+    def iterate_actions(self, until_stage: Optional[Stage] = None,
+                        conversation_names: Optional[Collection[str]] = None) -> Iterator[Tuple[Any, Action]]:
+        """
+        Yield (stage, action) for the actions of the log.
+        until_stage: only the actions performed before the given stage.
+        conversation_names: only the actions on the given conversations.
+        Actions that are skipped are not un-pickled.
+        """
+        for kind, payload, _ in iterate_frames(self.file_path):
+            if kind == BODY:
+                self._bodies[payload[:DIGEST_SIZE]] = payload[DIGEST_SIZE:].decode('utf-8', 'surrogatepass')
+            elif kind == CONTEXT:
+                self._contexts[payload[:DIGEST_SIZE]] = payload[DIGEST_SIZE:]
+            elif kind == MESSAGE:
+                self._message_records[MESSAGE_ID.unpack(payload[:MESSAGE_ID.size])[0]] = payload[MESSAGE_ID.size:]
+            elif kind == ACTION:
+                stage, conversation_name, action_data = pickle.loads(payload)
+                if until_stage is not None and not _is_before_stage(stage, until_stage):
+                    continue
+                if conversation_names is not None and conversation_name not in conversation_names:
+                    continue
+                yield stage, self._loads(action_data)
@@ -0,0 +1,133 @@
+"""
+Plan how to fit a conversation within the context of the LLM, before calling the LLM.
+
+Rather than trying to call the LLM, failing, and removing one message at a time,
+we use the (memoized) number of tokens of each message to decide in advance which model to use,
+and which messages to hide.
+"""
+from __future__ import annotations
+
+import bisect
+import itertools
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import List, Tuple, Optional
+
+from data_to_paper.servers.llm_call import NUM_TOKENS_SEPARATING_MESSAGES, DEFAULT_EXPECTED_TOKENS_IN_RESPONSE
+from data_to_paper.servers.model_engine import ModelEngine
+
+from .conversation import Conversation
+from .message_designation import GeneralMessageDesignation, convert_general_message_designation_to_list
+
+
+@dataclass
+class ContextFittingPlan:
+    model_engine: ModelEngine
+    "The model to use"
+
+    hidden_messages: List[GeneralMessageDesignation]
+    "The messages to hide (the originally hidden messages, followed by the indices of the newly hidden messages)"
+
+    num_tokens: int
+    "The number of tokens in the messages sent to the LLM"
+
+    is_fitting: bool
+    "Whether the messages and the expected response fit within the context of the model"
+
+
+class ContextTrimmingStrategy(ABC):
+    """
+    Decide which messages to hide, so that the conversation fits within the context of the LLM.
+    """
+
+    @abstractmethod
+    def get_indices_to_hide(self, indices_and_tokens: List[Tuple[int, int]], excess_tokens: int) -> Optional[List[int]]:
+        """
+        Return the indices of the messages to hide.
+
+        indices_and_tokens: the indices of the messages that can be hidden, with their number of tokens,
+        ordered by their position in the conversation.
+        excess_tokens: the number of tokens that should be freed.
+
+        Return None if the excess tokens cannot be freed.
+        """
+        pass
+
+    @staticmethod
+    def _get_indices_of_shortest_sufficient_prefix(indices_and_tokens: List[Tuple[int, int]], excess_tokens: int
+                                                   ) -> Optional[List[int]]:
+        """
+        Return the indices of the shortest prefix of `indices_and_tokens` freeing at least `excess_tokens`.
+        Hiding a message also frees the tokens separating it from the other messages.
+        """
+        freed_tokens = list(itertools.accumulate(
+            num_tokens + NUM_TOKENS_SEPARATING_MESSAGES for _, num_tokens in indices_and_tokens))
+        num_to_hide = bisect.bisect_left(freed_tokens, excess_tokens)
+        if num_to_hide == len(freed_tokens):
+            return None
+        return [index for index, _ in indices_and_tokens[:num_to_hide + 1]]
+
+
+class DropOldestMessages(ContextTrimmingStrategy):
+    """
+    Hide the oldest messages (except for the first message, which is typically the system prompt).
+    """
+
+    def get_indices_to_hide(self, indices_and_tokens: List[Tuple[int, int]], excess_tokens: int) -> Optional[List[int]]:
+        return self._get_indices_of_shortest_sufficient_prefix(indices_and_tokens, excess_tokens)
+
+
+class DropLargestMessages(ContextTrimmingStrategy):
+    """
+    Hide the largest messages (except for the first message, which is typically the system prompt).
+    """
+
+    def get_indices_to_hide(self, indices_and_tokens: List[Tuple[int, int]], excess_tokens: int) -> Optional[List[int]]:
+        indices_and_tokens = sorted(indices_and_tokens, key=lambda index_and_tokens: -index_and_tokens[1])
+        indices = self._get_indices_of_shortest_sufficient_prefix(indices_and_tokens, excess_tokens)
+        return None if indices is None else sorted(indices)
+
+
+def plan_context_fitting(conversation: Conversation,
+                         model_engine: Optional[ModelEngine] = None,
+                         hidden_messages: GeneralMessageDesignation = None,
+                         expected_tokens_in_response: Optional[int] = None,
+                         strategy: Optional[ContextTrimmingStrategy] = None,
+                         ) -> ContextFittingPlan:
+    """
+    Plan the model and the messages to hide so that the conversation fits within the context of the LLM.
+
+    We first bump the model to models with more context, and only then hide messages.
+    The first chosen message (typically the system prompt) is never hidden.
+    """
+    model_engine = model_engine or ModelEngine.DEFAULT
+    expected_tokens_in_response = expected_tokens_in_response or DEFAULT_EXPECTED_TOKENS_IN_RESPONSE
+    strategy = strategy or DropOldestMessages()
+    hidden_messages = convert_general_message_designation_to_list(hidden_messages)
+
+    num_tokens = conversation.get_number_of_tokens(model_engine, hidden_messages)
+    while num_tokens + expected_tokens_in_response > model_engine.max_tokens:
+        try:
+            bumped_model_engine = model_engine.get_model_with_more_context()
+        except ValueError:
+            break
+        if bumped_model_engine == model_engine:
+            break
+        model_engine = bumped_model_engine
+        num_tokens = conversation.get_number_of_tokens(model_engine, hidden_messages)
+
+    excess_tokens = num_tokens + expected_tokens_in_response - model_engine.max_tokens
+    if excess_tokens <= 0:
+        return ContextFittingPlan(model_engine=model_engine, hidden_messages=hidden_messages,
+                                  num_tokens=num_tokens, is_fitting=True)
+
+    indices_and_tokens = [(index, message.get_number_of_tokens(model_engine))
+                          for index, message in conversation.get_chosen_indices_and_messages(hidden_messages)[1:]]
+    indices_to_hide = strategy.get_indices_to_hide(indices_and_tokens, excess_tokens)
+    is_fitting = indices_to_hide is not None
+    if not is_fitting:
+        indices_to_hide = [index for index, _ in indices_and_tokens]
+    hidden_messages = hidden_messages + indices_to_hide
+    return ContextFittingPlan(model_engine=model_engine, hidden_messages=hidden_messages,
+                              num_tokens=conversation.get_number_of_tokens(model_engine, hidden_messages),
+                              is_fitting=is_fitting)
@@ -2,9 +2,11 @@ from __future__ import annotations
 
 import re
 
-from typing import List, Tuple, Optional, Set
+from typing import List, Tuple, Optional, Set, Dict
 
 from data_to_paper.utils.tag_pairs import SAVE_TAGS
+from data_to_paper.servers.llm_call import get_encoding_for_model, NUM_TOKENS_SEPARATING_MESSAGES
+from data_to_paper.servers.model_engine import ModelEngine
 
 from .message import Message, Role
 from .message_designation import GeneralMessageDesignation, convert_general_message_designation_to_int_list
@@ -14,6 +16,10 @@ if TYPE_CHECKING:
     from data_to_paper.base_cast import Agent
 
 
+def is_message_sent_to_llm(message: Message) -> bool:
+    return message.role is not Role.COMMENTER and not message.ignore
+
+
 class Conversation(List[Message]):
     """
     Maintain a list of messages as exchanged between USER and ASSISTANT.
@@ -26,11 +32,16 @@ class Conversation(List[Message]):
     DO NOT ALTER CONVERSATION INSTANCE DIRECTLY. USE `ConversationManager` INSTEAD.
     """
 
+    _encoding_names_to_model_engines: Dict[str, ModelEngine] = {}
+
     def __init__(self, *args, conversation_name: Optional[str] = None,
                  participants: Optional[Set[Agent]] = None, **kwargs):
         super().__init__(*args, **kwargs)
         self.conversation_name = conversation_name
         self.participants = participants  # None - do not enforce participants
+        # running total of the number of tokens in the messages sent to the LLM, per encoding.
+        # Updated as messages are added or removed, so that we do not need to re-count the entire conversation.
+        self._encodings_to_number_of_tokens: Dict[str, int] = {}
 
     def add_participant(self, agent: Agent):
         if self.participants is None:
@@ -52,6 +63,63 @@ class Conversation(List[Message]):
         if self.participants is not None and message.role is not Role.COMMENTER:
             assert message.agent in self.participants, f'Agent {message.agent} not in conversation participants.'
         super().append(message)
+        self._add_to_number_of_tokens([message], 1)
+
+    def pop(self, index: int = -1) -> Message:
+        message = super().pop(index)
+        self._add_to_number_of_tokens([message], -1)
+        return message
+
+    def __delitem__(self, index):
+        messages = self[index] if isinstance(index, slice) else [self[index]]
+        super().__delitem__(index)
+        self._add_to_number_of_tokens(messages, -1)
+
+    def clear(self):
+        super().clear()
+        self._get_encodings_to_number_of_tokens().clear()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_encodings_to_number_of_tokens', None)
+        return state
+
+    def _get_encodings_to_number_of_tokens(self) -> Dict[str, int]:
+        # conversations loaded from older pickles do not have the running totals:
+        return self.__dict__.setdefault('_encodings_to_number_of_tokens', {})
+
+    def _add_to_number_of_tokens(self, messages: List[Message], sign: int):
+        """
+        Update the running totals of the number of tokens, upon adding (sign=1) or removing (sign=-1) messages.
+        """
+        encodings_to_number_of_tokens = self._get_encodings_to_number_of_tokens()
+        for encoding_name in encodings_to_number_of_tokens:
+            model_engine = self._encoding_names_to_model_engines[encoding_name]
+            encodings_to_number_of_tokens[encoding_name] += sign * sum(
+                message.get_number_of_tokens(model_engine) for message in messages if is_message_sent_to_llm(message))
+
+    def get_number_of_tokens(self, model_engine: ModelEngine = None,
+                             hidden_messages: GeneralMessageDesignation = None) -> int:
+        """
+        Return the number of tokens in the messages that will be sent to the LLM.
+        Same as `count_number_of_tokens_in_message(self.get_chosen_messages(hidden_messages), model_engine)`,
+        but without re-counting the entire conversation.
+        """
+        model_engine = model_engine or ModelEngine.DEFAULT
+        encoding_name = get_encoding_for_model(model_engine).name
+        self._encoding_names_to_model_engines.setdefault(encoding_name, model_engine)
+        encodings_to_number_of_tokens = self._get_encodings_to_number_of_tokens()
+        if encoding_name not in encodings_to_number_of_tokens:
+            encodings_to_number_of_tokens[encoding_name] = sum(
+                message.get_number_of_tokens(model_engine) for message in self if is_message_sent_to_llm(message))
+        number_of_tokens = encodings_to_number_of_tokens[encoding_name]
+        num_messages = sum(1 for message in self if is_message_sent_to_llm(message))
+        if hidden_messages:
+            for index in set(convert_general_message_designation_to_int_list(hidden_messages, self)):
+                if 0 <= index < len(self) and is_message_sent_to_llm(self[index]):
+                    number_of_tokens -= self[index].get_number_of_tokens(model_engine)
+                    num_messages -= 1
+        return number_of_tokens + max(num_messages - 1, 0) * NUM_TOKENS_SEPARATING_MESSAGES
 
     def get_chosen_indices_and_messages(self, hidden_messages: GeneralMessageDesignation = None
                                         ) -> List[Tuple[int, Message]]:
@@ -63,8 +131,7 @@ class Conversation(List[Message]):
         hidden_messages = convert_general_message_designation_to_int_list(hidden_messages, self)
         return [(i, message) for i, message in enumerate(self)
                 if i not in hidden_messages
-                and message.role is not Role.COMMENTER
-                and not message.ignore]
+                and is_message_sent_to_llm(message)]
 
     def get_chosen_messages(self, hidden_messages: GeneralMessageDesignation = None) -> List[Message]:
         """
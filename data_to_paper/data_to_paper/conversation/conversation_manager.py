@@ -1,13 +1,14 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from typing import Optional, Set, Iterable, Union, List
 
 from data_to_paper.utils.print_to_file import print_and_log_red
 from data_to_paper.base_cast import Agent
-from data_to_paper.servers.llm_call import try_get_llm_response
+from data_to_paper.servers.llm_call import try_get_llm_response, StopStreamingCondition
 from data_to_paper.servers.model_engine import OPENAI_CALL_PARAMETERS_NAMES, OpenaiCallParameters, ModelEngine
 from data_to_paper.run_gpt_code.code_utils import add_label_to_first_triple_quotes_if_missing
 
 from .actions_and_conversations import ActionsAndConversations, Conversations, Actions
+from .context_fitting import ContextTrimmingStrategy, DropOldestMessages, plan_context_fitting
 from .conversation import Conversation
 from .message import Message, Role, create_message, create_message_from_other_message
 from .message_designation import GeneralMessageDesignation, convert_general_message_designation_to_list
@@ -44,6 +45,9 @@ class ConversationManager:
 
     human_agent: Agent = None
 
+    context_trimming_strategy: ContextTrimmingStrategy = field(default_factory=DropOldestMessages)
+    "How to choose messages to hide when the conversation does not fit within the context of the LLM."
+
     @property
     def conversations(self) -> Conversations:
         return self.actions_and_conversations.conversations
@@ -160,6 +164,7 @@ class ConversationManager:
                                          is_code: bool = False, previous_code: Optional[str] = None,
                                          hidden_messages: GeneralMessageDesignation = None,
                                          expected_tokens_in_response: int = None,
+                                         stop_streaming_when: Optional[StopStreamingCondition] = None,
                                          **kwargs  # for both create_message and openai params
                                          ) -> Message:
         """
@@ -168,30 +173,47 @@ class ConversationManager:
         If failed, retry while removing more messages upstream.
         """
         hidden_messages = convert_general_message_designation_to_list(hidden_messages)
-        indices_and_messages = self.conversation.get_chosen_indices_and_messages(hidden_messages)
-        actual_hidden_messages = hidden_messages.copy()
 
         # extract all OPENAI_CALL_PARAMETERS_NAMES from kwargs:
         openai_call_parameters = \
             OpenaiCallParameters(**{k: kwargs.pop(k) for k in OPENAI_CALL_PARAMETERS_NAMES if k in kwargs})
 
-        # we try to get a response. if we fail we bump the model, and then gradually remove messages from the top,
-        # starting at message 1 (we don't remove message 0, which is the system message).
+        # we first plan, based on the number of tokens, which model to use and which messages to hide:
         model = openai_call_parameters.model_engine or ModelEngine.DEFAULT
+        plan = plan_context_fitting(self.conversation, model_engine=model, hidden_messages=hidden_messages,
+                                    expected_tokens_in_response=expected_tokens_in_response,
+                                    strategy=self.context_trimming_strategy)
+        if not plan.is_fitting:
+            raise RuntimeError('Failed accessing openai despite removing all messages from context.')
+        if plan.model_engine != model:
+            print_and_log_red(f'############# Bumping model #############')
+            model = plan.model_engine
+            openai_call_parameters.model_engine = model
+        actual_hidden_messages = plan.hidden_messages.copy()
+        num_newly_hidden = len(actual_hidden_messages) - len(hidden_messages)
+        if num_newly_hidden:
+            print_and_log_red(f'############# Removing {num_newly_hidden} messages from context #############')
+        indices_and_messages = self.conversation.get_chosen_indices_and_messages(actual_hidden_messages)
+
+        # we try to get a response. if the LLM still fails due to the context length, we bump the model,
+        # and then gradually remove messages from the top,
+        # starting at message 1 (we don't remove message 0, which is the system message).
         while True:
             message = self._try_get_and_append_llm_response(tag=tag, comment=comment, is_code=is_code,
                                                             previous_code=previous_code,
                                                             hidden_messages=actual_hidden_messages,
                                                             openai_call_parameters=openai_call_parameters,
                                                             expected_tokens_in_response=expected_tokens_in_response,
+                                                            stop_streaming_when=stop_streaming_when,
                                                             **kwargs)
             if isinstance(message, Message):
                 return message
 
             # we failed to get a response. We start by bumping the model, if possible:
             try:
-                model = model.get_model_with_more_context()
-                model_was_bumped = True
+                bumped_model = model.get_model_with_more_context()
+                model_was_bumped = bumped_model != model
+                model = bumped_model
             except ValueError:
                 model_was_bumped = False
             if model_was_bumped:
@@ -212,6 +234,7 @@ class ConversationManager:
                                          hidden_messages: GeneralMessageDesignation = None,
                                          openai_call_parameters: Optional[OpenaiCallParameters] = None,
                                          expected_tokens_in_response: int = None,
+                                         stop_streaming_when: Optional[StopStreamingCondition] = None,
                                          **kwargs
                                          ) -> Union[Message, Exception]:
         """
@@ -224,7 +247,11 @@ class ConversationManager:
         """
         openai_call_parameters = openai_call_parameters or OpenaiCallParameters()
         messages = self.conversation.get_chosen_messages(hidden_messages)
+        tokens_in_messages = self.conversation.get_number_of_tokens(openai_call_parameters.model_engine,
+                                                                    hidden_messages)
         content = try_get_llm_response(messages, expected_tokens_in_response=expected_tokens_in_response,
+                                       tokens_in_messages=tokens_in_messages,
+                                       stop_streaming_when=stop_streaming_when,
                                        **openai_call_parameters.to_dict())
         if isinstance(content, Exception):
             self._create_and_apply_action(
@@ -10,7 +10,8 @@ from typing import NamedTuple, Optional, List
 from data_to_paper.env import TEXT_WIDTH, MINIMAL_COMPACTION_TO_SHOW_CODE_DIFF, HIDE_INCOMPLETE_CODE
 from data_to_paper.base_cast import Agent
 from data_to_paper.run_gpt_code.code_utils import extract_code_from_text, FailedExtractingBlock
-from data_to_paper.servers.llm_call import count_number_of_tokens_in_message
+from data_to_paper.servers.llm_call import count_number_of_tokens_in_message, count_number_of_tokens_in_text, \
+    get_encoding_for_model
 from data_to_paper.servers.model_engine import OpenaiCallParameters, ModelEngine
 from data_to_paper.utils import format_text_with_code_blocks, line_count
 from data_to_paper.utils.highlighted_text import colored_text
@@ -143,9 +144,26 @@ class Message:
             is_incomplete_code = HIDE_INCOMPLETE_CODE and last_section is not None and not last_section.is_complete
         return content, is_incomplete_code
 
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_encodings_to_number_of_tokens', None)
+        return state
+
     def get_number_of_tokens(self, model_engine: ModelEngine = None) -> int:
-        model_engine = model_engine or self.get_llm_model()
-        return count_number_of_tokens_in_message([self], model_engine)
+        """
+        Return the number of tokens in the message content.
+        The count is memoized per encoding, and is re-computed only if the content changes.
+        """
+        model_engine = model_engine or self.get_llm_model() or ModelEngine.DEFAULT
+        encoding_name = get_encoding_for_model(model_engine).name
+        encodings_to_number_of_tokens = self.__dict__.setdefault('_encodings_to_number_of_tokens', {})
+        content_hash = hash(self.content)
+        content_hash_and_number_of_tokens = encodings_to_number_of_tokens.get(encoding_name)
+        if content_hash_and_number_of_tokens is None or content_hash_and_number_of_tokens[0] != content_hash:
+            content_hash_and_number_of_tokens = \
+                (content_hash, count_number_of_tokens_in_text(self.content, model_engine))
+            encodings_to_number_of_tokens[encoding_name] = content_hash_and_number_of_tokens
+        return content_hash_and_number_of_tokens[1]
 
     def get_number_of_tokens_in_context(self) -> int:
         if self.context is None:
@@ -1,19 +1,34 @@
 from __future__ import annotations
 from pathlib import Path
 
-from typing import Union
+from typing import Collection, Optional, Union
 
 from .actions_and_conversations import Actions
+from .actions_log import ActionsLogReader, is_actions_log_file
+from .stage import Stage
 
 
-def replay_actions(file_path: Union[str, Path], is_color: bool = True):
+def replay_actions(file_path: Union[str, Path], is_color: bool = True, until_stage: Optional[Stage] = None,
+                   conversation_names: Optional[Collection[str]] = None):
     """
     Replay a list of actions on conversations.
+    Actions are streamed from actions log files; legacy pickle files are loaded in full.
+    until_stage: replay only the actions performed before the given stage (actions log files only).
+    conversation_names: replay only the actions on the given conversations.
     """
     actions = Actions()
 
-    actions.load_actions_from_file(file_path)
-    for action in actions:
+    if is_actions_log_file(file_path):
+        actions_to_replay = (action for _, action in
+                             ActionsLogReader(file_path).iterate_actions(until_stage, conversation_names))
+    else:
+        if until_stage is not None:
+            raise ValueError(f'{file_path} is a legacy actions file, which does not record stages.')
+        actions_to_replay = [action for action in Actions().load_actions_from_file(file_path)
+                             if conversation_names is None
+                             or getattr(action, 'conversation_name', None) in conversation_names]
+    for action in actions_to_replay:
+        actions.append(action)
         actions.apply_action(action, is_color=is_color, should_append=False)
 
     return actions
@@ -1,4 +1,5 @@
 import os
+import platform
 from typing import Optional
 
 from pathlib import Path
@@ -35,6 +36,12 @@ LLM_MODELS_TO_API_KEYS_AND_BASE_URL = dict[Optional[ModelEngine], str]({
 
 SEMANTIC_SCHOLAR_API_KEY = os.environ.get('SEMANTIC_SCHOLAR_API_KEY', None)
 
+# Literature search:
+# Max number of queries sent to Semantic Scholar concurrently:
+LITERATURE_SEARCH_MAX_CONCURRENT_QUERIES = Mutable(4)
+# Max rate of requests to Semantic Scholar (requests per second; None for no limit):
+SEMANTIC_SCHOLAR_MAX_REQUESTS_PER_SECOND = Mutable(1.)
+
 DEFAULT_MODEL_ENGINE = ModelEngine.GPT35_TURBO
 
 # Text width for conversation output:
@@ -43,6 +50,16 @@ TEXT_WIDTH = 150
 # max time for code timeout when running LLM-writen code (seconds)
 MAX_EXEC_TIME = Mutable(200)
 
+# Running LLM-written code in separate processes:
+# Max number of code runs executing concurrently (each in its own process):
+MAX_CONCURRENT_CODE_RUNS = Mutable(os.cpu_count() or 1)
+# Start method of the processes. 'fork' is fast, but is not safe on macOS (with Qt/objc), where we fork
+# from a (single-threaded) fork server instead:
+CODE_RUN_PROCESS_START_METHOD = Mutable(
+    'fork' if platform.system() == 'Linux' else 'spawn' if platform.system() == 'Windows' else 'forkserver')
+# Import the statistics packages and build the override tables once, in the process from which runs are forked:
+PREWARM_CODE_RUNS = Flag(True)
+
 # Decide whether to present code debugging iterations as code diff or full.
 # Defining: compaction_code_diff = num_lines(new_code) - num_lines(code_diff)
 # We show code diff if compaction_code_diff > MINIMAL_COMPACTION_TO_SHOW_CODE_DIFF
@@ -54,6 +71,30 @@ HIDE_INCOMPLETE_CODE = Flag(True)
 # Max number of tokens allowed in code output:
 MAX_SENSIBLE_OUTPUT_SIZE_TOKENS = Mutable(2500)
 
+# Folder for caches kept across runs:
+CACHE_FOLDER = Path.home() / '.cache' / 'data_to_paper'
+
+# Fingerprints of input files, used as the cache keys of code runs (see FileFingerprinter).
+# The table of file digests is kept persistently, so that unchanged files are never re-hashed (None to not keep):
+FILE_FINGERPRINTS_FILEPATH = Mutable(CACHE_FOLDER / 'file_fingerprints.pkl')
+# The hash function: 'blake2b' (hashlib), or 'xxh3_128' (faster, requires installing xxhash):
+FILE_FINGERPRINT_HASH_NAME = Mutable('blake2b')
+
+# Max size (bytes) of the cached code-run results kept in memory (see RunCacheStore):
+CODE_RUN_CACHE_MEMORY_SIZE_CAP = Mutable(256 * 2 ** 20)
+
+# LLM calls:
+# Stream LLM responses, so that a response can be stopped as soon as it is known to be invalid (see
+# `Converser._should_stop_streaming_response`):
+STREAM_LLM_RESPONSES = Flag(True)
+# Timeouts (seconds) for LLM calls. An LLM call that times out is retried:
+LLM_RESPONSE_TIMEOUT = Mutable(300)  # wall-clock time for the whole response
+LLM_RESPONSE_IDLE_TIMEOUT = Mutable(60)  # max time without receiving any tokens (when streaming)
+
+# Max number of stages to run concurrently (see `StagesScheduler`). 1 to run the stages one after the other.
+# Stages are run concurrently only when running without an app:
+MAX_CONCURRENT_STAGES = Mutable(1)
+
 # Delay for cache retrieval (for replay to behave as if we are waiting for the server):
 DELAY_CODE_RUN_CACHE_RETRIEVAL = Mutable(0.01)  # seconds
 DELAY_SERVER_CACHE_RETRIEVAL = Mutable(0.01)  # seconds
@@ -75,6 +116,10 @@ FAKE_REQUEST_HUMAN_RESPONSE_ON_PLAYBACK = Flag(False)  # For video recording
 # but not with None. Runs recorded with None can be replayed only with None.
 CHOSEN_APP = Mutable('pyside')
 
+# Max number of times per second a panel of the pyside app is re-rendered. Bursts of updates in between are
+# coalesced into a single rendering. None to render each update as it arrives:
+MAX_PANEL_RENDERS_PER_SECOND = Mutable(20)
+
 # Human code review:
 # If True, the user can change all code reviews.
 # If None, the user can change only the last code review.
@@ -87,6 +132,29 @@ NUM_DIGITS_FOR_FLOATS = 4
 
 FOLDER_FOR_RUN = Path(__file__).parent / 'temp_run'
 
+# Console log (see `ConsoleLogWriter`):
+#   'async': lines are queued, and written to the log files by a background thread.
+#   'sync': lines are written to the log files as they are printed.
+CONSOLE_LOG_WRITE_MODE = Mutable('async')
+# Max number of lines waiting to be written in 'async' mode (printing blocks when the queue is full). This bounds the
+# number of lines lost upon a crash:
+CONSOLE_LOG_MAX_QUEUED_LINES = Mutable(1000)
+
+# Zipped data files are extracted once (per archive content) into this folder, and are then staged into the run
+# folder (see `stage_file`). None to extract directly into the run folder:
+EXTRACTED_ARCHIVES_FOLDER = Mutable(CACHE_FOLDER / 'extracted_archives')
+
+# Latex compilation (see `LatexCompiler`):
+# The preamble shared by the latex documents is precompiled once into a latex format file in this folder.
+# None to parse the preamble on each compilation:
+LATEX_FORMATS_FOLDER = Mutable(CACHE_FOLDER / 'latex_formats')
+# The results of latex compilations are cached in this folder, by the hash of the document and its bibliography.
+# None to not cache:
+LATEX_COMPILATION_CACHE_FOLDER = Mutable(CACHE_FOLDER / 'latex_compilations')
+# The html of latex converted to html is cached in this folder (see `convert_latex_to_html`). Set by the steps runner
+# to a folder in the run output directory. None to only cache in memory:
+LATEX_TO_HTML_CACHE_FOLDER = Mutable(None)
+
 # GPT code environment:
 TRACK_P_VALUES = Flag(True)
 
@@ -55,13 +55,20 @@ class AppInteractor:
     @_skip_if_no_app
     def _app_send_prompt(self, panel_name: PanelNames, prompt: StrOrReplacer = '', provided_as_html: bool = False,
                          from_md: bool = False, demote_headers_by: int = 0, sleep_for: Union[None, float, bool] = 0,
-                         scroll_to_bottom: bool = False):
+                         scroll_to_bottom: bool = False, append: bool = False):
+        """
+        Show the prompt in the panel.
+        append: append the prompt to the panel content (only the new prompt is rendered), rather than replace it.
+        """
         s = format_value(self, prompt)
         if not provided_as_html:
             do_not_format = ['latex'] if panel_name != PanelNames.PRODUCT else []
             s = format_text_with_code_blocks(s, is_html=True, width=None, from_md=from_md, do_not_format=do_not_format)
         s = demote_html_headers(s, demote_headers_by)
-        self.app.show_text(panel_name, s, is_html=True, scroll_to_bottom=scroll_to_bottom)
+        if append:
+            self.app.append_text(panel_name, s, is_html=True, scroll_to_bottom=scroll_to_bottom)
+        else:
+            self.app.show_text(panel_name, s, is_html=True, scroll_to_bottom=scroll_to_bottom)
         if isinstance(sleep_for, Mutable):
             sleep_for = sleep_for.val
         self._app_request_panel_continue(panel_name, sleep_for)
@@ -14,6 +14,7 @@ class BaseApp:
     A base class for the application.
     Provides the main interface for the application, including:
     - show_text
+    - append_text
     - edit_text
     """
 
@@ -72,6 +73,13 @@ class BaseApp:
                   scroll_to_bottom: bool = False):
         pass
 
+    def append_text(self, panel_name: PanelNames, text: str, is_html: bool = False,
+                    scroll_to_bottom: bool = False):
+        """
+        Append text to the text shown in the panel.
+        """
+        pass
+
     def set_focus_on_panel(self, panel_name: PanelNames):
         pass
 
@@ -1,12 +1,14 @@
 from functools import partial
+from itertools import groupby
 from typing import Optional, List, Collection, Dict, Callable, Any, Union, Tuple
 
-from PySide6.QtCore import Qt, QMutex, QWaitCondition, QThread, Signal, Slot
+from PySide6.QtCore import Qt, QMutex, QWaitCondition, QThread, QTimer, Signal, Slot
 from PySide6.QtGui import QTextOption, QTextCursor
 from PySide6.QtWidgets import QMainWindow, QVBoxLayout, QLabel, QPushButton, QWidget, \
     QHBoxLayout, QSplitter, QTextEdit, QTabWidget, QDialog, QSizePolicy, QCheckBox, QSpacerItem
 
 from data_to_paper.conversation.stage import Stage
+from data_to_paper.env import MAX_PANEL_RENDERS_PER_SECOND
 from data_to_paper.interactive.base_app import BaseApp
 from data_to_paper.interactive.enum_types import PanelNames
 from data_to_paper.interactive.get_app import get_or_create_q_application_if_app_is_pyside
@@ -29,6 +31,7 @@ class Worker(QThread):
     request_panel_continue_signal = Signal(PanelNames)
     request_text_signal = Signal(PanelNames, str, str, str, str, dict)
     show_text_signal = Signal(PanelNames, str, bool, bool)
+    append_text_signal = Signal(PanelNames, str, bool, bool)
     set_focus_on_panel_signal = Signal(PanelNames)
     advance_stage_int_signal = Signal(int)
     send_product_of_stage_signal = Signal(Stage, str)
@@ -77,6 +80,10 @@ class Worker(QThread):
                          scroll_to_bottom: bool = False):
         self.show_text_signal.emit(panel_name, text, is_html, scroll_to_bottom)
 
+    def worker_append_text(self, panel_name: PanelNames, text: str, is_html: bool = False,
+                           scroll_to_bottom: bool = False):
+        self.append_text_signal.emit(panel_name, text, is_html, scroll_to_bottom)
+
     def worker_set_focus_on_panel(self, panel_name: PanelNames):
         self.set_focus_on_panel_signal.emit(panel_name)
 
@@ -210,7 +217,10 @@ class Panel(QWidget):
         self.header_right = text
         self.header_right_label.setText(text)
 
-    def set_text(self, text):
+    def set_text(self, text: str, is_html: bool = False, scroll_to_bottom: bool = False):
+        pass
+
+    def append_text(self, text: str, is_html: bool = False, scroll_to_bottom: bool = False):
         pass
 
     def get_text(self):
@@ -231,6 +241,8 @@ class EditableTextPanel(Panel):
         self.text_edit.setWordWrapMode(QTextOption.WrapMode.WrapAtWordBoundaryOrAnywhere)
         # self.text_edit.setFontPointSize(14)
         self.text_edit.setStyleSheet(QEDIT_STYLE)
+        # applies to both set and appended html:
+        self.text_edit.document().setDefaultStyleSheet(CSS)
 
         self.text_edit.setReadOnly(True)
         self.layout.addWidget(self.text_edit)
@@ -265,6 +277,16 @@ class EditableTextPanel(Panel):
             self.suggestion_buttons.append(button)
         self._set_buttons_visibility(False)
 
+        # Updates are rendered at most MAX_PANEL_RENDERS_PER_SECOND times per second, and only when the panel
+        # is shown (see `render_pending_updates`):
+        self._pending_text: Optional[Tuple[str, bool]] = None  # (text, is_html) to replace the content with
+        self._pending_fragments: List[Tuple[str, bool]] = []  # (text, is_html) to append to the content
+        self._pending_scroll_to_bottom = False
+        self._render_timer = QTimer(self)
+        self._render_timer.setSingleShot(True)
+        self._render_timer.timeout.connect(self.render_pending_updates)
+        self.num_renders = 0
+
         # self.setStyleSheet("color: white;")
 
     def _set_buttons_visibility(self, visible: bool):
@@ -290,15 +312,97 @@ class EditableTextPanel(Panel):
         self.text_edit.setPlainText(text)
 
     def _set_html_text(self, text: str):
-        # add the CSS to the HTML
-        self.text_edit.setHtml(f'<style>{CSS}</style>{text}')
+        self.text_edit.setHtml(text)
 
-    def set_text(self, text: str, is_html: bool = False):
-        self.text_edit.setReadOnly(True)
-        if is_html:
-            self._set_html_text(text)
-        else:
-            self._set_plain_text(text)
+    def _append_html_text(self, text: str):
+        cursor = QTextCursor(self.text_edit.document())
+        cursor.movePosition(QTextCursor.End)
+        if not self.text_edit.document().isEmpty():
+            # start a new block, as when the html is part of the whole html text:
+            cursor.insertBlock()
+        cursor.insertHtml(text)
+
+    def _append_plain_text(self, text: str):
+        cursor = QTextCursor(self.text_edit.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+
+    def has_pending_updates(self) -> bool:
+        return self._pending_text is not None or bool(self._pending_fragments)
+
+    def is_shown(self) -> bool:
+        """
+        Whether the text is on screen (not in a hidden tab, or in a collapsed splitter).
+        """
+        return self.isVisible() and not self.text_edit.visibleRegion().isEmpty()
+
+    def _schedule_render(self):
+        if MAX_PANEL_RENDERS_PER_SECOND.val is None:
+            self.render_pending_updates()
+        elif not self._render_timer.isActive():
+            self._render_timer.start(int(1000 / MAX_PANEL_RENDERS_PER_SECOND.val))
+
+    def _discard_pending_updates(self):
+        self._render_timer.stop()
+        self._pending_text = None
+        self._pending_fragments = []
+        self._pending_scroll_to_bottom = False
+
+    @Slot()
+    def render_pending_updates(self, force: bool = False):
+        """
+        Render the updates received since the last rendering.
+        Unless `force`, panels that are not shown are rendered only once they are shown.
+        """
+        if not self.has_pending_updates() or not force and not self.is_shown():
+            return
+        self.num_renders += 1
+        if self._pending_text is not None:
+            text, is_html = self._pending_text
+            self.text_edit.setReadOnly(True)
+            if is_html:
+                self._set_html_text(text)
+            else:
+                self._set_plain_text(text)
+        for is_html, fragments in groupby(self._pending_fragments, key=lambda fragment: fragment[1]):
+            text = ''.join(fragment for fragment, _ in fragments)
+            if is_html:
+                self._append_html_text(text)
+            else:
+                self._append_plain_text(text)
+        scroll_to_bottom = self._pending_scroll_to_bottom
+        self._discard_pending_updates()
+        if scroll_to_bottom:
+            self.scroll_to_bottom()
+
+    def set_text(self, text: str, is_html: bool = False, scroll_to_bottom: bool = False):
+        """
+        Replace the text of the panel. The panel is re-rendered on the next rendering.
+        """
+        self._pending_text = (text, is_html)
+        self._pending_fragments = []
+        self._pending_scroll_to_bottom |= scroll_to_bottom
+        self._schedule_render()
+
+    def append_text(self, text: str, is_html: bool = False, scroll_to_bottom: bool = False):
+        """
+        Append to the text of the panel. Only the appended text is rendered.
+        Html is appended as a new block.
+        """
+        self._pending_fragments.append((text, is_html))
+        self._pending_scroll_to_bottom |= scroll_to_bottom
+        self._schedule_render()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        if self.has_pending_updates():
+            self._schedule_render()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        # e.g., when a collapsed splitter is expanded:
+        if self.has_pending_updates():
+            self._schedule_render()
 
     def set_instructions(self, instructions: str):
         self.instructions = instructions
@@ -309,6 +413,7 @@ class EditableTextPanel(Panel):
                   instruction: Optional[str] = None,
                   in_field_instructions: Optional[str] = None,
                   suggestion_texts: Optional[List[str]] = None):
+        self._discard_pending_updates()
         self.text_edit.setReadOnly(False)
         if in_field_instructions:
             self.text_edit.setPlaceholderText(in_field_instructions)
@@ -337,6 +442,7 @@ class EditableTextPanel(Panel):
         self.continue_button.setVisible(False)
 
     def get_text(self):
+        self.render_pending_updates(force=True)
         return self.text_edit.toPlainText()
 
 
@@ -508,6 +614,7 @@ class PysideApp(QMainWindow, BaseApp):
         self.worker.request_panel_continue_signal.connect(self.upon_request_panel_continue)
         self.worker.request_text_signal.connect(self.upon_request_text)
         self.worker.show_text_signal.connect(self.upon_show_text)
+        self.worker.append_text_signal.connect(self.upon_append_text)
         self.worker.set_focus_on_panel_signal.connect(self.upon_set_focus_on_panel)
         self.worker.advance_stage_int_signal.connect(self.upon_advance_stage_int)
         self.worker.send_product_of_stage_signal.connect(self.upon_send_product_of_stage)
@@ -519,6 +626,7 @@ class PysideApp(QMainWindow, BaseApp):
         self.request_panel_continue = self.worker.worker_request_panel_continue
         self.request_text = self.worker.worker_request_text
         self.show_text = self.worker.worker_show_text
+        self.append_text = self.worker.worker_append_text
         self.set_focus_on_panel = self.worker.worker_set_focus_on_panel
         self.send_product_of_stage = self.worker.worker_send_product_of_stage
         self._set_status = self.worker.worker_set_status
@@ -654,10 +762,12 @@ class PysideApp(QMainWindow, BaseApp):
     @Slot(PanelNames, str, bool, bool)
     def upon_show_text(self, panel_name: PanelNames, text: str, is_html: bool = False,
                        scroll_to_bottom: bool = False):
-        panel = self.panels[panel_name]
-        panel.set_text(text, is_html)
-        if scroll_to_bottom:
-            panel.scroll_to_bottom()
+        self.panels[panel_name].set_text(text, is_html, scroll_to_bottom)
+
+    @Slot(PanelNames, str, bool, bool)
+    def upon_append_text(self, panel_name: PanelNames, text: str, is_html: bool = False,
+                         scroll_to_bottom: bool = False):
+        self.panels[panel_name].append_text(text, is_html, scroll_to_bottom)
 
     @Slot(PanelNames)
     def upon_set_focus_on_panel(self, panel_name: PanelNames):
@@ -1,7 +1,8 @@
+import functools
 import re
-from typing import Iterable
-
-import regex
+from dataclasses import dataclass
+from enum import Enum
+from typing import Dict, Iterable, List, Tuple
 
 from .exceptions import UnwantedCommandsUsedInLatex
 
@@ -46,49 +47,117 @@ NON_UTF8_CHARS = {
 
 assert all(len(c) == 1 for c in CHARS.keys())
 
-MATH_PATTERN = r"""
-(?<!\\)    # negative look-behind to make sure start is not escaped
-(?:        # start non-capture group for all possible match starts
-  # group 1, match dollar signs only
-  # single or double dollar sign enforced by look-arounds
-  ((?<!\$)\${1,2}(?!\$))|
-  # group 2, match escaped parenthesis
-  (\\\()|
-  # group 3, match escaped bracket
-  (\\\[)|
-  # group 4,
-  (\\begin\{(?:equation\*?|align\*?)\})|
-  # group 5, match table and figure environments
-  (\\begin\{(?:figure|lstlisting)\})|
-  # group 6, match non-typesetting commands
-  (\\(?:ref|label|autoref)\{)
-)
-# if group 1 was start
-(?(1)
-  # non greedy match everything in between
-  # group 1 matches do not support recursion
-  (.*?)(?<!\\)
-  # match ending double or single dollar signs
-  (?<!\$)\1(?!\$)|
-# else
-(?:
-  # greedily and recursively match everything in between
-  # groups 2, 3, 4, and 5 support recursion
-  ((?:.|\n|\r)*?(?R)?(?:.|\n|\r)*?)(?<!\\)
-  (?:
-    # if group 2 was start, escaped parenthesis is end
-    (?(2)\\\)|  
-    # if group 3 was start, escaped bracket is end
-    (?(3)\\\]|     
-    # if group 4 was start, match end equation or end align
-    (?(4)\\end\{(?:equation\*?|align\*?)\}| 
-    # if group 5 was start, match end figure or end table
-    (?(5)\\end\{(?:figure|lstlisting)\}|
-    # else, match end of non-typesetting command
-    \})
-  )
-)))))
-"""
+
+class LatexSegmentKind(Enum):
+    TEXT = 'text'
+    INLINE_MATH = 'inline_math'  # $...$, \(...\)
+    DISPLAY_MATH = 'display_math'  # $$...$$, \[...\], equation and align environments
+    ENVIRONMENT = 'environment'  # figure and lstlisting environments
+    COMMAND = 'command'  # \ref{...}, \label{...}, \autoref{...}
+
+
+@dataclass(frozen=True)
+class LatexSegment:
+    kind: LatexSegmentKind
+    text: str
+
+
+LATEX_TOKEN_PATTERN = re.compile(r"""
+    (?P<dollars>\$+)|
+    (?P<open_paren>\\\()|(?P<close_paren>\\\))|
+    (?P<open_bracket>\\\[)|(?P<close_bracket>\\\])|
+    \\begin\{(?:(?P<begin_math>equation\*?|align\*?)|(?P<begin_env>figure|lstlisting))\}|
+    \\end\{(?:(?P<end_math>equation\*?|align\*?)|(?P<end_env>figure|lstlisting))\}|
+    (?P<command>\\(?:ref|label|autoref)\{)|
+    (?P<open_brace>\{)|(?P<close_brace>\})
+    """, re.VERBOSE)
+
+# token name -> (group of matching tokens, is opening, kind of the segment it opens)
+TOKENS_TO_GROUPS = {
+    'open_paren': ('paren', True, LatexSegmentKind.INLINE_MATH),
+    'close_paren': ('paren', False, None),
+    'open_bracket': ('bracket', True, LatexSegmentKind.DISPLAY_MATH),
+    'close_bracket': ('bracket', False, None),
+    'begin_math': ('math', True, LatexSegmentKind.DISPLAY_MATH),
+    'end_math': ('math', False, None),
+    'begin_env': ('env', True, LatexSegmentKind.ENVIRONMENT),
+    'end_env': ('env', False, None),
+    'command': ('brace', True, LatexSegmentKind.COMMAND),
+    'open_brace': ('brace', True, None),
+    'close_brace': ('brace', False, None),
+}
+
+
+def _get_dollars_ends(text: str, dollar_tokens: List[re.Match]) -> Dict[int, int]:
+    """
+    Match each $ or $$ with the next unescaped run of the same number of dollars on the same line.
+    Return a dict from the start of each matched opening run to the end of its closing run.
+    """
+    starts_to_ends = {}
+    lengths_to_next_ends = {}
+    next_start = len(text)
+    for token in reversed(dollar_tokens):
+        start, end = token.span()
+        if text.find('\n', end, next_start) != -1:
+            lengths_to_next_ends = {}
+        next_start = start
+        if start > 0 and text[start - 1] == '\\':
+            continue
+        length = end - start
+        if length <= 2:
+            if length in lengths_to_next_ends:
+                starts_to_ends[start] = lengths_to_next_ends[length]
+            lengths_to_next_ends[length] = end
+    return starts_to_ends
+
+
+@functools.lru_cache(maxsize=256)
+def split_latex_text_and_math(text: str) -> Tuple[LatexSegment, ...]:
+    """
+    Split latex into segments of text and of math (and of other parts that should not be processed as text).
+
+    The latex is tokenized in a single pass. Openings are matched with their closings using a stack for each
+    group of tokens (parenthesis, brackets, math environments, figure environments, and braces).
+    `$` and `$$` are matched with the next `$` or `$$` on the same line.
+    Escaped tokens (preceded by a backslash) are ignored. Openings that are not closed are text.
+    """
+    tokens = [token for token in LATEX_TOKEN_PATTERN.finditer(text)
+              if token.start() == 0 or text[token.start() - 1] != '\\']
+    dollars_starts_to_ends = _get_dollars_ends(text, [token for token in tokens if token.lastgroup == 'dollars'])
+    groups_to_stacks = {}
+    starts_to_ends = {}
+    for token in tokens:
+        if token.lastgroup == 'dollars':
+            continue
+        group, is_opening, _ = TOKENS_TO_GROUPS[token.lastgroup]
+        stack = groups_to_stacks.setdefault(group, [])
+        if is_opening:
+            stack.append(token.start())
+        elif stack:
+            starts_to_ends[stack.pop()] = token.end()
+
+    segments = []
+    last_end = 0
+    for token in tokens:
+        start = token.start()
+        if start < last_end:
+            continue
+        if token.lastgroup == 'dollars':
+            end = dollars_starts_to_ends.get(start)
+            kind = LatexSegmentKind.INLINE_MATH if token.end() - start == 1 else LatexSegmentKind.DISPLAY_MATH
+        else:
+            kind = TOKENS_TO_GROUPS[token.lastgroup][2]
+            end = starts_to_ends.get(start)
+        if end is None or kind is None:
+            continue
+        if start > last_end:
+            segments.append(LatexSegment(LatexSegmentKind.TEXT, text[last_end:start]))
+        segments.append(LatexSegment(kind, text[start:end]))
+        last_end = end
+    if last_end < len(text):
+        segments.append(LatexSegment(LatexSegmentKind.TEXT, text[last_end:]))
+    return tuple(segments)
+
 
 TABLES_CHARS = {
     r'>': r'$>$',
@@ -136,6 +205,9 @@ def replace_non_utf8_chars(text):
 
 
 def process_inside_and_outside_command(latex, inside_func, outside_func):
+    if '\\caption' not in latex:
+        return outside_func(latex)
+
     # Split the latex string into parts outside and within \caption{...}
     parts = re.split(pattern=r'(\\caption\{.*?\})', string=latex)
 
@@ -150,34 +222,17 @@ def process_inside_and_outside_command(latex, inside_func, outside_func):
 
 
 def process_latex_text_and_math(text, process_text=replace_special_latex_chars, process_math=None):
+    """
+    Apply `process_text` to the text parts of the latex, and `process_math` to the math parts
+    (see `split_latex_text_and_math`).
+    Captions within math parts are processed as text.
+    """
     if process_math is None:
         process_math = lambda x: x
 
-    result = []
-    last_end = 0
-
-    for match in regex.finditer(MATH_PATTERN, text, flags=regex.VERBOSE):
-        non_math_part = text[last_end:match.start()]
-
-        processed_part = process_text(non_math_part)
-        result.append(processed_part)
-
-        possibly_math_part = match.group()
-        # find `\caption{...} parts in possibly_math_part and apply escaping on what's inside the curly braces
-        # apply process_math on possibly_math_part without the `\caption{...}` and then add the processed caption
-
-        processed_math_part = process_inside_and_outside_command(possibly_math_part, process_text, process_math)
-
-        result.append(processed_math_part)
-
-        last_end = match.end()
-
-    # Process the remaining non-math part after the last match
-    non_math_part = text[last_end:]
-    processed_part = process_text(non_math_part)
-    result.append(processed_part)
-
-    return "".join(result)
+    return ''.join(process_text(segment.text) if segment.kind is LatexSegmentKind.TEXT
+                   else process_inside_and_outside_command(segment.text, process_text, process_math)
+                   for segment in split_latex_text_and_math(text))
 
 
 def wrap_as_latex_code_output(paragraph):
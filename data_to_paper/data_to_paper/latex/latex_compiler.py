@@ -0,0 +1,247 @@
+"""
+Compile latex documents to pdf.
+
+Compilations are made cheaper in three ways:
+- Precompiled preamble: the part of the document before `END_OF_DUMP` (the packages and commands that
+  `LatexDocument` puts in all documents) is precompiled once into a latex format file (using `mylatexformat`),
+  which is then loaded instead of parsing the preamble on each compilation.
+- Minimal passes: bibtex, and the additional pdflatex passes, are only run if the document has citations or
+  cross-references.
+- Compilation cache: the results of compilations (the pdflatex output, or the compilation error) are cached
+  by the hash of the document and its bibliography (see `LATEX_COMPILATION_CACHE_FOLDER`).
+"""
+import hashlib
+import os
+import pickle
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Collection, List, Optional, Set
+
+from data_to_paper.env import LATEX_FORMATS_FOLDER, LATEX_COMPILATION_CACHE_FOLDER
+from data_to_paper.servers.custom_types import Citation, render_bib_file
+from data_to_paper.utils.file_utils import write_file_atomically
+
+# The preamble up to this line is precompiled (when not precompiled, this line does nothing):
+END_OF_DUMP = r'\csname endofdump\endcsname'
+
+BIB_FILENAME: str = 'citations.bib'
+PDFLATEX_PARAMS = ('--shell-escape', '-interaction=nonstopmode')
+
+CITATION_PATTERN = re.compile(r'\\cite[tp]?(?![a-zA-Z])')
+# Commands whose output is only resolved in a later pass:
+CROSS_REFERENCE_PATTERN = re.compile(
+    r'\\(?:cite[tp]?|ref|eqref|pageref|autoref|nameref|tableofcontents|listoftables|listoffigures)(?![a-zA-Z])')
+
+
+@dataclass
+class LatexCompilationResult:
+    pdflatex_output: str  # the output of the first pdflatex pass
+    is_error: bool = False  # pdflatex failed
+    pdf: Optional[bytes] = None  # only kept if the pdf was saved
+
+
+def _get_digest(*parts: Optional[str]) -> str:
+    return hashlib.sha256(repr(parts).encode('utf-8', errors='surrogatepass')).hexdigest()
+
+
+class LatexCompiler:
+    """
+    Compile latex documents to pdf (see module docstring).
+    """
+
+    def __init__(self):
+        self._pdflatex_version: Optional[str] = None
+        self._failed_format_names: Set[str] = set()
+        self._lock = threading.Lock()
+        self.num_compilations = 0
+        self.num_cache_hits = 0
+
+    def get_pdflatex_version(self) -> str:
+        if self._pdflatex_version is None:
+            try:
+                output = subprocess.run(['pdflatex', '--version'], check=True, stdout=subprocess.PIPE,
+                                        stderr=subprocess.PIPE).stdout
+                self._pdflatex_version = output.decode('utf-8', errors='replace').split('\n')[0]
+            except (OSError, subprocess.CalledProcessError):
+                self._pdflatex_version = ''
+        return self._pdflatex_version
+
+    def _create_format(self, preamble: str, format_path: Path) -> bool:
+        """
+        Precompile the preamble into the format file.
+        Return whether the format was created and can compile a document.
+        """
+        name = format_path.stem
+        with tempfile.TemporaryDirectory() as folder:
+            folder = Path(folder)
+            (folder / 'preamble.tex').write_text(preamble + END_OF_DUMP + '\n\\begin{document}\n\\end{document}\n')
+            (folder / 'check.tex').write_text(preamble + END_OF_DUMP + '\n\\begin{document}\nCheck\n\\end{document}\n')
+            try:
+                subprocess.run(['pdflatex', '-ini', '-interaction=nonstopmode', f'-jobname={name}', '&pdflatex',
+                                'mylatexformat.ltx', 'preamble.tex'],
+                               cwd=folder, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                subprocess.run(['pdflatex', *PDFLATEX_PARAMS, f'-fmt={name}', 'check.tex'],
+                               cwd=folder, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+                if not (folder / 'check.pdf').exists():
+                    return False
+                format_path.parent.mkdir(parents=True, exist_ok=True)
+                write_file_atomically(format_path, (folder / f'{name}.fmt').read_bytes())
+            except (OSError, subprocess.CalledProcessError):
+                return False
+        return True
+
+    def get_format_path(self, latex_content: str) -> Optional[Path]:
+        """
+        Return the format file of the preamble of the document, creating it if needed.
+        Return None if the document has no precompilable preamble, or if precompiling is disabled or fails.
+        """
+        preamble, end_of_dump, _ = latex_content.partition(END_OF_DUMP)
+        if not end_of_dump or LATEX_FORMATS_FOLDER.val is None:
+            return None
+        name = 'preamble_' + _get_digest(self.get_pdflatex_version(), preamble)[:32]
+        format_path = Path(LATEX_FORMATS_FOLDER.val) / f'{name}.fmt'
+        with self._lock:
+            if name in self._failed_format_names:
+                return None
+            if not format_path.exists() and not self._create_format(preamble, format_path):
+                self._failed_format_names.add(name)
+                return None
+        return format_path
+
+    @staticmethod
+    def _get_cache_path(key: str) -> Optional[Path]:
+        if LATEX_COMPILATION_CACHE_FOLDER.val is None:
+            return None
+        return Path(LATEX_COMPILATION_CACHE_FOLDER.val) / key[:2] / (key + '.pkl')
+
+    def _get_cached_result(self, key: str) -> Optional[LatexCompilationResult]:
+        cache_path = self._get_cache_path(key)
+        if cache_path is None or not cache_path.exists():
+            return None
+        try:
+            with open(cache_path, 'rb') as f:
+                return pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def _cache_result(self, key: str, result: LatexCompilationResult):
+        cache_path = self._get_cache_path(key)
+        if cache_path is None:
+            return
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        write_file_atomically(cache_path, pickle.dumps(result))
+
+    @staticmethod
+    def _save_files(output_directory: str, file_stem: str, latex_content: str, bib_content: Optional[str],
+                    pdf: Optional[bytes]):
+        output_directory = Path(output_directory)
+        if pdf is not None:
+            (output_directory / (file_stem + '.pdf')).write_bytes(pdf)
+        (output_directory / (file_stem + '.tex')).write_text(latex_content)
+        if bib_content is not None:
+            (output_directory / BIB_FILENAME).write_text(bib_content)
+
+    def _get_pdflatex_params(self, folder: Path, latex_content: str) -> List[str]:
+        """
+        Return the pdflatex command for compiling the document in the folder (using its precompiled preamble,
+        if available).
+        """
+        pdflatex_params = ['pdflatex', *PDFLATEX_PARAMS]
+        format_path = self.get_format_path(latex_content)
+        if format_path is not None:
+            try:
+                os.symlink(format_path, folder / format_path.name)
+            except OSError:
+                shutil.copyfile(format_path, folder / format_path.name)
+            pdflatex_params.append(f'-fmt={format_path.stem}')
+        return pdflatex_params
+
+    def _compile(self, latex_content: str, file_stem: str, bib_content: Optional[str], format_cite: bool,
+                 output_directory: Optional[str]) -> LatexCompilationResult:
+        from .latex_to_pdf import add_watermark_to_pdf, WATERMARK_PATH
+        self.num_compilations += 1
+        latex_file_name = file_stem + '.tex'
+        pdf_file_name = file_stem + '.pdf'
+        with tempfile.TemporaryDirectory() as folder:
+            folder = Path(folder)
+            pdflatex_params = self._get_pdflatex_params(folder, latex_content) + [latex_file_name]
+            if bib_content is not None:
+                (folder / BIB_FILENAME).write_text(bib_content)
+            (folder / latex_file_name).write_text(latex_content)
+            try:
+                pdflatex_output = subprocess.run(pdflatex_params, cwd=folder, check=True,
+                                                 stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            except subprocess.CalledProcessError as e:
+                return LatexCompilationResult(pdflatex_output=e.stdout.decode('utf-8', errors='replace'),
+                                              is_error=True)
+            pdflatex_output = pdflatex_output.stdout.decode('utf-8', errors='replace')
+
+            if format_cite:
+                try:
+                    if bib_content is not None and CITATION_PATTERN.search(latex_content):
+                        subprocess.run(['bibtex', file_stem], cwd=folder, check=True)
+                    if CROSS_REFERENCE_PATTERN.search(latex_content):
+                        subprocess.run(pdflatex_params, cwd=folder, check=True)
+                        subprocess.run(pdflatex_params, cwd=folder, check=True)
+                except subprocess.CalledProcessError:
+                    if output_directory is not None:
+                        pdf_path = folder / pdf_file_name
+                        self._save_files(output_directory, file_stem, latex_content, bib_content,
+                                         pdf_path.read_bytes() if pdf_path.exists() else None)
+                    raise
+
+            add_watermark_to_pdf(str(folder / pdf_file_name), WATERMARK_PATH)
+            pdf = (folder / pdf_file_name).read_bytes() if output_directory is not None else None
+        return LatexCompilationResult(pdflatex_output=pdflatex_output, pdf=pdf)
+
+    def compile(self, latex_content: str, file_stem: str, output_directory: Optional[str] = None,
+                references: Collection[Citation] = None, format_cite: bool = True) -> LatexCompilationResult:
+        """
+        Compile the latex document to pdf.
+        If `output_directory` is given (and the compilation succeeded), save the pdf, the latex and the bib files
+        to that directory.
+        """
+        bib_content = render_bib_file(references) if references else None
+        key = _get_digest(self.get_pdflatex_version(), latex_content, bib_content, file_stem, str(format_cite))
+        result = self._get_cached_result(key)
+        # compilation results without a pdf can only be reused if we do not need the pdf:
+        if result is not None and (result.is_error or result.pdf is not None or output_directory is None):
+            self.num_cache_hits += 1
+        else:
+            result = self._compile(latex_content, file_stem, bib_content, format_cite, output_directory)
+            self._cache_result(key, result)
+        if output_directory is not None and not result.is_error:
+            self._save_files(output_directory, file_stem, latex_content, bib_content, result.pdf)
+        return result
+
+    def compile_draft(self, latex_content: str) -> LatexCompilationResult:
+        """
+        Run a single draft-mode pdflatex pass (no pdf, no bibtex), for reading measurements from the pdflatex output.
+        """
+        key = _get_digest(self.get_pdflatex_version(), latex_content, 'draft')
+        result = self._get_cached_result(key)
+        if result is not None:
+            self.num_cache_hits += 1
+            return result
+        self.num_compilations += 1
+        with tempfile.TemporaryDirectory() as folder:
+            folder = Path(folder)
+            (folder / 'draft.tex').write_text(latex_content)
+            try:
+                pdflatex_output = subprocess.run(
+                    self._get_pdflatex_params(folder, latex_content) + ['-draftmode', 'draft.tex'],
+                    cwd=folder, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE).stdout
+                result = LatexCompilationResult(pdflatex_output=pdflatex_output.decode('utf-8', errors='replace'))
+            except subprocess.CalledProcessError as e:
+                result = LatexCompilationResult(pdflatex_output=e.stdout.decode('utf-8', errors='replace'),
+                                                is_error=True)
+        self._cache_result(key, result)
+        return result
+
+
+LATEX_COMPILER = LatexCompiler()
@@ -1,10 +1,13 @@
+import hashlib
 import re
 from dataclasses import dataclass, field
 from functools import partial
-from typing import List, Optional, Dict, Union, Iterable, Collection
+from typing import List, Optional, Dict, Union, Iterable, Collection, Tuple
 
 from data_to_paper.latex import save_latex_and_compile_to_pdf
 from data_to_paper.latex.clean_latex import process_latex_text_and_math
+from data_to_paper.latex.exceptions import LatexCompilationError
+from data_to_paper.latex.latex_compiler import END_OF_DUMP, LATEX_COMPILER
 from data_to_paper.latex.latex_to_pdf import evaluate_latex_num_command
 
 from data_to_paper.servers.custom_types import Citation
@@ -23,6 +26,11 @@ DEFAULT_PACKAGES = (
     '{sectsty}',
 )
 
+# Packages that do not work when precompiled (see `LatexCompiler`); these are loaded after the precompiled preamble:
+PACKAGES_NOT_TO_PRECOMPILE = (
+    '{hyperref}',
+)
+
 DEFAULT_INITIATION_COMMANDS = (r"""
 % Default fixed font does not support bold face
 \DeclareFixedFont{\ttb}{T1}{txtt}{bx}{n}{12} % for bold
@@ -181,29 +189,17 @@ class LatexDocument:
 
         return section
 
-    def get_document(self,
-                     content: Optional[Union[str, Iterable[str], Dict[Optional[str], str]]] = None,
-                     title: Optional[str] = None,
-                     abstract: Optional[str] = None,
-                     appendix: Optional[str] = None,
-                     author: Optional[str] = None,
-                     references: Collection[Citation] = None,
-                     format_cite: bool = True,
-                     add_before_document: Optional[str] = None,
-                     file_stem: str = None,
-                     output_directory: Optional[str] = None,
-                     raise_on_too_wide: bool = True,
-                     ) -> (str, str):
+    def get_latex(self,
+                  content: Optional[Union[str, Iterable[str], Dict[Optional[str], str]]] = None,
+                  title: Optional[str] = None,
+                  abstract: Optional[str] = None,
+                  appendix: Optional[str] = None,
+                  author: Optional[str] = None,
+                  references: Collection[Citation] = None,
+                  add_before_document: Optional[str] = None,
+                  ) -> str:
         """
-        Return the latex document as a string.
-
-        If `file_stem` is given, save the document to a file and compile it to pdf.
-
-        If `output_directory` is given, save the document to that directory.
-
-        If `output_directory` is None:
-            compile to pdf but do not save (checking for compilation errors).
-            `LatexCompilationError` is raised if there are errors.
+        Return the latex document as a string (without compiling it).
         """
 
         if isinstance(content, dict):
@@ -215,7 +211,8 @@ class LatexDocument:
         # Build the document:
         s = ''
         s += r"\documentclass[{fontsize}pt]{{{kind}}}".format(kind=self.kind, fontsize=self.fontsize) + '\n'
-        s += '\n'.join([r'\usepackage' + package for package in self.packages]) + '\n'
+        s += '\n'.join([r'\usepackage' + package for package in self.packages
+                       if package not in PACKAGES_NOT_TO_PRECOMPILE]) + '\n'
 
         s += '\\sectionfont{\\' + self.section_heading_fontsize + '}\n'
         s += '\\subsectionfont{\\' + self.subsection_heading_fontsize + '}\n'
@@ -223,6 +220,11 @@ class LatexDocument:
 
         s += '\n'.join(self.initiation_commands) + '\n'
 
+        # The preamble up to here is the same for all documents, and is precompiled:
+        s += END_OF_DUMP + '\n'
+        s += ''.join([r'\usepackage' + package + '\n' for package in self.packages
+                      if package in PACKAGES_NOT_TO_PRECOMPILE])
+
         # Define title, author:
         if title is not None and not title.startswith(r'\title'):
             title = r'\title{' + title + '}'
@@ -280,6 +282,35 @@ class LatexDocument:
 
         # End document:
         s += r'\end{document}' + '\n'
+        return s
+
+    def get_document(self,
+                     content: Optional[Union[str, Iterable[str], Dict[Optional[str], str]]] = None,
+                     title: Optional[str] = None,
+                     abstract: Optional[str] = None,
+                     appendix: Optional[str] = None,
+                     author: Optional[str] = None,
+                     references: Collection[Citation] = None,
+                     format_cite: bool = True,
+                     add_before_document: Optional[str] = None,
+                     file_stem: str = None,
+                     output_directory: Optional[str] = None,
+                     raise_on_too_wide: bool = True,
+                     ) -> (str, str):
+        """
+        Return the latex document as a string.
+
+        If `file_stem` is given, save the document to a file and compile it to pdf.
+
+        If `output_directory` is given, save the document to that directory.
+
+        If `output_directory` is None:
+            compile to pdf but do not save (checking for compilation errors).
+            `LatexCompilationError` is raised if there are errors.
+        """
+
+        s = self.get_latex(content=content, title=title, abstract=abstract, appendix=appendix, author=author,
+                           references=references, add_before_document=add_before_document)
 
         # Save and compile:
         pdf_output = save_latex_and_compile_to_pdf(s, file_stem=file_stem, output_directory=output_directory,
@@ -291,7 +322,10 @@ class LatexDocument:
         """
         Compile a latex table to pdf and return the width of the tabular part of the table,
         expressed as fraction of the page margin width.
+        If `output_directory` is None, the table is only measured (see `measure_tables`).
         """
+        if output_directory is None:
+            return self.measure_tables([latex_table])[0]
 
         lrbox_table = dedent_triple_quote_str(r"""
             % Define the save box within the document block
@@ -320,3 +354,64 @@ class LatexDocument:
         table_width = re.findall(pattern=r'Table width: (\d+\.\d+)pt', string=pdf_output)[0]
         marging_width = re.findall(pattern=r'Page margin width: (\d+\.\d+)pt', string=pdf_output)[0]
         return float(table_width) / float(marging_width)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state.pop('_table_keys_to_widths', None)
+        return state
+
+    def _get_tables_document(self, latex_tables: List[str]) -> str:
+        """
+        A document that typesets each table, and prints the width of its tabular part to the log.
+        """
+        content = r'\newsavebox{\mytablebox}' + '\n' + r'\typeout{Page margin width: \the\textwidth}' + '\n'
+        for i, latex_table in enumerate(latex_tables):
+            content += dedent_triple_quote_str(r"""
+                \begin{lrbox}{\mytablebox}
+                  <tabular>%
+                \end{lrbox}
+                \typeout{Table <i> width: \the\wd\mytablebox}
+                <table>
+                \clearpage
+                """).replace('<tabular>', get_tabular_block(latex_table)).replace('<table>', latex_table) \
+                .replace('<i>', str(i)) + '\n'
+        return self.get_latex(content=content)
+
+    def _measure_tables(self, keys_and_tables: List[Tuple[str, str]]) -> Optional[LatexCompilationError]:
+        """
+        Measure the tables in a single pdflatex pass, and cache their widths.
+        If the tables do not compile, bisect them, to isolate the tables that do not compile.
+        Return the error of the first table that does not compile.
+        """
+        latex = self._get_tables_document([latex_table for _, latex_table in keys_and_tables])
+        result = LATEX_COMPILER.compile_draft(latex)
+        if result.is_error:
+            if len(keys_and_tables) == 1:
+                return LatexCompilationError(latex_content=latex, pdflatex_output=result.pdflatex_output)
+            middle = len(keys_and_tables) // 2
+            first_error = self._measure_tables(keys_and_tables[:middle])
+            second_error = self._measure_tables(keys_and_tables[middle:])
+            return first_error or second_error
+        margin_width = float(re.findall(pattern=r'Page margin width: (\d+\.\d+)pt', string=result.pdflatex_output)[0])
+        indices_to_widths = dict(re.findall(pattern=r'Table (\d+) width: (\d+\.\d+)pt', string=result.pdflatex_output))
+        for i, (key, _) in enumerate(keys_and_tables):
+            self.__dict__['_table_keys_to_widths'][key] = float(indices_to_widths[str(i)]) / margin_width
+        return None
+
+    def measure_tables(self, latex_tables: List[str]) -> List[float]:
+        """
+        Return the widths of the tabular parts of the tables, expressed as fractions of the page margin width.
+
+        All the tables are measured in a single draft-mode pdflatex pass, and their widths are cached.
+        `LatexCompilationError` is raised for the first table that does not compile.
+        """
+        table_keys_to_widths = self.__dict__.setdefault('_table_keys_to_widths', {})
+        keys = [hashlib.sha256(self._get_tables_document([latex_table]).encode('utf-8')).hexdigest()
+                for latex_table in latex_tables]
+        keys_to_tables_to_measure = {key: latex_table for key, latex_table in zip(keys, latex_tables)
+                                     if key not in table_keys_to_widths}
+        if keys_to_tables_to_measure:
+            error = self._measure_tables(list(keys_to_tables_to_measure.items()))
+            if error is not None:
+                raise error
+        return [table_keys_to_widths[key] for key in keys]
@@ -1,14 +1,192 @@
+import hashlib
+import html
 import os
 import re
 import subprocess
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
 
+from data_to_paper.env import LATEX_TO_HTML_CACHE_FOLDER
 from data_to_paper.latex.clean_latex import process_latex_text_and_math
-from data_to_paper.utils.file_utils import run_in_temp_directory
+from data_to_paper.utils.file_utils import write_file_atomically
+
+DIR_PATH = os.path.dirname(os.path.realpath(__file__))
+LUA_FILTER_PATH = os.path.join(DIR_PATH, 'adjust_section.lua')
+TITLE_TEMPLATE_PATH = os.path.join(DIR_PATH, 'html_template_for_title_latex.html')
+TITLELESS_TEMPLATE_PATH = os.path.join(DIR_PATH, 'html_template_for_titleless_latex.html')
+
+# Separates latex blocks that are converted with a single pandoc run (pandoc converts it to a paragraph):
+BLOCK_SEPARATOR = 'DataToPaperLatexBlockSeparator'
+BLOCK_SEPARATOR_PATTERN = re.compile(r'\s*<p>' + BLOCK_SEPARATOR + r'</p>\s*')
+
+
+@lru_cache(maxsize=1)
+def get_pandoc_version() -> Optional[str]:
+    """
+    Return the pandoc version, or None if pandoc is not installed.
+    Pandoc is only probed once.
+    """
+    try:
+        output = subprocess.run(['pandoc', '--version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True,
+                                universal_newlines=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.split('\n')[0]
+
+
+def _is_title(latex: str) -> bool:
+    return re.search(r'\\title{(.+?)}', latex) is not None
+
+
+def _get_pandoc_command(is_title: bool, is_standalone: bool = True) -> List[str]:
+    command = ['pandoc', '-f', 'latex', '-t', 'html', '--lua-filter', LUA_FILTER_PATH]
+    if is_standalone:
+        command += ['-s', '--template', TITLE_TEMPLATE_PATH if is_title else TITLELESS_TEMPLATE_PATH]
+        if not is_title:
+            command += ['--metadata', 'title=Titleless LaTeX Document']
+    # To show citation commands (like '\\cite{ref1}'):
+    command += ['--citeproc']
+    return command
+
+
+class LatexToHtmlConverter:
+    """
+    Convert latex to html using pandoc.
+
+    Conversions are memoized by the hash of the latex: in memory (up to `max_memo_size`), and on disk
+    (in `LATEX_TO_HTML_CACHE_FOLDER`).
+    Multiple latex blocks can be converted with a single pandoc run (see `convert_many`).
+    """
+
+    def __init__(self, max_memo_size: int = 1024):
+        self.max_memo_size = max_memo_size
+        self._memo: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.num_pandoc_runs = 0
+
+    @staticmethod
+    def _get_key(latex: str) -> str:
+        return hashlib.sha256(latex.encode('utf-8', errors='surrogatepass')).hexdigest()
+
+    @staticmethod
+    def _get_cache_path(key: str) -> Optional[Path]:
+        if LATEX_TO_HTML_CACHE_FOLDER.val is None:
+            return None
+        return Path(LATEX_TO_HTML_CACHE_FOLDER.val) / key[:2] / (key + '.html')
+
+    def _get_cached(self, key: str) -> Optional[str]:
+        with self._lock:
+            if key in self._memo:
+                self._memo.move_to_end(key)
+                return self._memo[key]
+        cache_path = self._get_cache_path(key)
+        if cache_path is None or not cache_path.exists():
+            return None
+        try:
+            converted = cache_path.read_text(encoding='utf-8')
+        except OSError:
+            return None
+        self._memoize(key, converted)
+        return converted
+
+    def _memoize(self, key: str, converted: str):
+        with self._lock:
+            self._memo[key] = converted
+            self._memo.move_to_end(key)
+            while len(self._memo) > self.max_memo_size:
+                self._memo.popitem(last=False)
+
+    def _cache(self, key: str, converted: str):
+        self._memoize(key, converted)
+        cache_path = self._get_cache_path(key)
+        if cache_path is not None:
+            cache_path.parent.mkdir(parents=True, exist_ok=True)
+            write_file_atomically(cache_path, converted.encode('utf-8'))
+
+    def _run_pandoc(self, command: List[str], latex: str) -> str:
+        self.num_pandoc_runs += 1
+        return subprocess.run(command, input=latex, stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True,
+                              universal_newlines=True).stdout
+
+    def _convert(self, latex: str) -> str:
+        processed_latex = process_latex_text_and_math(latex)
+        try:
+            return self._run_pandoc(_get_pandoc_command(_is_title(latex)), processed_latex)
+        except subprocess.CalledProcessError:
+            # In case of an error, return the raw latex with proper escaping for HTML
+            return html.escape(processed_latex)
+
+    def _convert_titleless_batch(self, latexes: List[str]) -> Optional[List[str]]:
+        """
+        Convert titleless latex blocks with a single pandoc run.
+        Return None if the batch could not be converted (then, the blocks should be converted one by one).
+        """
+        separator = '\n\n' + BLOCK_SEPARATOR + '\n\n'
+        try:
+            output = self._run_pandoc(_get_pandoc_command(is_title=False, is_standalone=False),
+                                      separator.join(process_latex_text_and_math(latex) for latex in latexes))
+        except subprocess.CalledProcessError:
+            return None
+        bodies = BLOCK_SEPARATOR_PATTERN.split(output)
+        if len(bodies) != len(latexes):
+            return None
+        template = Path(TITLELESS_TEMPLATE_PATH).read_text()
+        return [template.replace('$body$', body.strip()) for body in bodies]
+
+    def _check_pandoc(self):
+        if get_pandoc_version() is None:
+            raise FileNotFoundError("Pandoc is not installed. Please install Pandoc to use this feature.")
+
+    def convert(self, latex: str) -> str:
+        return self.convert_many([latex])[0]
+
+    def convert_many(self, latexes: List[str]) -> List[str]:
+        """
+        Convert latex blocks to html.
+        Blocks that are not cached are converted with a single pandoc run.
+        """
+        from data_to_paper.research_types.hypothesis_testing.coding.original_utils.to_latex_with_note import \
+            get_html_from_latex_table
+        keys_to_converted: Dict[str, str] = {}
+        keys_to_latexes_to_convert: Dict[str, str] = {}
+        keys = []
+        for latex in latexes:
+            key = self._get_key(latex)
+            keys.append(key)
+            if key in keys_to_converted or key in keys_to_latexes_to_convert:
+                continue
+            converted = get_html_from_latex_table(latex) or self._get_cached(key)
+            if converted:
+                keys_to_converted[key] = converted
+            else:
+                keys_to_latexes_to_convert[key] = latex
+
+        if keys_to_latexes_to_convert:
+            self._check_pandoc()
+            titleless_keys = [key for key, latex in keys_to_latexes_to_convert.items() if not _is_title(latex)]
+            if len(titleless_keys) > 1:
+                converted_batch = self._convert_titleless_batch(
+                    [keys_to_latexes_to_convert[key] for key in titleless_keys])
+                if converted_batch is not None:
+                    for key, converted in zip(titleless_keys, converted_batch):
+                        self._cache(key, converted)
+                        keys_to_converted[key] = converted
+            for key, latex in keys_to_latexes_to_convert.items():
+                if key not in keys_to_converted:
+                    keys_to_converted[key] = self._convert(latex)
+                    self._cache(key, keys_to_converted[key])
+        return [keys_to_converted[key] for key in keys]
+
+
+LATEX_TO_HTML_CONVERTER = LatexToHtmlConverter()
 
 
 def convert_latex_to_html(latex: str) -> str:
     """
-    Convert LaTeX text to HTML using Pandoc through pypandoc.
+    Convert LaTeX text to HTML using Pandoc.
 
     Parameters:
     - latex (str): A string containing LaTeX code.
@@ -16,52 +194,11 @@ def convert_latex_to_html(latex: str) -> str:
     Returns:
     - str: The converted HTML text.
     """
+    return LATEX_TO_HTML_CONVERTER.convert(latex)
 
-    from data_to_paper.research_types.hypothesis_testing.coding.original_utils.to_latex_with_note import \
-        get_html_from_latex_table
-    html = get_html_from_latex_table(latex)
-    if html:
-        return html
-
-    # check if pandoc is installed
-    try:
-        subprocess.run(['pandoc', '--version'], stdout=subprocess.PIPE, stderr=subprocess.PIPE, check=True)
-    except FileNotFoundError:
-        raise FileNotFoundError("Pandoc is not installed. Please install Pandoc to use this feature.")
-
-    is_title = re.search(r'\\title{(.+?)}', latex)
-    dir_path = os.path.dirname(os.path.realpath(__file__))
-    tex_file = 'temp.tex'
-    command = [
-        'pandoc', '-s', tex_file,
-        '--lua-filter', os.path.join(dir_path, 'adjust_section.lua'),
-        '-t', 'html'
-    ]
-
-    # Get the html template:
-    if is_title:
-        template_name = 'html_template_for_title_latex.html'
-    else:
-        template_name = 'html_template_for_titleless_latex.html'
-    template_path = os.path.join(dir_path, template_name)
-    command += ['--template', template_path]
-
-    if not is_title:
-        command += ['--metadata', 'title=Titleless LaTeX Document']
-
-    # To show citation commands (like '\\cite{ref1}'):
-    command += ['--citeproc']
 
-    try:
-        with run_in_temp_directory():
-            # process latex and escape special characters
-            latex = process_latex_text_and_math(latex)
-            # Write the LaTeX into a temporary file
-            with open(tex_file, 'w') as f:
-                f.write(latex)
-            # Convert using Pandoc
-            html_output = subprocess.check_output(command, universal_newlines=True)
-            return html_output
-    except subprocess.CalledProcessError:
-        # In case of an error, return the raw latex with proper escaping for HTML
-        return html.escape(latex)
+def convert_latexes_to_html(latexes: List[str]) -> List[str]:
+    """
+    Convert multiple LaTeX blocks to HTML, with a single Pandoc run.
+    """
+    return LATEX_TO_HTML_CONVERTER.convert_many(latexes)
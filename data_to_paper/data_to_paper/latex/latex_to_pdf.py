@@ -1,20 +1,17 @@
 import os
-import shutil
-import subprocess
 import fitz  # PyMuPDF
 import numpy as np
 
 from typing import Optional, Collection, Tuple, Dict
 
 from data_to_paper.servers.custom_types import Citation
-from data_to_paper.utils.file_utils import run_in_temp_directory
 from data_to_paper.code_and_output_files.ref_numeric_values import replace_hyperlinks_with_values
 from data_to_paper.utils.text_extractors import extract_all_external_brackets
 
 from .exceptions import LatexCompilationError, TooWideTableOrText, LatexNumCommandFormulaEvalError, \
     LatexNestedNumCommandError, LatexNumCommandNoExplanation, PlainNumberLatexNumCommandError
+from .latex_compiler import LATEX_COMPILER
 
-BIB_FILENAME: str = 'citations.bib'
 WATERMARK_PATH: str = os.path.join(os.path.dirname(__file__), 'watermark.pdf')
 
 
@@ -110,58 +107,13 @@ def add_watermark_to_pdf(pdf_path: str, watermark_path: str, output_path: str =
 def save_latex_and_compile_to_pdf(latex_content: str, file_stem: str, output_directory: Optional[str] = None,
                                   references: Collection[Citation] = None, format_cite: bool = True,
                                   raise_on_too_wide: bool = True) -> str:
-    references = references or set()
-    should_compile_with_bib = len(references) > 0
-    latex_file_name = file_stem + '.tex'
-    pdflatex_params = ['pdflatex', '--shell-escape', '-interaction=nonstopmode', latex_file_name]
-    with run_in_temp_directory():
-
-        # Create the bib file:
-        if should_compile_with_bib:
-            references_bibtex = [reference.bibtex for reference in references]
-            with open(BIB_FILENAME, 'w') as f:
-                f.write('\n\n'.join(references_bibtex))
-
-        with open(latex_file_name, 'w') as f:
-            f.write(latex_content)
-        try:
-            pdflatex_output = subprocess.run(pdflatex_params,
-                                             check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        except subprocess.CalledProcessError as e:
-            raise LatexCompilationError(latex_content=latex_content,
-                                        pdflatex_output=e.stdout.decode('utf-8', errors='replace'))
-
-        pdflatex_output = pdflatex_output.stdout.decode('utf-8', errors='replace')
-
-        if format_cite:
-            try:
-                if should_compile_with_bib:
-                    subprocess.run(['bibtex', file_stem], check=True)
-                subprocess.run(pdflatex_params, check=True)
-                subprocess.run(pdflatex_params, check=True)
-            except subprocess.CalledProcessError:
-                _move_latex_and_pdf_to_output_directory(file_stem, output_directory, latex_file_name)
-                raise
-
-        add_watermark_to_pdf(file_stem + '.pdf', WATERMARK_PATH)
-
-        _move_latex_and_pdf_to_output_directory(file_stem, output_directory, latex_file_name)
-
-        if r'Overfull \hbox' in pdflatex_output and raise_on_too_wide:
-            raise TooWideTableOrText(latex_content=latex_content,
-                                     pdflatex_output=pdflatex_output)
-
-        return pdflatex_output
-
-
-def _move_latex_and_pdf_to_output_directory(file_stem: str, output_directory: str = None, latex_file_name: str = None):
-    # Move the pdf and the latex and the citation file to the original directory:
+    result = LATEX_COMPILER.compile(latex_content, file_stem=file_stem, output_directory=output_directory,
+                                    references=references, format_cite=format_cite)
+    if result.is_error:
+        raise LatexCompilationError(latex_content=latex_content, pdflatex_output=result.pdflatex_output)
 
-    def move_if_exists(file_name):
-        if os.path.exists(file_name):
-            shutil.move(file_name, output_directory)
+    if r'Overfull \hbox' in result.pdflatex_output and raise_on_too_wide:
+        raise TooWideTableOrText(latex_content=latex_content,
+                                 pdflatex_output=result.pdflatex_output)
 
-    if output_directory is not None:
-        move_if_exists(file_stem + '.pdf')
-        move_if_exists(latex_file_name)
-        move_if_exists('citations.bib')
+    return result.pdflatex_output
@@ -4,7 +4,7 @@ from typing import Optional, Dict
 import pandas as pd
 
 from data_to_paper.latex.clean_latex import replace_special_latex_chars, process_latex_text_and_math
-from data_to_paper.run_gpt_code.overrides.pvalue import OnStr, OnStrPValue
+from data_to_paper.run_gpt_code.overrides.pvalue import OnStr, OnStrPValue, PValue, format_p_values_in_df
 from data_to_paper.utils.text_numeric_formatting import round_floats
 from data_to_paper.utils.dataframe import extract_df_axes_labels
 
@@ -60,11 +60,12 @@ def to_latex_with_note(df: pd.DataFrame, filename: Optional[str], caption: str =
     Same as df.to_latex, but with a note and legend.
     """
     with OnStrPValue(pvalue_on_str):
-        regular_latex_table = df.to_latex(None, caption=None, label=None, multirow=False, multicolumn=False, **kwargs)
+        regular_latex_table = format_p_values_in_df(df, PValue.ON_STR).to_latex(
+            None, caption=None, label=None, multirow=False, multicolumn=False, **kwargs)
 
     pvalue_on_str_html = OnStr.SMALLER_THAN if pvalue_on_str == OnStr.LATEX_SMALLER_THAN else pvalue_on_str
     with OnStrPValue(pvalue_on_str_html):
-        regular_html_table = df.to_html(None, border=0, justify='left')
+        regular_html_table = format_p_values_in_df(df, PValue.ON_STR).to_html(None, border=0, justify='left')
 
     index = kwargs.get('index', True)
 
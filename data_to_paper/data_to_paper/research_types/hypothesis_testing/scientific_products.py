@@ -281,11 +281,13 @@ class ScientificProducts(Products):
             'research_goal': ProductGenerator(
                 lambda: self.research_goal,
                 {},
+                ScientificStage.GOAL,
             ),
 
             'hypothesis_testing_plan': ProductGenerator(
                 lambda: self.hypothesis_testing_plan,
                 {},
+                ScientificStage.PLAN,
             ),
 
             # LITERATURE SEARCH
@@ -294,22 +296,26 @@ class ScientificProducts(Products):
             'literature_search:{}': ProductGenerator(
                 lambda stage: self.literature_search[stage],
                 lambda stage: dict(stage=stage, scope=None),
+                lambda stage: self.literature_search[stage].stage,
             ),
 
             'literature_search:{}:{}': ProductGenerator(
                 lambda stage, scope: self.literature_search[stage],
                 lambda stage, scope: dict(stage=stage, scope=scope),
+                lambda stage, scope: self.literature_search[stage].stage,
             ),
 
             'most_similar_papers': ProductGenerator(
                 lambda: self.most_similar_papers,
                 {},
+                ScientificStage.ASSESS_NOVELTY,
             ),
 
             'novelty_assessment': ProductGenerator(
                 lambda: NoveltySummaryProduct(novelty_assessment=self.novelty_assessment,
                                               most_similar_papers=self.most_similar_papers),
                 {},
+                ScientificStage.ASSESS_NOVELTY,
             ),
 
             # CODE
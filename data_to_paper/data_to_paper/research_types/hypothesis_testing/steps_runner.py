@@ -1,5 +1,5 @@
 from dataclasses import dataclass, field
-from typing import Type
+from typing import Type, Tuple
 
 from data_to_paper.base_steps import DirectorProductGPT, CheckLatexCompilation, DataStepRunner
 
@@ -27,6 +27,20 @@ SECTIONS_WITH_CITATIONS = ['introduction', 'discussion']
 SKIP_STAGE_MESSAGE = 'This stage was skipped because the goal was provided by the user.'
 
 
+def _get_background_product_fields(*converser_classes) -> Tuple[str, ...]:
+    """
+    Return the product fields read by the given converser classes, including the literature search from which
+    they take citations.
+    """
+    product_fields = []
+    for converser_class in converser_classes:
+        product_fields.extend(converser_class.background_product_fields or ())
+        allow_citations_from_step = getattr(converser_class, 'allow_citations_from_step', None)
+        if allow_citations_from_step is not None:
+            product_fields.append('literature_search:' + allow_citations_from_step)
+    return tuple(product_fields)
+
+
 @dataclass
 class HypothesisTestingStepsRunner(DataStepRunner, CheckLatexCompilation):
     PROJECT_PARAMETERS_FILENAME = 'data-to-paper-hypothesis-testing.json'
@@ -79,6 +93,29 @@ class HypothesisTestingStepsRunner(DataStepRunner, CheckLatexCompilation):
             ScientificStage.COMPILE: self._compile_paper,
         }
 
+        # GOAL and ASSESS_NOVELTY may redirect the run, DATA talks with the director, and COMPILE assembles the
+        # whole paper; these stages are not declared, so they run alone.
+        # Until WRITING_TITLE_AND_ABSTRACT, the 'title_and_abstract' product is the draft written in INTERPRETATION.
+        self.stages_to_background_product_fields = {
+            ScientificStage.EXPLORATION: _get_background_product_fields(
+                DataExplorationCodeProductsGPT, RequestCodeExplanation),
+            ScientificStage.LITERATURE_REVIEW_GOAL: _get_background_product_fields(GoalLiteratureSearchReviewGPT),
+            ScientificStage.PLAN: _get_background_product_fields(HypothesesTestingPlanReviewGPT),
+            ScientificStage.CODE: _get_background_product_fields(
+                DataAnalysisCodeProductsGPT, RequestCodeExplanation),
+            ScientificStage.TABLES: _get_background_product_fields(CreateLatexTablesCodeProductsGPT),
+            ScientificStage.INTERPRETATION: _get_background_product_fields(FirstTitleAbstractSectionWriterReviewGPT),
+            ScientificStage.LITERATURE_REVIEW_WRITING:
+                _get_background_product_fields(WritingLiteratureSearchReviewGPT) + ('title_and_abstract_first', ),
+            ScientificStage.WRITING_RESULTS:
+                _get_background_product_fields(ResultsSectionWriterReviewGPT) + ('title_and_abstract_first', ),
+            ScientificStage.WRITING_TITLE_AND_ABSTRACT:
+                _get_background_product_fields(SecondTitleAbstractSectionWriterReviewGPT),
+            ScientificStage.WRITING_METHODS: _get_background_product_fields(MethodsSectionWriterReviewGPT),
+            ScientificStage.WRITING_INTRODUCTION: _get_background_product_fields(IntroductionSectionWriterReviewGPT),
+            ScientificStage.WRITING_DISCUSSION: _get_background_product_fields(DiscussionSectionWriterReviewGPT),
+        }
+
     """
     Stage functions
     """
@@ -1,21 +1,31 @@
+import functools
 import pickle
 import os
 import hashlib
+import threading
 import time
 import traceback
 
 from traceback import FrameSummary
 
-from contextlib import contextmanager
-from dataclasses import asdict, dataclass
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from dataclasses import asdict, dataclass, field
 
 from pathlib import Path
-from typing import Union
+from typing import Union, Optional, Tuple, Any, Dict, List
 
-from data_to_paper.env import DELAY_CODE_RUN_CACHE_RETRIEVAL
+from data_to_paper.env import DELAY_CODE_RUN_CACHE_RETRIEVAL, FILE_FINGERPRINTS_FILEPATH, FILE_FINGERPRINT_HASH_NAME
 from data_to_paper.utils.file_utils import run_in_directory
 from data_to_paper.utils.print_to_file import print_and_log
 
+from .run_cache_store import get_run_cache_store
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
 
 def old_directory_hash(directory):
     """Create a hash based on all files in the directory."""
@@ -35,31 +45,185 @@ def directory_hash(directory):
     """
     Create a hash based on all files in the directory, hashing only the relative path of each file
     from the specified directory.
+    The hash is memoized by the size and modification time of the files, so unchanged files are not re-read.
     """
-    hasher = hashlib.sha256()
     root_dir = os.path.abspath(directory)
-    all_files = []
+    files_signature = []
 
     # Walk the directory tree and capture all file paths
     for path, dirs, files in os.walk(root_dir):
         for file in files:
             full_path = os.path.join(path, file)
             relative_path = os.path.relpath(full_path, start=directory)  # Compute the relative path
-            all_files.append((relative_path, full_path))  # Store both relative and full path
+            stat = os.stat(full_path)
+            files_signature.append((relative_path, stat.st_size, stat.st_mtime_ns))
 
     # Sort all file paths by relative path
-    all_files.sort(key=lambda x: x[0])
+    files_signature.sort(key=lambda x: x[0])
+    return _hash_directory_files(root_dir, tuple(files_signature))
 
-    # Hash each file's relative path and contents
-    for relative_path, full_path in all_files:
+
+@functools.lru_cache(maxsize=128)
+def _hash_directory_files(root_dir: str, files_signature: tuple) -> str:
+    """
+    Hash each file's relative path and contents.
+    files_signature: sorted tuple of (relative_path, size, mtime_ns) of the files in the directory.
+    """
+    hasher = hashlib.sha256()
+    for relative_path, _, _ in files_signature:
         hasher.update(relative_path.encode('utf-8'))
-        with open(full_path, 'rb') as file:
+        with open(os.path.join(root_dir, relative_path), 'rb') as file:
             while chunk := file.read(8192):
                 hasher.update(chunk)
-
     return hasher.hexdigest()
 
 
+def _get_hasher(hash_name: str):
+    if hash_name == 'xxh3_128':
+        if xxhash is None:
+            raise ImportError("The 'xxh3_128' file fingerprint requires installing xxhash.")
+        return xxhash.xxh3_128()
+    return hashlib.new(hash_name, digest_size=16) if hash_name.startswith('blake2') else hashlib.new(hash_name)
+
+
+@dataclass
+class FingerprintStats:
+    num_files_hashed: int = 0
+    num_bytes_hashed: int = 0
+    num_files_skipped: int = 0
+    num_bytes_skipped: int = 0
+
+
+@dataclass
+class FileFingerprinter:
+    """
+    Fingerprint files and directories, re-hashing only files that changed since they were last hashed.
+
+    We keep a table of `path -> (size, mtime_ns, inode, digest)`. A file whose size, modification time and inode
+    are unchanged is not re-read. The table is kept persistently in `table_filepath`.
+
+    Files larger than `chunk_size` are hashed in chunks (in parallel, using `max_workers` threads); their digest is
+    the hash of the digests of their chunks.
+    """
+    table_filepath: Optional[Union[str, Path]] = None
+    hash_name: str = 'blake2b'
+    chunk_size: int = 64 * 2 ** 20
+    max_workers: int = 4
+
+    stats: FingerprintStats = field(default_factory=FingerprintStats)
+    _table: Optional[Dict[str, Tuple[int, int, int, str]]] = field(default=None, init=False, repr=False)
+    _is_table_changed: bool = field(default=False, init=False, repr=False)
+    _lock: threading.RLock = field(default_factory=threading.RLock, init=False, repr=False)
+
+    def _get_table(self) -> Dict[str, Tuple[int, int, int, str]]:
+        if self._table is None:
+            self._table = {}
+            if self.table_filepath is not None and os.path.exists(self.table_filepath):
+                try:
+                    with open(self.table_filepath, 'rb') as f:
+                        hash_name, table = pickle.load(f)
+                except Exception:
+                    hash_name, table = None, {}
+                if hash_name == self.hash_name:
+                    # drop entries of files that no longer exist:
+                    self._table = {path: entry for path, entry in table.items() if os.path.exists(path)}
+        return self._table
+
+    def save(self):
+        with self._lock:
+            if self.table_filepath is None or not self._is_table_changed:
+                return
+            os.makedirs(os.path.dirname(self.table_filepath), exist_ok=True)
+            temp_filepath = f'{self.table_filepath}.{os.getpid()}.tmp'
+            with open(temp_filepath, 'wb') as f:
+                pickle.dump((self.hash_name, self._get_table()), f)
+            os.replace(temp_filepath, self.table_filepath)
+            self._is_table_changed = False
+
+    def _hash_chunk(self, file_path: str, offset: int) -> bytes:
+        hasher = _get_hasher(self.hash_name)
+        with open(file_path, 'rb') as file:
+            file.seek(offset)
+            remaining = self.chunk_size
+            while remaining and (chunk := file.read(min(remaining, 2 ** 20))):
+                hasher.update(chunk)
+                remaining -= len(chunk)
+        return hasher.digest()
+
+    def _hash_file(self, file_path: str, size: int) -> str:
+        offsets = range(0, size, self.chunk_size)
+        if len(offsets) <= 1:
+            return self._hash_chunk(file_path, 0).hex()
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            chunk_digests = list(executor.map(lambda offset: self._hash_chunk(file_path, offset), offsets))
+        hasher = _get_hasher(self.hash_name)
+        for chunk_digest in chunk_digests:
+            hasher.update(chunk_digest)
+        return hasher.hexdigest()
+
+    def get_file_digest(self, file_path: Union[str, Path]) -> str:
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        signature = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        with self._lock:
+            entry = self._get_table().get(file_path)
+        if entry is not None and entry[:3] == signature:
+            self.stats.num_files_skipped += 1
+            self.stats.num_bytes_skipped += stat.st_size
+            return entry[3]
+        digest = self._hash_file(file_path, stat.st_size)
+        self.stats.num_files_hashed += 1
+        self.stats.num_bytes_hashed += stat.st_size
+        with self._lock:
+            self._get_table()[file_path] = signature + (digest, )
+            self._is_table_changed = True
+        return digest
+
+    def register_copy(self, source_path: Union[str, Path], target_path: Union[str, Path]):
+        """
+        Register that the target file is a copy of the source file, so that it does not need to be hashed.
+        """
+        digest = self.get_file_digest(source_path)
+        stat = os.stat(target_path)
+        with self._lock:
+            self._get_table()[os.path.abspath(target_path)] = (stat.st_size, stat.st_mtime_ns, stat.st_ino, digest)
+            self._is_table_changed = True
+        self.save()
+
+    def get_directory_fingerprint(self, directory: Union[str, Path]) -> str:
+        """
+        Return the fingerprint of the relative paths and the contents of all the files in the directory.
+        """
+        root_dir = os.path.abspath(directory)
+        relative_paths_and_digests: List[Tuple[str, str]] = []
+        for path, dirs, files in os.walk(root_dir):
+            for file in files:
+                full_path = os.path.join(path, file)
+                relative_paths_and_digests.append((os.path.relpath(full_path, start=root_dir),
+                                                   self.get_file_digest(full_path)))
+        relative_paths_and_digests.sort()
+        hasher = _get_hasher(self.hash_name)
+        for relative_path, digest in relative_paths_and_digests:
+            hasher.update(relative_path.encode('utf-8'))
+            hasher.update(digest.encode('utf-8'))
+        self.save()
+        return f'{self.hash_name}:{hasher.hexdigest()}'
+
+
+_FILE_FINGERPRINTERS: Dict[Tuple[Optional[str], str], FileFingerprinter] = {}
+
+
+def get_file_fingerprinter() -> FileFingerprinter:
+    """
+    Return the file fingerprinter for the current FILE_FINGERPRINTS_FILEPATH and FILE_FINGERPRINT_HASH_NAME.
+    """
+    table_filepath = FILE_FINGERPRINTS_FILEPATH.val
+    key = (None if table_filepath is None else str(table_filepath), FILE_FINGERPRINT_HASH_NAME.val)
+    if key not in _FILE_FINGERPRINTERS:
+        _FILE_FINGERPRINTERS[key] = FileFingerprinter(table_filepath=key[0], hash_name=key[1])
+    return _FILE_FINGERPRINTERS[key]
+
+
 def _read_file(filename):
     with open(filename, 'rb') as f:
         return f.read()
@@ -70,16 +234,22 @@ def _write_file(filename, content):
         f.write(content)
 
 
-def _read_files(filenames):
+def _read_files(filenames, directory=None):
     file_contents = {}
     for fname in filenames:
-        file_contents[fname] = _read_file(fname)
+        file_contents[fname] = _read_file(os.path.join(directory or '', fname))
     return file_contents
 
 
-def _write_files(filenames):
+def _write_files(filenames, directory=None):
     for fname, content in filenames.items():
-        _write_file(fname, content)
+        _write_file(os.path.join(directory or '', fname), content)
+
+
+@functools.lru_cache(maxsize=1)
+def _load_legacy_cache(filename: str, mtime_ns: int) -> dict:
+    with open(filename, 'rb') as f:
+        return pickle.load(f)
 
 
 # TODO: hack for python version compatibility. Remove when possible.
@@ -103,17 +273,29 @@ class CacheRunToFile:
     A class that caches the results of a 'run' method to a file.
     Also caches the files created during the run.
     Files pre-existing in the run directory are considered part of the run input.
+
+    The results are kept in a content-addressed store next to `cache_filepath` (see `RunCacheStore`).
+    A legacy cache file (a single pickle of all the results) at `cache_filepath` is still read, but not written.
+
+    `chdir_on_run` determines whether `_run` is called from within the run directory. Subclasses that do not need it
+    should set it to False, allowing runs in different directories to take place concurrently (`os.chdir` affects
+    all threads).
     """
+    chdir_on_run = True
+
     cache_filepath: Union[str, Path] = None  # Path to the cache file, or None to disable caching
 
     def _get_instance_key(self) -> tuple:
         return tuple(asdict(self).values())
 
     def _get_run_directory_key(self) -> tuple:
-        return (directory_hash(self._get_run_directory()), )
+        return (get_file_fingerprinter().get_directory_fingerprint(self._get_run_directory()), )
 
-    def _get_run_directory_old_key(self) -> tuple:
-        return (old_directory_hash(self._get_run_directory()), )
+    def _get_run_directory_legacy_keys(self) -> List[tuple]:
+        """
+        The keys of the run directory in legacy cache files.
+        """
+        return [(directory_hash(self._get_run_directory()), ), (old_directory_hash(self._get_run_directory()), )]
 
     def _get_run_directory(self):
         raise NotImplementedError
@@ -121,17 +303,18 @@ class CacheRunToFile:
     def _run(self, *args, **kwargs):
         raise NotImplementedError
 
-    def _load_cache(self, filename=None):
-        filename = filename or self.cache_filepath
-        if os.path.exists(filename):
-            with open(filename, 'rb') as f:
-                return pickle.load(f)
-        return {}
-
-    def _dump_cache(self, cache, filename=None):
-        filename = filename or self.cache_filepath
-        with open(filename, 'wb') as f:
-            pickle.dump(cache, f)
+    def _get_from_legacy_cache(self, instance_key: tuple, args_key: tuple) -> Optional[Tuple[Any, Dict[str, bytes]]]:
+        """
+        Look up the run in the legacy cache file, where it is keyed by the (slow to compute) legacy directory keys.
+        """
+        cache = _load_legacy_cache(str(self.cache_filepath), os.stat(self.cache_filepath).st_mtime_ns)
+        if not any(key[:len(instance_key)] == instance_key for key in cache):
+            return None
+        for run_directory_key in self._get_run_directory_legacy_keys():
+            key = instance_key + run_directory_key + args_key
+            if key in cache:
+                return cache[key]
+        return None
 
     def run(self, *args, **kwargs):
         """
@@ -140,53 +323,52 @@ class CacheRunToFile:
         if self.cache_filepath is None:
             return self._run(*args, **kwargs)
 
-        cache = self._load_cache()
-        key = self._get_instance_key() + self._get_run_directory_key() \
-            + tuple(args) + tuple(kwargs.items())
-
-        old_key = self._get_instance_key() + self._get_run_directory_old_key() \
-            + tuple(args) + tuple(kwargs.items())
-
-        if old_key in cache:
-            # replace old key with new key
-            print(f"{self.__class__.__name__}: Replacing old key with new key.")
-            cache[key] = cache.pop(old_key)
-            self._dump_cache(cache)
-
-        if key in cache:
+        store = get_run_cache_store(self.cache_filepath)
+        run_directory = self._get_run_directory()
+        if run_directory is not None:
+            run_directory = os.path.abspath(run_directory)
+        instance_key = self._get_instance_key()
+        args_key = tuple(args) + tuple(kwargs.items())
+        key = instance_key + self._get_run_directory_key() + args_key
+
+        cached = store.get(key)
+        if cached is None and os.path.exists(self.cache_filepath):
+            cached = self._get_from_legacy_cache(instance_key, args_key)
+            if cached is not None:
+                # migrate the entry to the store:
+                store.put(key, *cached)
+                cached = store.get(key)
+
+        if cached is not None:
             print_and_log(f"{self.__class__.__name__}: Using cached output.")
             time.sleep(DELAY_CODE_RUN_CACHE_RETRIEVAL.val)
-            results, filenames = cache[key]
-            with run_in_directory(self._get_run_directory()):
-                _write_files(filenames)
+            results, filenames = cached
+            _write_files(filenames, run_directory)
             return results
 
         print_and_log(f"{self.__class__.__name__}: Running and caching output.")
         # Call the function and cache the result along with any created files
-        with run_in_directory(self._get_run_directory()):
-            with get_created_files() as created_files:
+        with run_in_directory(run_directory) if self.chdir_on_run else nullcontext():
+            with get_created_files(run_directory) as created_files:
                 results = self._run(*args, **kwargs)
-            file_contents = _read_files(created_files)
-
-        # Update cache
-        cache[key] = (results, file_contents)
-        self._dump_cache(cache)
+        file_contents = _read_files(created_files, run_directory)
 
+        store.put(key, results, file_contents)
         return results
 
 
 @contextmanager
-def get_created_files():
+def get_created_files(directory=None):
     """
-    Context manager for returning all new files created in the current directory.
+    Context manager for returning all new files created in the given directory (default: the current directory).
     Files are returned as a sorted list of filenames.
     Note: The files are not deleted after the context manager exits.
     """
-    preexisting_files = set(os.listdir())
+    preexisting_files = set(os.listdir(directory))
     created_files = []
     try:
         yield created_files
     finally:
-        for filename in sorted(os.listdir()):
+        for filename in sorted(os.listdir(directory)):
             if filename not in preexisting_files:
                 created_files.append(filename)
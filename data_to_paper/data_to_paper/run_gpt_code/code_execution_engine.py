@@ -0,0 +1,195 @@
+import multiprocessing
+import multiprocessing.forkserver
+import os
+import pickle
+import platform
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from data_to_paper import env
+from data_to_paper.env import MAX_CONCURRENT_CODE_RUNS, CODE_RUN_PROCESS_START_METHOD, PREWARM_CODE_RUNS
+from data_to_paper.utils.mutable import Mutable
+
+from .interpreter_template import prewarm_interpreter
+
+PREWARMED_FORKSERVER_MODULE = 'data_to_paper.run_gpt_code.prewarmed_forkserver'
+
+
+@dataclass
+class ProcessTimeoutError(TimeoutError):
+    """
+    The process did not return a result within the timeout, and was killed.
+    """
+    timeout_sec: float
+    pid: int
+    py_spy_stack: str = ''
+
+    def __str__(self):
+        return f"Process timeout after {self.timeout_sec} seconds."
+
+
+@dataclass
+class ProcessDiedError(RuntimeError):
+    """
+    The process terminated without returning a result (e.g. it crashed, or was killed by the OS).
+    """
+    pid: int
+    exitcode: Optional[int]
+
+    def __str__(self):
+        return f"The process running the code terminated unexpectedly (exit code: {self.exitcode})."
+
+
+def get_env_mutable_values() -> Dict[str, Any]:
+    """
+    Return the current values of the env Mutables.
+    Needed for transferring temporarily-set values to spawned processes (forked processes inherit them).
+    """
+    return {name: value.val for name, value in vars(env).items() if isinstance(value, Mutable)}
+
+
+def _run_func_and_send_result(connection, func: Callable, args: tuple, env_mutable_values: Optional[Dict[str, Any]]):
+    """
+    The target of the worker process.
+    Run func(*args) and send the pickled result, or the raised exception, through the connection.
+    """
+    if env_mutable_values is not None:
+        for name, val in env_mutable_values.items():
+            getattr(env, name).set(val)
+    try:
+        result = func(*args)
+    except Exception as e:
+        result = e
+    try:
+        data = pickle.dumps(result)
+    except Exception as e:
+        data = pickle.dumps(RuntimeError(f'Failed transferring the result of the code run:\n{e}'))
+    connection.send_bytes(data)
+    connection.close()
+
+
+@dataclass
+class CodeExecutionEngine:
+    """
+    Run functions, each in its own process.
+
+    Each process has its own module namespace, its own `builtins`, and its own signal handlers, so that
+    runs do not interfere with each other, and a hung run can be killed upon timeout.
+    The number of concurrently running processes is bounded by `max_workers`.
+
+    With the 'fork' and 'forkserver' start methods, processes are forked from a pre-warmed template
+    (see `interpreter_template`), so that they start in milliseconds.
+    """
+    max_workers: Optional[int] = None  # None to use MAX_CONCURRENT_CODE_RUNS
+    start_method: Optional[str] = None  # None to use CODE_RUN_PROCESS_START_METHOD
+
+    _condition: threading.Condition = field(default_factory=threading.Condition, init=False, repr=False)
+    _num_running: int = field(default=0, init=False, repr=False)
+
+    def get_max_workers(self) -> int:
+        return max(self.max_workers or MAX_CONCURRENT_CODE_RUNS.val or 1, 1)
+
+    def get_start_method(self) -> str:
+        return self.start_method or CODE_RUN_PROCESS_START_METHOD.val
+
+    def _get_context(self, start_method: str):
+        context = multiprocessing.get_context(start_method)
+        if PREWARM_CODE_RUNS and start_method == 'forkserver':
+            context.set_forkserver_preload([PREWARMED_FORKSERVER_MODULE])
+        return context
+
+    def _prewarm(self, start_method: str):
+        if not PREWARM_CODE_RUNS:
+            return
+        if start_method == 'fork':
+            prewarm_interpreter()
+        elif start_method == 'forkserver':
+            self._get_context(start_method)
+            multiprocessing.forkserver.ensure_running()
+
+    def prewarm(self, in_background: bool = True):
+        """
+        Prepare the template from which processes are forked, so that the next run starts fast.
+        Running in the background allows the preparation to overlap with other work (e.g. waiting for the LLM).
+        """
+        start_method = self.get_start_method()
+        if in_background:
+            threading.Thread(target=self._prewarm, args=(start_method, ), daemon=True).start()
+        else:
+            self._prewarm(start_method)
+
+    @contextmanager
+    def _worker_slot(self):
+        with self._condition:
+            self._condition.wait_for(lambda: self._num_running < self.get_max_workers())
+            self._num_running += 1
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._num_running -= 1
+                self._condition.notify()
+
+    def run(self, func: Callable, args: tuple = (), timeout_sec: Optional[float] = None) -> Any:
+        """
+        Run func(*args) in a separate process and return its result.
+        If func raised an exception, the exception is returned (not raised).
+        Raises ProcessTimeoutError if the process did not finish within timeout_sec (the process is then killed).
+        Raises ProcessDiedError if the process terminated without returning a result.
+        """
+        start_method = self.get_start_method()
+        self._prewarm(start_method)  # if prewarming in the background, wait for it to finish before forking
+        context = self._get_context(start_method)
+        env_mutable_values = None if start_method == 'fork' else get_env_mutable_values()
+        with self._worker_slot():
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_run_func_and_send_result,
+                                      args=(sender, func, args, env_mutable_values),
+                                      daemon=True)
+            process.start()
+            sender.close()  # so that we get EOF if the process dies
+            try:
+                # We read the result before joining; the process cannot exit before its data is read.
+                if not receiver.poll(timeout_sec):
+                    with os.popen(f'{"sudo -n " if platform.system() == "Darwin" else ""}'
+                                  f'py-spy dump --pid {process.pid}') as f:
+                        py_spy_stack = f.read()
+                    process.kill()
+                    raise ProcessTimeoutError(timeout_sec, process.pid, py_spy_stack)
+                try:
+                    data = receiver.recv_bytes()
+                except EOFError:
+                    process.join()
+                    raise ProcessDiedError(process.pid, process.exitcode)
+            finally:
+                receiver.close()
+                process.join()
+                process.close()
+        return pickle.loads(data)
+
+    def run_in_parallel(self, funcs_and_args: Iterable[Tuple[Callable, tuple]],
+                        timeout_sec: Optional[float] = None) -> List[Any]:
+        """
+        Run each func(*args) in its own process, concurrently (bounded by `max_workers`).
+        Return the results in the same order.
+        Exceptions (including ProcessTimeoutError and ProcessDiedError) are returned rather than raised.
+        """
+        funcs_and_args = list(funcs_and_args)
+        if not funcs_and_args:
+            return []
+
+        def run_and_catch(func_and_args):
+            func, args = func_and_args
+            try:
+                return self.run(func, args, timeout_sec)
+            except (ProcessTimeoutError, ProcessDiedError) as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=len(funcs_and_args)) as executor:
+            return list(executor.map(run_and_catch, funcs_and_args))
+
+
+CODE_EXECUTION_ENGINE = CodeExecutionEngine()
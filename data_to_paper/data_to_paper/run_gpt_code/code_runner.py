@@ -1,17 +1,14 @@
 import os
 import pickle
-import platform
-import threading
-import tempfile
-import uuid
 from abc import abstractmethod, ABC
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Optional, Iterable, Tuple, List, Dict, Any, Type
+from typing import Optional, Iterable, Tuple, List, Dict, Any, Type, Sequence
 
 from data_to_paper.env import MAX_EXEC_TIME
 from data_to_paper.utils.mutable import Mutable
-from data_to_paper.run_gpt_code.dynamic_code import RunCode, is_serializable
+from data_to_paper.run_gpt_code.dynamic_code import RunCode, is_serializable, remove_module_files_of_process
 from data_to_paper.run_gpt_code.code_utils import extract_code_from_text
 from data_to_paper.utils import line_count
 
@@ -20,15 +17,17 @@ from data_to_paper.code_and_output_files.output_file_requirements import OutputF
 
 from .base_run_contexts import RunContext
 from .cache_runs import CacheRunToFile
+from .code_execution_engine import CODE_EXECUTION_ENGINE, ProcessTimeoutError, ProcessDiedError
 from .run_issues import RunIssue
 from .exceptions import FailedRunningCode, CodeTimeoutException
 
-# process.queue fails on Mac OS X with large objects. Use file-based transfer instead.
 RUN_CACHE_FILEPATH = Mutable(None)
 
 
 @dataclass
 class BaseCodeRunner(CacheRunToFile, ABC):
+    chdir_on_run = False  # the code-running process changes to the run folder (see RunCode)
+
     response: str = None  # response from the LLM (contains code)
     script_file_path: Optional[Path] = None  # where to save the script after running. If None, don't save.
     run_folder: Optional[Path] = None
@@ -122,52 +121,54 @@ class BaseCodeRunner(CacheRunToFile, ABC):
             -> Tuple[Optional[CodeAndOutput], List[RunIssue], Dict[str, RunContext], Optional[FailedRunningCode]]:
         """
         Run the provided code in a separate process and report exceptions or specific warnings.
-        Calls `run_in_provided_process` which is a wrapper for `run`.
+        The process is killed if the code does not finish within `timeout_sec`.
         """
         code = self.get_raw_code()
         modified_code = self.get_modified_code_for_run(code)
-        queue_or_filepath = f"subprocess_output_{uuid.uuid4()}_{os.getpid()}.pkl"
-        queue_or_filepath = os.path.join(tempfile.gettempdir(), queue_or_filepath)
         try:
-            process = threading.Thread(
-                target=self._run_code_and_put_result_in_queue,
-                args=(queue_or_filepath, code, modified_code),
-            )
-        except (AttributeError, TypeError):
-            for k, v in self.__dict__.items():
-                if not is_serializable(v):
-                    print(f'Attribute {k} is not serializable.')
-            raise
-        process.start()
-        process.join(self.timeout_sec)
-        if process.is_alive():
-            with os.popen(f'{"sudo -n " if platform.system() == "Darwin" else ""}py-spy dump --pid {process.pid}') as f:
-                py_spy_stack = f.read()
-            process.join()
-            result = (
+            result = CODE_EXECUTION_ENGINE.run(self.run_code, (code, modified_code), self.timeout_sec)
+        except ProcessTimeoutError as e:
+            remove_module_files_of_process(e.pid)
+            return (
                 None,
                 [],
                 dict(),
                 FailedRunningCode.from_exception_with_py_spy(CodeTimeoutException(self.timeout_sec),
-                                                             (py_spy_stack, modified_code)))
-        else:
-            with open(queue_or_filepath, 'rb') as f:
-                result = pickle.load(f)
-            os.remove(queue_or_filepath)
-            if isinstance(result, Exception):
-                raise result
+                                                             (e.py_spy_stack, modified_code)))
+        except ProcessDiedError as e:
+            remove_module_files_of_process(e.pid)
+            return None, [], dict(), FailedRunningCode.from_exception(e)
+        except (AttributeError, TypeError, pickle.PicklingError):
+            for k, v in self.__dict__.items():
+                if not is_serializable(v):
+                    print(f'Attribute {k} is not serializable.')
+            raise
+        if isinstance(result, Exception):
+            raise result
         return result
 
-    def _run_code_and_put_result_in_queue(self, queue_or_filepath, code: str, modified_code: str):
-        """
-        Run the provided code and put the result in the queue.
-        """
+
+def run_code_runners_in_parallel(code_runners: Sequence[BaseCodeRunner]) -> List[Any]:
+    """
+    Run several code runners concurrently, each in its own process (see `CodeExecutionEngine`).
+    Return the results of `code_runner.run()` in the same order (an exception raised by a runner is returned).
+
+    The code runners must have distinct run folders (created files are tracked per run folder).
+    """
+    run_folders = [os.path.abspath(code_runner.run_folder or os.getcwd()) for code_runner in code_runners]
+    if len(run_folders) != len(set(run_folders)):
+        raise ValueError('Code runners running in parallel must have distinct run folders.')
+
+    def run(code_runner: BaseCodeRunner):
         try:
-            result = self.run_code(code, modified_code)
+            return code_runner.run()
         except Exception as e:
-            result = e
-        with open(queue_or_filepath, 'wb') as f:
-            pickle.dump(result, f)
+            return e
+
+    if not code_runners:
+        return []
+    with ThreadPoolExecutor(max_workers=len(code_runners)) as executor:
+        return list(executor.map(run, code_runners))
 
 
 @dataclass
@@ -0,0 +1,103 @@
+"""
+Stage data files into the run folder without copying them.
+
+The data files are staged, in order of preference, as:
+    - reflinks (copy-on-write clones; Linux filesystems that support them, like btrfs and xfs)
+    - hard links (when the run folder is on the same filesystem as the data files)
+    - symlinks
+    - copies (if all else fails)
+
+Reflinks are independent of the original. Hard links and symlinks are not: writing to them writes to the original.
+The LLM code is therefore prevented from opening its input files for writing (see `PreventFileOpen`), which
+identifies the files by their inode, regardless of the path through which they are opened.
+"""
+import os
+import shutil
+import tempfile
+import zipfile
+from pathlib import Path
+from typing import List, Union
+
+from data_to_paper.env import EXTRACTED_ARCHIVES_FOLDER
+
+from .cache_runs import get_file_fingerprinter
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+FICLONE = 0x40049409  # linux/fs.h: _IOW(0x94, 9, int)
+
+
+def _reflink(source: Union[str, Path], target: Union[str, Path]):
+    if fcntl is None:
+        raise OSError('Reflinks are not supported on this platform.')
+    with open(source, 'rb') as source_file, open(target, 'wb') as target_file:
+        try:
+            fcntl.ioctl(target_file.fileno(), FICLONE, source_file.fileno())
+        except OSError:
+            target_file.close()
+            os.remove(target)
+            raise
+
+
+def stage_file(source: Union[str, Path], target: Union[str, Path]) -> str:
+    """
+    Stage the source file at the target path, preferably without copying its content.
+    Returns the staging method: 'reflink', 'hardlink', 'symlink', or 'copy'.
+    """
+    source = os.path.abspath(source)
+    if os.path.lexists(target):
+        os.remove(target)
+    for method, func in (('reflink', _reflink), ('hardlink', os.link), ('symlink', os.symlink),
+                         ('copy', shutil.copyfile)):
+        try:
+            func(source, target)
+            break
+        except (OSError, NotImplementedError):
+            if method == 'copy':
+                raise
+    # the fingerprint of the staged file is that of the source (which is hashed only if it has changed):
+    get_file_fingerprinter().register_copy(source, target)
+    return method
+
+
+def _get_extracted_archive_folder(archive_path: Union[str, Path]) -> Path:
+    """
+    Return the folder into which the archive is extracted, extracting it only if not already extracted.
+    The folder is keyed by the fingerprint of the archive content.
+    """
+    folder = Path(EXTRACTED_ARCHIVES_FOLDER.val) / get_file_fingerprinter().get_file_digest(archive_path)
+    if not folder.exists():
+        folder.parent.mkdir(parents=True, exist_ok=True)
+        temp_folder = tempfile.mkdtemp(dir=folder.parent, prefix='.extracting_')
+        with zipfile.ZipFile(archive_path, 'r') as zip_ref:
+            zip_ref.extractall(temp_folder)
+        try:
+            os.rename(temp_folder, folder)
+        except OSError:  # extracted concurrently by another process
+            shutil.rmtree(temp_folder, ignore_errors=True)
+    return folder
+
+
+def stage_zip_archive(archive_path: Union[str, Path], target_folder: Union[str, Path]) -> List[str]:
+    """
+    Stage the content of the zip archive into the target folder.
+    The archive is extracted once, into EXTRACTED_ARCHIVES_FOLDER, and its files are then staged (see `stage_file`).
+    Returns the relative paths of the staged files.
+    """
+    if EXTRACTED_ARCHIVES_FOLDER.val is None:
+        with zipfile.ZipFile(archive_path, 'r') as zip_ref:
+            zip_ref.extractall(target_folder)
+            return [name for name in zip_ref.namelist() if not name.endswith('/')]
+    extracted_folder = _get_extracted_archive_folder(archive_path)
+    relative_paths = []
+    for path, dirs, files in os.walk(extracted_folder):
+        for file in files:
+            relative_path = os.path.relpath(os.path.join(path, file), start=extracted_folder)
+            target = os.path.join(target_folder, relative_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            stage_file(os.path.join(path, file), target)
+            relative_paths.append(relative_path)
+    return relative_paths
@@ -1,5 +1,9 @@
 import builtins
+import glob
 import pickle
+import shutil
+import sys
+import tempfile
 from contextlib import ExitStack
 from dataclasses import dataclass, field
 from pathlib import Path
@@ -7,6 +11,7 @@ from types import ModuleType
 
 import os
 import importlib
+import importlib.util
 
 from typing import Optional, Type, Tuple, Any, Union, Iterable, Dict
 
@@ -28,21 +33,35 @@ from data_to_paper.code_and_output_files.output_file_requirements import OutputF
 from data_to_paper.utils.singleton import undefined
 
 module_dir = os.path.dirname(llm_created_scripts.__file__)
-module_default_filepath = os.path.join(module_dir, module_filename)
 
 
-def save_code_to_module_file(code: str = None):
+def save_code_to_new_module_file(code: str = None) -> str:
+    """
+    Save the code to a new module file, in its own folder, and return the file path.
+    Each run gets its own file so that runs can take place concurrently (each in its own process).
+    The file keeps the name `module_filename`, so that frames of the code are recognized as gpt code.
+    """
     code = code or '# empty module\n'
-    with open(module_default_filepath, "w") as f:
+    filepath = os.path.join(tempfile.mkdtemp(prefix=f'run_{os.getpid()}_', dir=module_dir), module_filename)
+    with open(filepath, "w") as f:
         f.write(code)
+    return filepath
+
+
+def remove_module_files_of_process(pid: int):
+    """
+    Remove the module files left by a process that was killed, or died, while running code.
+    """
+    for folder in glob.glob(os.path.join(module_dir, f'run_{pid}_*')):
+        shutil.rmtree(folder, ignore_errors=True)
 
 
-def generate_empty_code_module_object() -> ModuleType:
+def create_module_object_from_file(filepath: str) -> ModuleType:
     """
-    Generate module object with the given code and return it.
+    Create a module object from the given file, without executing it.
     """
-    save_code_to_module_file()
-    return importlib.import_module(llm_created_scripts.__name__ + '.' + MODULE_NAME)
+    spec = importlib.util.spec_from_file_location(llm_created_scripts.__name__ + '.' + MODULE_NAME, filepath)
+    return importlib.util.module_from_spec(spec)
 
 
 def is_serializable(x):
@@ -163,8 +182,7 @@ class RunCode:
         """
         Run the provided code and report exceptions or specific warnings.
 
-        To run the code, we save it to a .py file and use the importlib to import it.
-        If the file was already imported before, we use importlib.reload.
+        To run the code, we save it to a new .py file and use the importlib to execute it as a module.
 
         save_as: name of file to save the code.  None to skip saving.
 
@@ -175,9 +193,10 @@ class RunCode:
             contexts: a dict of all the contexts within which the code was run.
             exception: an exception that was raised during the run, None if no exception was raised.
         """
+        code_filepath = None
         if module_filepath is None:
-            self._module = generate_empty_code_module_object()
-            save_code_to_module_file(code)
+            code_filepath = save_code_to_new_module_file(code)
+            self._module = create_module_object_from_file(code_filepath)
 
         contexts = self._create_and_get_all_contexts()
         exception = None
@@ -188,7 +207,9 @@ class RunCode:
                     stack.enter_context(context)
                 try:
                     if module_filepath is None:
-                        module = importlib.reload(self._module)
+                        module = self._module
+                        sys.modules[module.__name__] = module
+                        module.__spec__.loader.exec_module(module)
                     else:
                         module = importlib.import_module(module_filepath)
                     result = self._run_function_in_module(module)
@@ -210,9 +231,11 @@ class RunCode:
                         if os.path.exists(file):
                             os.remove(file)
                 created_files = []
-            if save_as and module_filepath is None:
-                os.rename(module_default_filepath, os.path.join(module_dir, save_as) + ".py")
-            save_code_to_module_file()  # leave the module empty
+            if code_filepath is not None:
+                sys.modules.pop(self._module.__name__, None)
+                if save_as:
+                    os.replace(code_filepath, os.path.join(module_dir, save_as) + ".py")
+                shutil.rmtree(os.path.dirname(code_filepath), ignore_errors=True)
 
         # Collect issues from all contexts
         issues = RunIssues()
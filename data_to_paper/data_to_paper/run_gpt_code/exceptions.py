@@ -6,7 +6,7 @@ from typing import List, Optional, Tuple, Union
 
 from data_to_paper.exceptions import data_to_paperException
 
-from .user_script_name import module_filename, get_gpt_module_frames
+from .user_script_name import module_filename, get_gpt_module_frames, data_to_paper_internals
 
 
 @dataclass
@@ -34,16 +34,22 @@ class FailedRunningCode(data_to_paperException):
 
     @classmethod
     def from_exception(cls, e: Exception):
-        return cls(exception=convert_exception_to_any_exception_if_needed(e), tb=traceback.extract_tb(e.__traceback__))
+        with data_to_paper_internals():  # reading the source lines of the traceback opens files
+            tb = traceback.extract_tb(e.__traceback__)
+        return cls(exception=convert_exception_to_any_exception_if_needed(e), tb=tb)
 
     @classmethod
     def from_current_tb(cls, **kwargs):
         exception = kwargs.pop('exception', None)
-        return cls(exception=exception, tb=traceback.extract_stack(), **kwargs)
+        with data_to_paper_internals():
+            tb = traceback.extract_stack()
+        return cls(exception=exception, tb=tb, **kwargs)
 
     @classmethod
     def from_exception_with_py_spy(cls, e: Exception, py_spy_stack_and_code: Tuple[str, str]):
-        return cls(exception=convert_exception_to_any_exception_if_needed(e), tb=traceback.extract_tb(e.__traceback__),
+        with data_to_paper_internals():
+            tb = traceback.extract_tb(e.__traceback__)
+        return cls(exception=convert_exception_to_any_exception_if_needed(e), tb=tb,
                    py_spy_stack_and_code=py_spy_stack_and_code)
 
     def __str__(self):
@@ -0,0 +1,73 @@
+"""
+Prepare the interpreter from which the code-running processes are forked.
+
+Importing the statistics packages, and walking over their modules and classes to build the override tables
+(see `SystematicAttrReplacerContext`), takes seconds. We do it once, in a template process, and then fork a fresh
+process from the template for each code run. Each run thereby starts with the packages already imported,
+and with a clean state (nothing done by one run is seen by the next).
+
+With the 'fork' start method, the template is the main process.
+With the 'forkserver' start method, the template is the fork server (see `prewarmed_forkserver`).
+"""
+import importlib
+import sys
+import threading
+from typing import Iterable
+
+from data_to_paper.env import SUPPORTED_PACKAGES
+
+PREWARMED_MODULES = SUPPORTED_PACKAGES + (
+    'scipy.stats',
+    'statsmodels.api',
+    'statsmodels.formula.api',
+    'statsmodels.stats.multitest',
+    'statsmodels.stats.anova',
+    'sklearn.linear_model',
+    'sklearn.svm',
+    'sklearn.model_selection',
+    'sklearn.neural_network',
+)
+
+_IS_PREWARMED = False
+_PREWARM_LOCK = threading.Lock()
+
+
+def _iterate_nested_contexts(contexts: Iterable) -> Iterable:
+    for context in contexts:
+        yield context
+        if hasattr(context, 'contexts'):
+            yield from _iterate_nested_contexts(context.contexts)
+
+
+def build_override_tables():
+    """
+    Build the replacement tables of the statistics-package overrides.
+    Building a table may import (lazily loaded) modules, which may in turn invalidate tables that were already
+    built. We therefore repeat until no new modules are imported.
+    """
+    from .overrides.attr_replacers import MultiAttrReplacerContext
+    from .overrides.contexts import OverrideStatisticsPackages
+
+    num_modules = None
+    while num_modules != len(sys.modules):
+        num_modules = len(sys.modules)
+        for context in _iterate_nested_contexts(OverrideStatisticsPackages().contexts):
+            if isinstance(context, MultiAttrReplacerContext):
+                context.get_parents_and_attr_names()
+
+
+def prewarm_interpreter():
+    """
+    Import the supported packages and build the override tables, once per process.
+    """
+    global _IS_PREWARMED
+    with _PREWARM_LOCK:
+        if _IS_PREWARMED:
+            return
+        for module_name in PREWARMED_MODULES:
+            try:
+                importlib.import_module(module_name)
+            except ImportError:
+                pass
+        build_override_tables()
+        _IS_PREWARMED = True
@@ -2,11 +2,12 @@ from __future__ import annotations
 
 import importlib
 import pkgutil
+import sys
 from dataclasses import dataclass
 
 import inspect
 
-from typing import Callable, Iterable, Any, Optional, Tuple, Dict, Union
+from typing import Callable, Iterable, Any, Optional, Tuple, Dict, Union, List
 
 from ..base_run_contexts import RegisteredRunContext
 from ..exceptions import CodeUsesForbiddenFunctions
@@ -95,13 +96,20 @@ class MultiAttrReplacerContext(OverrideImportedObjContext):
     def _get_custom_wrapper(self, parent, attr_name, original_func):
         raise NotImplementedError
 
+    def get_parents_and_attr_names(self) -> List[Tuple[Any, str]]:
+        """
+        Return the (parent, attr_name) pairs of the attributes to replace.
+        """
+        return [(parent, attr_name)
+                for parent in self._get_all_parents()
+                for attr_name in self._get_all_attrs_for_parent(parent)]
+
     def __enter__(self):
         self._originals = {}
-        for parent in self._get_all_parents():
-            for attr_name in self._get_all_attrs_for_parent(parent):
-                original = getattr(parent, attr_name)
-                self._originals[(parent, attr_name)] = original
-                setattr(parent, attr_name, self._get_custom_wrapper(parent, attr_name, original))
+        for parent, attr_name in self.get_parents_and_attr_names():
+            original = getattr(parent, attr_name)
+            self._originals[(parent, attr_name)] = original
+            setattr(parent, attr_name, self._get_custom_wrapper(parent, attr_name, original))
         return super().__enter__()
 
     def __exit__(self, exc_type, exc_val, exc_tb):
@@ -111,10 +119,32 @@ class MultiAttrReplacerContext(OverrideImportedObjContext):
         return super().__exit__(exc_type, exc_val, exc_tb)
 
 
+# Walking over all the modules and classes of a package is slow. We therefore keep the replacement tables,
+# keyed by the context type and its import target. A table is rebuilt if new modules were imported since.
+# Maps key -> (number of imported modules, parents and attr names):
+_REPLACEMENT_TABLES: Dict[tuple, Tuple[int, List[Tuple[Any, str]]]] = {}
+
+
 @dataclass
 class SystematicAttrReplacerContext(MultiAttrReplacerContext):
     recursive: bool = True
 
+    def _get_replacement_table_key(self) -> tuple:
+        """
+        The key of the replacement table. Subclasses with other fields affecting the table should extend it.
+        """
+        return type(self), self.obj_import_str, self.recursive
+
+    def get_parents_and_attr_names(self) -> List[Tuple[Any, str]]:
+        key = self._get_replacement_table_key()
+        num_modules_and_table = _REPLACEMENT_TABLES.get(key)
+        if num_modules_and_table is None or num_modules_and_table[0] != len(sys.modules):
+            table = super().get_parents_and_attr_names()
+            # walking over the modules may import (lazily loaded) modules, so we count them after the walk:
+            num_modules_and_table = (len(sys.modules), table)
+            _REPLACEMENT_TABLES[key] = num_modules_and_table
+        return num_modules_and_table[1]
+
     def _get_all_modules(self) -> list:
         all_modules = [self.obj]
         if self.recursive:
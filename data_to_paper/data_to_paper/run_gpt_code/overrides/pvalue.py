@@ -43,6 +43,32 @@ def format_p_value(x, minimal_value=P_VALUE_MIN, smaller_than_sign: str = '<'):
     return smaller_than_sign + "{}".format(minimal_value)
 
 
+def format_p_values(values: np.ndarray, minimal_value=P_VALUE_MIN, smaller_than_sign: str = '<') -> np.ndarray:
+    """
+    Format an array of p-values to an array of strings (vectorized `format_p_value`).
+    """
+    values = np.asarray(values, dtype=float)
+    is_out_of_range = (values > 1) | (values < 0)
+    if np.any(is_out_of_range):
+        raise ValueError(f"p-value should be in the range [0, 1]. Got: {values[is_out_of_range].flat[0]}")
+    strings = np.empty(values.shape, dtype=object)
+    is_finite = np.isfinite(values)
+    is_formatted = is_finite & (values >= minimal_value)
+    strings[is_formatted] = np.char.mod('%.3g', values[is_formatted]).astype(object)
+    strings[is_finite & ~is_formatted] = smaller_than_sign + "{}".format(minimal_value)
+    strings[~is_finite] = [str(x) for x in values[~is_finite]]
+    return strings
+
+
+# on_str -> (minimal_value, smaller_than_sign)
+# (OnStr.WITH_EPSILON has the same value as OnStr.LATEX_SMALLER_THAN, so it is the same member)
+ON_STR_TO_FORMAT_KWARGS = {
+    OnStr.SMALLER_THAN: (P_VALUE_MIN, '<'),
+    OnStr.LATEX_SMALLER_THAN: (P_VALUE_MIN, '$<$'),
+    OnStr.WITH_ZERO: (0, ''),
+}
+
+
 @dataclass
 class InvalidPValueRunIssue(RunIssue):
     """
@@ -102,14 +128,8 @@ class PValue(OperatorValue):
             on_str = self.ON_STR
             if on_str == OnStr.AS_FLOAT:
                 return value
-            if on_str == OnStr.SMALLER_THAN:
-                return format_p_value(self.value, minimal_value=P_VALUE_MIN, smaller_than_sign='<')
-            if on_str == OnStr.LATEX_SMALLER_THAN:
-                return format_p_value(self.value, minimal_value=P_VALUE_MIN, smaller_than_sign='$<$')
-            if on_str == OnStr.WITH_EPSILON:
-                return format_p_value(self.value, minimal_value=EPSILON, smaller_than_sign='')
-            if on_str == OnStr.WITH_ZERO:
-                return format_p_value(self.value, minimal_value=0, smaller_than_sign='')
+            if on_str in ON_STR_TO_FORMAT_KWARGS:
+                return format_p_value(self.value, *ON_STR_TO_FORMAT_KWARGS[on_str])
             if on_str == OnStr.DEBUG:
                 return f'PValue({value})'
             if on_str == OnStr.RAISE:
@@ -160,6 +180,32 @@ class PValue(OperatorValue):
         return self.reconstruction, (self.value, self.created_by, self.var_name)
 
 
+def convert_floats_to_p_values(values: np.ndarray, var_names: np.ndarray, created_by: str = None,
+                               raise_on_nan: bool = True, raise_on_one: bool = True,
+                               func_call_str: str = None, context: RunContext = None) -> np.ndarray:
+    """
+    Convert an array of floats to an object array of PValue objects.
+    The values are checked in bulk; only the invalid values go through `PValue.from_value`.
+    var_names: the var_name of each value.
+    """
+    is_invalid = np.zeros(values.shape, dtype=bool)
+    if raise_on_nan:
+        is_invalid |= np.isnan(values)
+    if raise_on_one:
+        is_invalid |= values == 1
+    p_values = np.empty(values.shape, dtype=object)
+    p_values_flat = p_values.reshape(-1)  # a view
+    for index, (value, var_name, is_value_invalid) in \
+            enumerate(zip(values.flat, var_names.flat, is_invalid.flat)):
+        if is_value_invalid:
+            p_values_flat[index] = PValue.from_value(value, created_by=created_by, var_name=var_name,
+                                                     raise_on_nan=raise_on_nan, raise_on_one=raise_on_one,
+                                                     func_call_str=func_call_str, context=context)
+        else:
+            p_values_flat[index] = PValue(value, created_by=created_by, var_name=var_name)
+    return p_values
+
+
 def convert_to_p_value(value, created_by: str = None, var_name: str = None,
                        raise_on_nan: bool = True, raise_on_one: bool = True,
                        func_call_str: str = None, context: RunContext = None):
@@ -171,9 +217,17 @@ def convert_to_p_value(value, created_by: str = None, var_name: str = None,
     if isinstance(value, float):
         return PValue.from_value(value, **kwargs)
     if isinstance(value, np.ndarray):
+        if value.dtype.kind == 'f':
+            kwargs['var_names'] = np.full(value.shape, kwargs.pop('var_name'), dtype=object)
+            return convert_floats_to_p_values(value, **kwargs)
         return np.vectorize(convert_to_p_value)(value, **kwargs)
     if isinstance(value, pd.Series):
         kwargs.pop('var_name')
+        if value.dtype.kind == 'f':
+            # a single assignment, rather than element by element (the series becomes an object series):
+            value.iloc[:] = convert_floats_to_p_values(value.to_numpy(), var_names=value.index.to_numpy(dtype=object),
+                                                       **kwargs)
+            return value
         for i in range(len(value)):
             value.iloc[i] = convert_to_p_value(value.iloc[i], var_name=value.index[i], **kwargs)
         return value
@@ -190,12 +244,13 @@ def is_p_value(value):
 def is_containing_p_value(value):
     if is_p_value(value):
         return True
-    if isinstance(value, np.ndarray):
-        return np.any(np.vectorize(is_containing_p_value)(value))
-    if isinstance(value, pd.Series):
-        return value.apply(is_containing_p_value).any()
     if isinstance(value, pd.DataFrame):
-        return value.applymap(is_containing_p_value).any().any()
+        return any(is_containing_p_value(column) for _, column in value.items())
+    if isinstance(value, pd.Series):
+        value = value.to_numpy()
+    if isinstance(value, np.ndarray):
+        # PValue objects can only be held in object arrays:
+        return value.dtype == object and any(is_containing_p_value(val) for val in value.flat)
     if isinstance(value, (list, tuple)):
         return any(is_containing_p_value(val) for val in value)
     if isinstance(value, dict):
@@ -203,6 +258,29 @@ def is_containing_p_value(value):
     return False
 
 
+def format_p_values_in_df(df: pd.DataFrame, on_str: OnStr) -> pd.DataFrame:
+    """
+    Return a copy of the df with its PValue objects formatted as strings, column by column.
+    Same as formatting each PValue with `OnStrPValue(on_str)`.
+    Returns the df as is for on_str values that are not formatting p-values.
+    """
+    if on_str not in ON_STR_TO_FORMAT_KWARGS:
+        return df
+    df = df.copy()
+    for icol in range(df.shape[1]):
+        column = df.iloc[:, icol].to_numpy()
+        if column.dtype != object:
+            continue
+        is_p_value_array = np.fromiter((is_p_value(val) for val in column), dtype=bool, count=len(column))
+        if not is_p_value_array.any():
+            continue
+        column = column.copy()
+        column[is_p_value_array] = format_p_values([val.value for val in column[is_p_value_array]],
+                                                   *ON_STR_TO_FORMAT_KWARGS[on_str])
+        df.isetitem(icol, column)
+    return df
+
+
 @dataclass
 class TrackPValueCreationFuncs(RunContext):
     package_names: Iterable[str] = ()
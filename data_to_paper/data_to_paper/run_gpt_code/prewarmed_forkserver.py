@@ -0,0 +1,7 @@
+"""
+Preloaded by the fork server (see `CodeExecutionEngine`), making it a pre-warmed template for code runs.
+Do not import this module elsewhere.
+"""
+from data_to_paper.run_gpt_code.interpreter_template import prewarm_interpreter
+
+prewarm_interpreter()
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+from data_to_paper.env import CODE_RUN_CACHE_MEMORY_SIZE_CAP
+from data_to_paper.utils.file_utils import write_file_atomically
+
+# Keys are pickled with a fixed protocol, so that their digests do not change between python versions:
+KEY_PICKLE_PROTOCOL = 4
+
+
+class RunCacheStore:
+    """
+    A content-addressed store of the cached results of runs (see `CacheRunToFile`).
+
+    Layout of the store directory:
+        entries/<xx>/<key digest>.pkl: the pickled (key, results, {created file name: blob digest})
+        blobs/<xx>/<blob digest>: the content of the created files, deduplicated across entries
+
+    Entries are loaded lazily, one at a time, and are kept in memory (pickled, so that each retrieval returns
+    a fresh copy of the results) in an LRU whose total size is bounded by `memory_size_cap` (bytes).
+    The content of created files is not kept in memory.
+    Adding an entry writes only the new entry and its new blobs; nothing is re-written.
+    """
+    extension = '.store'
+
+    def __init__(self, directory: Union[str, Path], memory_size_cap: Optional[int] = None):
+        self.directory = Path(directory)
+        self.memory_size_cap = memory_size_cap
+        self._entries: OrderedDict[str, bytes] = OrderedDict()  # key digest -> pickled entry
+        self._memory_size = 0
+        self._lock = threading.RLock()
+
+    @classmethod
+    def get_store_directory(cls, cache_filepath: Union[str, Path]) -> Path:
+        return Path(str(cache_filepath) + cls.extension)
+
+    @staticmethod
+    def get_key_digest(key: tuple) -> str:
+        return hashlib.sha256(pickle.dumps(key, protocol=KEY_PICKLE_PROTOCOL)).hexdigest()
+
+    def _get_entry_path(self, key_digest: str) -> Path:
+        return self.directory / 'entries' / key_digest[:2] / (key_digest + '.pkl')
+
+    def _get_blob_path(self, blob_digest: str) -> Path:
+        return self.directory / 'blobs' / blob_digest[:2] / blob_digest
+
+    def get_memory_size_cap(self) -> int:
+        return self.memory_size_cap if self.memory_size_cap is not None else CODE_RUN_CACHE_MEMORY_SIZE_CAP.val
+
+    def _remove_from_memory(self, key_digest: str):
+        if key_digest in self._entries:
+            self._memory_size -= len(self._entries.pop(key_digest))
+
+    def _add_to_memory(self, key_digest: str, data: bytes):
+        self._remove_from_memory(key_digest)
+        self._entries[key_digest] = data
+        self._memory_size += len(data)
+        while self._memory_size > self.get_memory_size_cap() and self._entries:
+            _, evicted_data = self._entries.popitem(last=False)
+            self._memory_size -= len(evicted_data)
+
+    def _get_entry_data(self, key_digest: str) -> Optional[bytes]:
+        entry_path = self._get_entry_path(key_digest)
+        if not entry_path.exists():
+            # the store directory may have been removed:
+            self._remove_from_memory(key_digest)
+            return None
+        if key_digest in self._entries:
+            self._entries.move_to_end(key_digest)
+            return self._entries[key_digest]
+        with open(entry_path, 'rb') as f:
+            data = f.read()
+        self._add_to_memory(key_digest, data)
+        return data
+
+    def get(self, key: tuple) -> Optional[Tuple[Any, Dict[str, bytes]]]:
+        """
+        Return the results and the content of the created files, or None if the key is not in the store.
+        """
+        with self._lock:
+            data = self._get_entry_data(self.get_key_digest(key))
+        if data is None:
+            return None
+        entry_key, results, filenames_to_blob_digests = pickle.loads(data)
+        if entry_key != key:  # digest collision
+            return None
+        file_contents = {}
+        for filename, blob_digest in filenames_to_blob_digests.items():
+            with open(self._get_blob_path(blob_digest), 'rb') as f:
+                file_contents[filename] = f.read()
+        return results, file_contents
+
+    def put(self, key: tuple, results: Any, file_contents: Dict[str, bytes]):
+        filenames_to_blob_digests = {}
+        for filename, content in file_contents.items():
+            blob_digest = hashlib.sha256(content).hexdigest()
+            blob_path = self._get_blob_path(blob_digest)
+            if not blob_path.exists():
+                blob_path.parent.mkdir(parents=True, exist_ok=True)
+                write_file_atomically(blob_path, content)
+            filenames_to_blob_digests[filename] = blob_digest
+        data = pickle.dumps((key, results, filenames_to_blob_digests))
+        key_digest = self.get_key_digest(key)
+        entry_path = self._get_entry_path(key_digest)
+        with self._lock:
+            entry_path.parent.mkdir(parents=True, exist_ok=True)
+            write_file_atomically(entry_path, data)
+            self._add_to_memory(key_digest, data)
+
+
+_STORES: Dict[Path, RunCacheStore] = {}
+_STORES_LOCK = threading.Lock()
+
+
+def get_run_cache_store(cache_filepath: Union[str, Path]) -> RunCacheStore:
+    """
+    Return the store of the given cache file.
+    The store is shared by all the runners using the same cache file, so that its in-memory entries are reused.
+    """
+    directory = RunCacheStore.get_store_directory(os.path.abspath(cache_filepath))
+    with _STORES_LOCK:
+        if directory not in _STORES:
+            _STORES[directory] = RunCacheStore(directory)
+        return _STORES[directory]
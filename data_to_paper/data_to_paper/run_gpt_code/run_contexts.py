@@ -56,7 +56,36 @@ class PreventFileOpen(SingletonRegisteredRunContext):
     allowed_read_files: Iterable[str] = None  # list of wildcard names,  None means allow all, [] means allow none
     allowed_write_files: Iterable[str] = None  # list of wildcard names,  None means allow all, [] means allow none
 
+    # Input files (pre-existing files that are allowed for reading) cannot be opened for writing.
+    # They are identified by their inode, as they may be staged as links to the original data files:
+    protect_input_files: bool = True
+
     original_open: Callable = None
+    _protected_inodes: Optional[set] = None
+
+    def __enter__(self):
+        self._protected_inodes = set()
+        if self.protect_input_files and self.allowed_read_files is not None:
+            for path, dirs, files in os.walk('.'):
+                for file in files:
+                    file_name = os.path.relpath(os.path.join(path, file))
+                    if is_name_matches_list_of_wildcard_names(file_name, self.allowed_read_files):
+                        inode = self._get_inode(file_name)
+                        if inode is not None:
+                            self._protected_inodes.add(inode)
+        return super().__enter__()
+
+    @staticmethod
+    def _get_inode(file_name) -> Optional[tuple]:
+        try:
+            stat = os.stat(file_name)
+        except (OSError, TypeError, ValueError):
+            return None
+        return stat.st_dev, stat.st_ino
+
+    def _is_protected_file(self, file_name) -> bool:
+        return bool(self._protected_inodes) and isinstance(file_name, (str, bytes, os.PathLike)) \
+            and self._get_inode(file_name) in self._protected_inodes
 
     def _reversible_enter(self):
         self.original_open = builtins.open
@@ -79,9 +108,9 @@ class PreventFileOpen(SingletonRegisteredRunContext):
     def open_wrapper(self, *args, **kwargs):
         file_name = args[0] if len(args) > 0 else kwargs.get('file', None)
         open_mode = args[1] if len(args) > 1 else kwargs.get('mode', 'r')
-        is_opening_for_writing = open_mode in ['w', 'a', 'x', 'w+b', 'a+b', 'x+b', 'wb', 'ab', 'xb']
+        is_opening_for_writing = any(char in open_mode for char in 'wax+')
         if is_opening_for_writing:
-            if not self.is_allowed_write_file(file_name):
+            if not self.is_allowed_write_file(file_name) or self._is_protected_file(file_name):
                 raise CodeWriteForbiddenFile(file=file_name)
         else:
             if not self.is_allowed_read_file(file_name) \
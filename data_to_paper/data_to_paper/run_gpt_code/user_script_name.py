@@ -1,14 +1,29 @@
+import contextlib
+import contextvars
 import os
+import sys
 import traceback
+from typing import Dict, Tuple
 
-from data_to_paper.utils.mutable import Flag
 from data_to_paper.env import BASE_FOLDER
 
 MODULE_NAME = 'script_to_run'
 module_filename = MODULE_NAME + ".py"
 
 
-IS_CHECKING = Flag(False)
+# Set while data_to_paper internals run within the user script (context-local, so that concurrent runs in other
+# threads are not affected). The run-context hooks that the internals trigger pass through, without checking
+# the caller:
+IS_IN_INTERNALS = contextvars.ContextVar('IS_IN_INTERNALS', default=False)
+
+
+@contextlib.contextmanager
+def data_to_paper_internals():
+    token = IS_IN_INTERNALS.set(True)
+    try:
+        yield
+    finally:
+        IS_IN_INTERNALS.reset(token)
 
 
 def is_filename_gpt_code(filename: str) -> bool:
@@ -32,25 +47,44 @@ def get_gpt_module_frames(tb: traceback.StackSummary) -> list:
     return frames
 
 
+# filename -> (is user script, is data_to_paper).
+# The hooks check the same few callers over and over; the verdict of each filename is computed once:
+_FILENAMES_TO_VERDICTS: Dict[str, Tuple[bool, bool]] = {}
+
+
+def _get_verdicts(filename: str) -> Tuple[bool, bool]:
+    verdicts = _FILENAMES_TO_VERDICTS.get(filename)
+    if verdicts is None:
+        verdicts = _FILENAMES_TO_VERDICTS[filename] = \
+            (is_filename_gpt_code(filename) or is_filename_test(filename), BASE_FOLDER.name in filename)
+    return verdicts
+
+
+def _get_caller_verdicts(offset: int) -> Tuple[bool, bool]:
+    """
+    Return the verdicts of the caller at the given offset.
+    The offset counts frames as in `traceback.extract_stack()` called by the public check functions below
+    (1 is the check function itself, 2 is its caller, etc.).
+    We only walk up `offset` frames, without extracting the stack (which reads the source lines of all frames).
+    """
+    if IS_IN_INTERNALS.get():
+        return False, False
+    try:
+        frame = sys._getframe(offset)  # one more frame: this function
+    except ValueError:  # the stack is shallower than the offset
+        return False, False
+    return _get_verdicts(frame.f_code.co_filename)
+
+
 def is_called_from_user_script(offset: int = 3) -> bool:
     """
     Check if the code is called from user script.
     """
-    if IS_CHECKING:
-        return False
-    with IS_CHECKING.temporary_set(True):
-        tb = traceback.extract_stack()
-        filename = tb[-offset].filename
-        return is_filename_gpt_code(filename) or is_filename_test(filename)
+    return _get_caller_verdicts(offset)[0]
 
 
 def is_called_from_data_to_paper(offset: int = 3) -> bool:
     """
     Check if the code is called from data_to_paper.
     """
-    if IS_CHECKING:
-        return False
-    with IS_CHECKING.temporary_set(True):
-        tb = traceback.extract_stack()
-        filename = tb[-offset].filename
-        return BASE_FOLDER.name in filename
+    return _get_caller_verdicts(offset)[1]
@@ -1,13 +1,16 @@
 import functools
 import os
 import pickle
+import threading
 import time
 from abc import ABC
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Union, Optional
+from typing import Union, Optional, Type, List, Tuple
 
 from data_to_paper.env import CHOSEN_APP, DELAY_SERVER_CACHE_RETRIEVAL
 from .json_dump import dump_to_json, load_from_json
+from .records_journal import RecordsJournal, JsonLinesRecordsJournal, PickleRecordsJournal
 from .serialize_exceptions import serialize_exception, is_exception, de_serialize_exception
 
 
@@ -27,6 +30,11 @@ class ServerCaller(ABC):
     name: str = None
     file_extension: str = None
 
+    # New responses are appended to a journal file. The journal is compacted into the records file when it gets
+    # as long as the compacted records (so that the total cost of re-writing the records file is linear).
+    journal_cls: Type[RecordsJournal] = JsonLinesRecordsJournal
+    min_journal_records_before_compaction: int = 100
+
     def __init__(self):
         self.old_records = self.empty_records
         self.new_records = self.empty_records
@@ -36,6 +44,10 @@ class ServerCaller(ABC):
         self.fail_if_not_all_responses_used = True
         self.should_save = False
         self.file_path = None
+        self.journal: Optional[RecordsJournal] = None
+        self.num_compacted_records = 0
+        # the records are accessed under a lock, so that the server can be called from concurrent threads:
+        self._records_lock = threading.RLock()
 
     @property
     def empty_records(self) -> Union[list, dict]:
@@ -78,6 +90,25 @@ class ServerCaller(ABC):
         """
         raise NotImplementedError()
 
+    @staticmethod
+    def _count_records(records) -> int:
+        """
+        returns the number of responses in the records.
+        """
+        return len(records)
+
+    def _get_journal_entry(self, args, kwargs, response):
+        """
+        returns a serializable journal entry for a new response.
+        """
+        raise NotImplementedError()
+
+    def _add_journal_entry_to_records(self, records, entry):
+        """
+        adds a journal entry (created by `_get_journal_entry`) to the records.
+        """
+        raise NotImplementedError()
+
     def get_server_response(self, *args, **kwargs):
         """
         returns the response from the server after post-processing. allows recording and replaying.
@@ -105,19 +136,29 @@ class ServerCaller(ABC):
         """
         if not self.is_playing_or_recording:
             return self._get_server_response_without_raising(*args, **kwargs)
-        response = self._get_response_from_records(args, kwargs)
+        with self._records_lock:
+            response = self._get_response_from_records(args, kwargs)
         if response is not None and CHOSEN_APP is not None:
             time.sleep(DELAY_SERVER_CACHE_RETRIEVAL.val)
         if response is None:
             if not self.record_more_if_needed:
                 raise NoMoreResponsesToMockError()
             response = self._get_server_response_without_raising(*args, **kwargs)
-            self._add_response_to_new_records(args, kwargs, response)
-            if self.should_save:
-                self.save_records()
+            with self._records_lock:
+                self._add_response_to_new_records(args, kwargs, response)
+                if self.should_save:
+                    self._append_response_to_journal(args, kwargs, response)
         self.args_kwargs_response_history.append((args, kwargs, response))  # for debugging and testing
         return response
 
+    def _append_response_to_journal(self, args, kwargs, response):
+        """
+        appends a new response to the journal, compacting the journal into the records file when it gets long.
+        """
+        self.journal.append(self._get_journal_entry(args, kwargs, response))
+        if self.journal.num_records >= max(self.min_journal_records_before_compaction, self.num_compacted_records):
+            self.save_records()
+
     def __enter__(self):
         self.new_records = self.empty_records
         self.is_playing_or_recording = True
@@ -140,16 +181,23 @@ class ServerCaller(ABC):
         self.fail_if_not_all_responses_used = fail_if_not_all_responses_used
         self.should_save = should_save
         self.file_path = file_path
+        self.journal = self.journal_cls(file_path) if file_path else None
+        self.num_compacted_records = 0
         return self
 
     def save_records(self, file_path: Optional[str] = None):
         """
         Save the recorded responses to a file.
+        Saving to our own file compacts the journal into the file.
         """
         file_path = file_path or self.file_path
         # create the directory if not exist
         Path(os.path.dirname(file_path)).mkdir(parents=True, exist_ok=True)
-        self._save_records(self.all_records, file_path)
+        all_records = self.all_records
+        self._save_records(all_records, file_path)
+        if self.journal is not None and Path(file_path) == Path(self.file_path):
+            self.journal.delete()
+            self.num_compacted_records = self._count_records(all_records)
 
     def mock_with_file(self, file_path, record_more_if_needed=True, fail_if_not_all_responses_used=True,
                        should_save=True):
@@ -160,13 +208,22 @@ class ServerCaller(ABC):
         if os.path.isfile(file_path):
             old_records = self._load_records(file_path)
         else:
-            old_records = []
-
-        return self.mock(old_records=old_records,
-                         record_more_if_needed=record_more_if_needed,
-                         fail_if_not_all_responses_used=fail_if_not_all_responses_used,
-                         should_save=should_save,
-                         file_path=file_path)
+            old_records = self.empty_records
+        num_compacted_records = self._count_records(old_records)
+
+        # add responses that were recorded to the journal, but not yet compacted into the file (e.g. after a crash)
+        journal = self.journal_cls(file_path)
+        for entry in journal.read():
+            self._add_journal_entry_to_records(old_records, entry)
+
+        result = self.mock(old_records=old_records,
+                           record_more_if_needed=record_more_if_needed,
+                           fail_if_not_all_responses_used=fail_if_not_all_responses_used,
+                           should_save=should_save,
+                           file_path=file_path)
+        self.journal = journal
+        self.num_compacted_records = num_compacted_records
+        return result
 
     def record_or_replay(self, file_path: Union[str, Path] = None, should_mock: bool = True):
         """
@@ -273,6 +330,12 @@ class ListServerCaller(OrderedServerCaller):
     def _add_response_to_new_records(self, args, kwargs, response):
         self.new_records.append(response)
 
+    def _get_journal_entry(self, args, kwargs, response):
+        return self._serialize_record(response)
+
+    def _add_journal_entry_to_records(self, records, entry):
+        records.append(self._deserialize_record(entry))
+
     def _save_records(self, records, filepath):
         dump_to_json([self._serialize_record(record)
                       for record in records], filepath)
@@ -286,8 +349,35 @@ class OrderedKeyToListServerCaller(OrderedServerCaller):
     """
     A class for calling a remote server, while allowing recording and replaying server responses.
     Records are saved as dictionary (key order preserving) of responses with ordered lists as values.
+
+    The flat list of the old records, over which we advance while replaying, is computed once, and is re-computed
+    only when the old records are replaced or modified (see `on_old_records_changed`).
+
+    With `replay_by_key`, we instead advance separately over the records of each key, so that calls with different
+    keys can be interleaved in any order (e.g. when stages, which are the keys of the LLM records, run concurrently).
     """
 
+    def __init__(self):
+        self._old_records_as_list = None
+        self.replay_by_key = False
+        self.keys_to_indices_in_old_records = {}
+        super().__init__()
+
+    @property
+    def old_records(self) -> dict:
+        return self._old_records
+
+    @old_records.setter
+    def old_records(self, old_records: dict):
+        self._old_records = old_records
+        self.on_old_records_changed()
+
+    def on_old_records_changed(self):
+        """
+        Should be called after modifying the old records in place.
+        """
+        self._old_records_as_list = None
+
     @property
     def empty_records(self) -> dict:
         return {}
@@ -303,7 +393,34 @@ class OrderedKeyToListServerCaller(OrderedServerCaller):
         """
         Return a single list of all the old records, as tuples of (key, value).
         """
-        return [(key, value) for key, values in self.old_records.items() for value in values]
+        if self._old_records_as_list is None:
+            self._old_records_as_list = [(key, value) for key, values in self.old_records.items() for value in values]
+        return self._old_records_as_list
+
+    @staticmethod
+    def _count_records(records) -> int:
+        return sum(len(values) for values in records.values()) if isinstance(records, dict) else len(records)
+
+    def reset_index(self):
+        super().reset_index()
+        self.keys_to_indices_in_old_records = {}
+
+    def are_more_records_available(self):
+        if not self.replay_by_key:
+            return super().are_more_records_available()
+        return any(self.keys_to_indices_in_old_records.get(key, 0) < len(values)
+                   for key, values in self.old_records.items())
+
+    def _get_response_from_records(self, args, kwargs):
+        if not self.replay_by_key:
+            return super()._get_response_from_records(args, kwargs)
+        key = self._generate_key(args, kwargs)
+        values = self.old_records.get(key, [])
+        index = self.keys_to_indices_in_old_records.get(key, 0)
+        if index < len(values):
+            self.keys_to_indices_in_old_records[key] = index + 1
+            return values[index]
+        return None
 
     def _get_response_from_a_record(self, record, args, kwargs):
         # record is (key, value)
@@ -318,6 +435,13 @@ class OrderedKeyToListServerCaller(OrderedServerCaller):
             self.new_records[key] = []
         self.new_records[key].append(response)
 
+    def _get_journal_entry(self, args, kwargs, response):
+        return [self._generate_key(args, kwargs), self._serialize_record(response)]
+
+    def _add_journal_entry_to_records(self, records, entry):
+        key, serialized_record = entry
+        records.setdefault(key, []).append(self._deserialize_record(serialized_record))
+
     def _generate_key(self, args, kwargs):
         return convert_args_kwargs_to_tuple(args, kwargs)
 
@@ -346,6 +470,7 @@ class ParameterizedQueryServerCaller(ServerCaller, ABC):
     A base class for calling a remote server, while allowing recording and replaying server responses.
     Records are saved as a dictionary of responses and can be replayed by the arguments and keyword arguments.
     """
+    journal_cls = PickleRecordsJournal
 
     @property
     def empty_records(self) -> dict:
@@ -355,14 +480,76 @@ class ParameterizedQueryServerCaller(ServerCaller, ABC):
     def all_records(self):
         return self.old_records | self.new_records
 
+    def get_server_responses(self, args_and_kwargs: List[Tuple[tuple, dict]], max_workers: Optional[int] = None
+                             ) -> list:
+        """
+        Return the responses (after post-processing) to multiple queries, each given as (args, kwargs).
+        Queries whose responses are not in the records are sent to the server concurrently (up to `max_workers`
+        at a time; None for all at once), and their responses are then recorded in the order of the queries,
+        so that the recording is deterministic.
+        If any of the queries failed, the exception of the first failed query is raised (after recording).
+        """
+        responses = self._get_raw_server_responses(args_and_kwargs, max_workers)
+        for response in responses:
+            if isinstance(response, Exception):
+                raise response
+        return [self._post_process_response(response, args, kwargs)
+                for response, (args, kwargs) in zip(responses, args_and_kwargs)]
+
+    def _get_raw_server_responses(self, args_and_kwargs: List[Tuple[tuple, dict]], max_workers: Optional[int] = None
+                                  ) -> list:
+        keys_to_args_and_kwargs = {}  # unique queries, in order
+        for args, kwargs in args_and_kwargs:
+            keys_to_args_and_kwargs.setdefault(convert_args_kwargs_to_tuple(args, kwargs), (args, kwargs))
+        keys_to_responses = {}
+        if self.is_playing_or_recording:
+            for key, (args, kwargs) in keys_to_args_and_kwargs.items():
+                with self._records_lock:
+                    response = self._get_response_from_records(args, kwargs)
+                if response is not None:
+                    if CHOSEN_APP is not None:
+                        time.sleep(DELAY_SERVER_CACHE_RETRIEVAL.val)
+                    keys_to_responses[key] = response
+        missing_keys = [key for key in keys_to_args_and_kwargs if key not in keys_to_responses]
+        if missing_keys:
+            if self.is_playing_or_recording and not self.record_more_if_needed:
+                raise NoMoreResponsesToMockError()
+            with ThreadPoolExecutor(max_workers=max_workers or len(missing_keys)) as executor:
+                new_responses = list(executor.map(
+                    lambda key: self._get_server_response_without_raising(*keys_to_args_and_kwargs[key][0],
+                                                                          **keys_to_args_and_kwargs[key][1]),
+                    missing_keys))
+            with self._records_lock:
+                for key, response in zip(missing_keys, new_responses):
+                    keys_to_responses[key] = response
+                    if self.is_playing_or_recording:
+                        args, kwargs = keys_to_args_and_kwargs[key]
+                        self._add_response_to_new_records(args, kwargs, response)
+                        if self.should_save:
+                            self._append_response_to_journal(args, kwargs, response)
+        responses = [keys_to_responses[convert_args_kwargs_to_tuple(args, kwargs)] for args, kwargs in args_and_kwargs]
+        if self.is_playing_or_recording:
+            self.args_kwargs_response_history.extend(
+                (args, kwargs, response) for (args, kwargs), response in zip(args_and_kwargs, responses))
+        return responses
+
     def _get_response_from_records(self, args, kwargs):
         tuple_args_and_kwargs = convert_args_kwargs_to_tuple(args, kwargs)
-        return self.all_records.get(tuple_args_and_kwargs, None)
+        if tuple_args_and_kwargs in self.new_records:
+            return self.new_records[tuple_args_and_kwargs]
+        return self.old_records.get(tuple_args_and_kwargs, None)
 
     def _add_response_to_new_records(self, args, kwargs, response):
         tuple_args_and_kwargs = convert_args_kwargs_to_tuple(args, kwargs)
         self.new_records[tuple_args_and_kwargs] = response
 
+    def _get_journal_entry(self, args, kwargs, response):
+        return convert_args_kwargs_to_tuple(args, kwargs), response
+
+    def _add_journal_entry_to_records(self, records, entry):
+        tuple_args_and_kwargs, response = entry
+        records[tuple_args_and_kwargs] = response
+
     def _save_records(self, records, filepath):
         with open(filepath, 'wb') as file:
             pickle.dump(records, file)
@@ -7,7 +7,7 @@ from unidecode import unidecode
 from data_to_paper.exceptions import data_to_paperException
 
 from .base_server import ParameterizedQueryServerCaller
-from .custom_types import Citation
+from .custom_types import Citation, cached_rendering
 
 CROSSREF_URL = "https://api.crossref.org/works"
 
@@ -82,6 +82,7 @@ class CrossrefCitation(Citation):
         return get_type_from_crossref(self)
 
     @property
+    @cached_rendering
     def bibtex(self) -> str:
         # create a mapping for article and inproceedings
         bibtex_type = get_type_from_crossref(self)
@@ -102,6 +103,7 @@ class CrossrefCitation(Citation):
         return BIBTEX_TEMPLATE.format(type=self.bibtex_type, id=self.bibtex_id, fields=',\n'.join(fields))
 
     @property
+    @cached_rendering
     def bibtex_id(self) -> str:
         """
         Get the bibtex id for this citation.
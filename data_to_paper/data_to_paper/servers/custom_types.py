@@ -1,4 +1,5 @@
-from typing import Iterable, Optional, Union, Set
+import functools
+from typing import Iterable, Optional, Union, Set, NamedTuple, Callable
 
 import numpy as np
 
@@ -17,9 +18,48 @@ FIELDS_TO_NAMES = {
 }
 
 
+# Fields whose representation depends only on the content of the citation (and can therefore be cached):
+CONTENT_FIELDS = ('bibtex_id', 'title', 'journal', 'journal_and_year', 'tldr', 'abstract', 'year', 'influence')
+
+
+class BibtexEntry(NamedTuple):
+    """
+    The bibtex of a citation, as written to the bib file.
+    """
+    bibtex_id: str
+    bibtex: str
+
+
+def cached_rendering(func: Callable) -> Callable:
+    """
+    Cache the value of a rendering method of a citation, per citation instance (and per arguments).
+    The cache is invalidated whenever the content of the citation is modified.
+    """
+    @functools.wraps(func)
+    def wrapper(self, *args):
+        cache = self.__dict__.setdefault('_rendering_cache', {})
+        key = (func.__name__, ) + args
+        if key not in cache:
+            cache[key] = func(self, *args)
+        return cache[key]
+    return wrapper
+
+
+def _invalidates_rendering(func: Callable) -> Callable:
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        # We access __dict__ directly, as unpickling sets the dict items before the instance attributes:
+        self.__dict__.pop('_rendering_cache', None)
+        return func(self, *args, **kwargs)
+    return wrapper
+
+
 class Citation(dict):
     """
     A citation of a paper.
+
+    The rendered values of the citation (bibtex, bibtex_id, pretty_repr) are computed lazily, once per instance
+    (see `cached_rendering`), and are re-computed only if the citation is modified.
     """
 
     def __init__(self, *args, search_rank: int = None, query: Union[str, Set[str]] = None, **kwargs):
@@ -27,6 +67,15 @@ class Citation(dict):
         self.search_rank = search_rank
         self.query = query
 
+    __setitem__ = _invalidates_rendering(dict.__setitem__)
+    __delitem__ = _invalidates_rendering(dict.__delitem__)
+    __ior__ = _invalidates_rendering(dict.__ior__)
+    clear = _invalidates_rendering(dict.clear)
+    pop = _invalidates_rendering(dict.pop)
+    popitem = _invalidates_rendering(dict.popitem)
+    setdefault = _invalidates_rendering(dict.setdefault)
+    update = _invalidates_rendering(dict.update)
+
     def __key(self):
         return self.bibtex_id
 
@@ -72,6 +121,10 @@ class Citation(dict):
     def embedding(self) -> Optional[np.ndarray]:
         return None
 
+    @property
+    def bibtex_entry(self) -> BibtexEntry:
+        return BibtexEntry(self.bibtex_id, self.bibtex)
+
     @property
     def journal_and_year(self) -> Optional[str]:
         if self.journal is None or self.year is None:
@@ -88,16 +141,30 @@ class Citation(dict):
                     fields: Iterable[str] = ('bibtex_id', 'title', 'journal_and_year', 'tldr', 'influence'),
                     is_html: bool = False,
                     embedding_target: float = None,
+                    embedding_similarity: Optional[float] = None,
                     ) -> str:
         """
         Get a pretty representation of the citation.
         Allows specifying which fields to include.
+        The embedding similarity can be provided, if already known (see `CitationEmbeddingIndex`).
         """
+        fields = tuple(fields)
+        if all(field in CONTENT_FIELDS for field in fields):
+            return self._get_content_pretty_repr(fields, is_html)
+        return self._get_pretty_repr(fields, is_html, embedding_target, embedding_similarity)
+
+    @cached_rendering
+    def _get_content_pretty_repr(self, fields: tuple, is_html: bool) -> str:
+        return self._get_pretty_repr(fields, is_html)
+
+    def _get_pretty_repr(self, fields: Iterable[str], is_html: bool = False, embedding_target: float = None,
+                         embedding_similarity: Optional[float] = None) -> str:
         s = ''
         for field in fields:
             name = FIELDS_TO_NAMES[field]
             if field == 'embedding_similarity':
-                value = self.get_embedding_similarity(embedding_target)
+                value = embedding_similarity if embedding_similarity is not None \
+                    else self.get_embedding_similarity(embedding_target)
                 value = None if value is None else round(value, 2)
             else:
                 value = getattr(self, field, field)
@@ -121,3 +188,19 @@ class Citation(dict):
 
     def __repr__(self):
         return self.__str__()
+
+
+def render_bib_file(citations: Iterable[Citation], file_path: Optional[str] = None) -> str:
+    """
+    Render the bibtex of the citations as the content of a bib file, with a single entry per bibtex_id.
+    If file_path is given, the content is also written to the file.
+    """
+    bibtex_ids_to_bibtex = {}
+    for citation in citations:
+        bibtex_id, bibtex = citation.bibtex_entry
+        bibtex_ids_to_bibtex.setdefault(bibtex_id, bibtex)
+    content = '\n\n'.join(bibtex_ids_to_bibtex.values())
+    if file_path is not None:
+        with open(file_path, 'w') as f:
+            f.write(content)
+    return content
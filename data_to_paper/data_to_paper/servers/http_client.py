@@ -0,0 +1,129 @@
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Optional, Collection, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from data_to_paper.utils.mutable import Mutable
+from data_to_paper.utils.print_to_file import print_and_log_red
+
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+@dataclass
+class TokenBucketRateLimiter:
+    """
+    Limit the rate of requests to `rate` per second, allowing bursts of up to `burst` requests.
+    `rate` can be a Mutable (e.g. a value from env), in which case it is read upon each request.
+    A rate of None means no limit.
+    """
+    rate: Union[None, float, Mutable] = None
+    burst: int = 1
+
+    _tokens: float = field(default=None, init=False, repr=False)
+    _last_time: float = field(default=None, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def get_rate(self) -> Optional[float]:
+        return self.rate.val if isinstance(self.rate, Mutable) else self.rate
+
+    def acquire(self):
+        """
+        Wait until a request is allowed, and consume its token.
+        """
+        rate = self.get_rate()
+        if rate is None:
+            return
+        with self._lock:
+            now = time.monotonic()
+            if self._tokens is None:
+                self._tokens, self._last_time = float(self.burst), now
+            self._tokens = min(float(self.burst), self._tokens + (now - self._last_time) * rate)
+            self._last_time = now
+            # We take the token now (possibly going into debt), and wait outside the lock:
+            self._tokens -= 1
+            wait_time = -self._tokens / rate if self._tokens < 0 else 0.
+        if wait_time > 0:
+            time.sleep(wait_time)
+
+
+def get_backoff_time(attempt: int, base: float = 1., cap: float = 30.) -> float:
+    """
+    Exponential backoff with full jitter, so that concurrent requests that failed together do not retry together.
+    """
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+@dataclass
+class HttpClient:
+    """
+    An http client shared by concurrent requests to the same server.
+
+    Requests go through a single keep-alive session (connections are pooled, up to `pool_size`), are rate-limited
+    (see `TokenBucketRateLimiter`), and are retried with jittered exponential backoff upon rate-limit and
+    server errors (honoring the `Retry-After` header of the server).
+    """
+    rate_limiter: TokenBucketRateLimiter = field(default_factory=TokenBucketRateLimiter)
+    pool_size: int = 16
+    max_retries: int = 8  # upon rate-limit and server errors
+    max_connection_retries: int = 2  # upon connection errors and timeouts
+    backoff_base: float = 1.  # seconds
+    backoff_cap: float = 30.  # seconds
+    retry_status_codes: Collection[int] = RETRY_STATUS_CODES
+    timeout: Optional[float] = 60.  # seconds, for each request
+
+    _session: Optional[requests.Session] = field(default=None, init=False, repr=False)
+    _session_lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def get_session(self) -> requests.Session:
+        with self._session_lock:
+            if self._session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+                session.mount('http://', adapter)
+                session.mount('https://', adapter)
+                self._session = session
+            return self._session
+
+    def _get_retry_time(self, response: requests.Response, attempt: int) -> float:
+        retry_after = response.headers.get('Retry-After')
+        try:
+            return min(float(retry_after), self.backoff_cap)
+        except (TypeError, ValueError):
+            return get_backoff_time(attempt, self.backoff_base, self.backoff_cap)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        """
+        Send the request, retrying upon rate-limit and server errors.
+        Returns the last response (which may still be an error response, if all retries failed).
+        """
+        kwargs.setdefault('timeout', self.timeout)
+        session = self.get_session()
+        num_connection_errors = 0
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = session.request(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                num_connection_errors += 1
+                if num_connection_errors > self.max_connection_retries or attempt == self.max_retries:
+                    raise
+                sleep_time = get_backoff_time(attempt, self.backoff_base, self.backoff_cap)
+                print_and_log_red(f'ERROR: {type(e).__name__}. We wait for {sleep_time:.1f} sec and try again.',
+                                  should_log=False)
+            else:
+                if response.status_code not in self.retry_status_codes or attempt == self.max_retries:
+                    return response
+                sleep_time = self._get_retry_time(response, attempt)
+                print_and_log_red(f'ERROR: Server returned {response.status_code}. '
+                                  f'We wait for {sleep_time:.1f} sec and try again.', should_log=False)
+            time.sleep(sleep_time)
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request('POST', url, **kwargs)
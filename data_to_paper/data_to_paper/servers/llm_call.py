@@ -1,14 +1,17 @@
 from __future__ import annotations
 
+import functools
 import time
 from dataclasses import dataclass
-from typing import List, Union, Callable, Tuple, Optional
+from typing import List, Union, Callable, Tuple, Optional, Iterable, Iterator
 from typing import TYPE_CHECKING
 
 import openai
+import requests
 import tiktoken
 
-from data_to_paper.env import LLM_MODELS_TO_API_KEYS_AND_BASE_URL, CHOSEN_APP, FAKE_REQUEST_HUMAN_RESPONSE_ON_PLAYBACK
+from data_to_paper.env import LLM_MODELS_TO_API_KEYS_AND_BASE_URL, CHOSEN_APP, \
+    FAKE_REQUEST_HUMAN_RESPONSE_ON_PLAYBACK, STREAM_LLM_RESPONSES, LLM_RESPONSE_TIMEOUT, LLM_RESPONSE_IDLE_TIMEOUT
 from data_to_paper.exceptions import TerminateException
 from data_to_paper.interactive import HumanAction, BaseApp
 from data_to_paper.utils.print_to_file import print_and_log_red, print_and_log
@@ -23,14 +26,17 @@ from .serialize_exceptions import serialize_exception, is_exception, de_serializ
 if TYPE_CHECKING:
     from data_to_paper.conversation.message import Message
 
-TIME_LIMIT_FOR_OPENAI_CALL = 300  # seconds
 MAX_NUM_LLM_ATTEMPTS = 5
 DEFAULT_EXPECTED_TOKENS_IN_RESPONSE = 500
+NUM_TOKENS_SEPARATING_MESSAGES = 1
 OPENAI_MAX_CONTENT_LENGTH_MESSAGE_CONTAINS = 'maximum context length'
 
-
 # a sub-string that indicates that an openai exception was raised due to the message content being too long
 
+# A function of the response received so far, returning True if the rest of the response is not needed
+# (e.g. the response is already known to be invalid):
+StopStreamingCondition = Callable[[str], bool]
+
 
 @dataclass
 class TooManyTokensInMessageError(Exception):
@@ -51,6 +57,54 @@ class UserAbort(TerminateException):
     pass
 
 
+@dataclass
+class LLMResponseTimeoutError(TimeoutError):
+    """
+    Exception raised when the LLM response is not complete within the timeout.
+    """
+    timeout_sec: float
+
+    def __str__(self):
+        return f'The LLM response was not complete within {self.timeout_sec} seconds.'
+
+
+def iterate_llm_response_chunks(response: Iterable[dict], deadline: Optional[float] = None) -> Iterator[str]:
+    """
+    Yield the content of a streamed openai response, chunk by chunk, as the chunks arrive.
+    Raise LLMResponseTimeoutError if the response is not complete by the deadline (`time.monotonic()` time).
+    """
+    for chunk in response:
+        if deadline is not None and time.monotonic() > deadline:
+            raise LLMResponseTimeoutError(LLM_RESPONSE_TIMEOUT.val)
+        choices = chunk.get('choices')
+        if not choices:
+            continue
+        content = choices[0].get('delta', {}).get('content')
+        if content:
+            yield content
+
+
+def get_streamed_content(response: Iterable[dict], deadline: Optional[float] = None,
+                         stop_streaming_when: Optional[StopStreamingCondition] = None) -> str:
+    """
+    Return the content of a streamed openai response.
+    If `stop_streaming_when` returns True for the content received so far, the response is closed,
+    and the content received so far is returned.
+    """
+    content = ''
+    try:
+        for chunk in iterate_llm_response_chunks(response, deadline):
+            content += chunk
+            if stop_streaming_when is not None and stop_streaming_when(content):
+                print_and_log_red('Stopped receiving the LLM response (the rest of the response is not needed).',
+                                  should_log=False)
+                break
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+    return content
+
+
 @dataclass
 class LLMResponse(SerializableValue):
     """
@@ -139,10 +193,13 @@ class OpenaiServerCaller(OrderedKeyToListServerCaller):
             self._log_api_usage_cost(action.value, args[0], kwargs['model_engine'])
         return action
 
-    def _get_server_response(self, messages: List[Message], model_engine: Union[ModelEngine, Callable], **kwargs
+    def _get_server_response(self, messages: List[Message], model_engine: Union[ModelEngine, Callable],
+                             stop_streaming_when: Optional[StopStreamingCondition] = None, **kwargs
                              ) -> Union[LLMResponse, HumanAction, Exception]:
         """
         Connect with openai to get response to conversation.
+        When streaming (STREAM_LLM_RESPONSES), the response is stopped early if `stop_streaming_when` returns True
+        for the content received so far. Either way, the response is recorded as a single LLMResponse.
         """
         if not isinstance(model_engine, ModelEngine):
             # human action:
@@ -159,18 +216,30 @@ class OpenaiServerCaller(OrderedKeyToListServerCaller):
             raise ValueError(f'API key for {model_engine} is not defined.')
         openai.api_key = api_key
         openai.api_base = api_base_url
+        is_streaming = bool(STREAM_LLM_RESPONSES)
+        # The timeouts are enforced by the http requests (no signals), so they also work on a Worker of Qt.
+        # When streaming, the request timeout applies to each chunk (idle timeout), and we check the overall
+        # time as the chunks arrive:
+        request_timeout = LLM_RESPONSE_IDLE_TIMEOUT.val if is_streaming else LLM_RESPONSE_TIMEOUT.val
         for attempt in range(MAX_NUM_LLM_ATTEMPTS):
+            deadline = None if LLM_RESPONSE_TIMEOUT.val is None else time.monotonic() + LLM_RESPONSE_TIMEOUT.val
             try:
-                # TODO: Need to implement timeout. Our current timeout_context() is not working on a Worker of Qt.
                 response = openai.ChatCompletion.create(
                     model=model_engine.value,
                     messages=[message.to_llm_dict() for message in messages],
+                    stream=is_streaming,
+                    request_timeout=request_timeout,
                     **kwargs,
                 )
+                if is_streaming:
+                    content = get_streamed_content(response, deadline, stop_streaming_when)
+                else:
+                    content = response['choices'][0]['message']['content']
                 break
             except openai.error.InvalidRequestError:
                 raise
-            except (openai.error.OpenAIError, TimeoutError) as e:
+            except (openai.error.OpenAIError, TimeoutError, requests.exceptions.RequestException) as e:
+                # requests exceptions are raised when a streamed response stalls or is dropped mid-stream
                 sleep_time = 1.0 * 2 ** attempt
                 print_and_log_red(f'Unexpected OPENAI error:\n{type(e)}\n{e}\n'
                                   f'Going to sleep for {sleep_time} seconds before trying again.',
@@ -181,7 +250,6 @@ class OpenaiServerCaller(OrderedKeyToListServerCaller):
         else:
             raise Exception(f'Failed to get response from OPENAI after {MAX_NUM_LLM_ATTEMPTS} attempts.')
 
-        content = response['choices'][0]['message']['content']
         self._check_after_spending_money(content, messages, model_engine)
         return LLMResponse(content)
 
@@ -191,6 +259,7 @@ class OpenaiServerCaller(OrderedKeyToListServerCaller):
         """
         delete_all_stages_following_stage(self.old_records, stage)
         delete_all_stages_following_stage(self.new_records, stage)
+        self.on_old_records_changed()
         self.save_records()
 
     @staticmethod
@@ -215,24 +284,50 @@ class OpenaiServerCaller(OrderedKeyToListServerCaller):
 OPENAI_SERVER_CALLER = OpenaiServerCaller()
 
 
+@functools.lru_cache(maxsize=None)
+def get_encoding_for_model(model_engine: ModelEngine) -> tiktoken.Encoding:
+    """
+    Return the tiktoken encoding of the model.
+    Encodings are created once per model and are shared across the process.
+    """
+    try:
+        return tiktoken.encoding_for_model(model_engine.value)
+    except KeyError:
+        return tiktoken.encoding_for_model(ModelEngine.GPT35_TURBO.value)
+
+
+@functools.lru_cache(maxsize=1024)
+def _count_number_of_tokens_in_text(text: str, encoding_name: str) -> int:
+    return len(tiktoken.get_encoding(encoding_name).encode(text))
+
+
+def count_number_of_tokens_in_text(text: str, model_engine: ModelEngine = None) -> int:
+    """
+    Count number of tokens in text using tiktoken.
+    """
+    return _count_number_of_tokens_in_text(text, get_encoding_for_model(model_engine or ModelEngine.DEFAULT).name)
+
+
 def count_number_of_tokens_in_message(messages: Union[List[Message], str], model_engine: ModelEngine) -> int:
     """
     Count number of tokens in message using tiktoken.
+
+    For a list of messages, we sum the (memoized) number of tokens of each message,
+    plus one token for the separation between consecutive messages.
     """
     if model_engine is None:
         model_engine = ModelEngine.DEFAULT
-    try:
-        encoding = tiktoken.encoding_for_model(model_engine.value)
-    except KeyError:
-        encoding = tiktoken.encoding_for_model(ModelEngine.GPT35_TURBO.value)
-    if not isinstance(messages, str):
-        messages = '\n'.join([message.content for message in messages])
-    return len(encoding.encode(messages))
+    if isinstance(messages, str):
+        return count_number_of_tokens_in_text(messages, model_engine)
+    return sum(message.get_number_of_tokens(model_engine) for message in messages) \
+        + max(len(messages) - 1, 0) * NUM_TOKENS_SEPARATING_MESSAGES
 
 
 def try_get_llm_response(messages: List[Message],
                          model_engine: ModelEngine = None,
                          expected_tokens_in_response: int = None,
+                         tokens_in_messages: Optional[int] = None,
+                         stop_streaming_when: Optional[StopStreamingCondition] = None,
                          **kwargs) -> Union[str, Exception]:
     """
     Try to get a response from openai to a specified conversation.
@@ -240,6 +335,10 @@ def try_get_llm_response(messages: List[Message],
     The conversation is sent to openai after removing comment messages and any messages indicated
     in `hidden_messages`.
 
+    `tokens_in_messages` is the number of tokens in the messages, if already known.
+
+    `stop_streaming_when` allows stopping a streamed response early (see `StopStreamingCondition`).
+
     If getting a response is successful then return response string.
     If failed due to openai exception, return None.
     """
@@ -247,7 +346,8 @@ def try_get_llm_response(messages: List[Message],
         model_engine = ModelEngine.DEFAULT
     if expected_tokens_in_response is None:
         expected_tokens_in_response = DEFAULT_EXPECTED_TOKENS_IN_RESPONSE
-    tokens = count_number_of_tokens_in_message(messages, model_engine)
+    tokens = tokens_in_messages if tokens_in_messages is not None \
+        else count_number_of_tokens_in_message(messages, model_engine)
     if tokens + expected_tokens_in_response > model_engine.max_tokens:
         return TooManyTokensInMessageError(tokens, expected_tokens_in_response, model_engine)
     print_and_log_red(f'Using {model_engine} (max {model_engine.max_tokens} tokens) '
@@ -256,7 +356,8 @@ def try_get_llm_response(messages: List[Message],
         print_and_log(f'WARNING: Consider using {ModelEngine.DEFAULT} (max {ModelEngine.DEFAULT.max_tokens} tokens).',
                       should_log=False)
     try:
-        action = OPENAI_SERVER_CALLER.get_server_response(messages, model_engine=model_engine, **kwargs)
+        action = OPENAI_SERVER_CALLER.get_server_response(messages, model_engine=model_engine,
+                                                          stop_streaming_when=stop_streaming_when, **kwargs)
         if isinstance(action, HumanAction):
             err = 'Human action retrieved, instead of LLM response.'
             if CHOSEN_APP == None:  # noqa (Mutable)
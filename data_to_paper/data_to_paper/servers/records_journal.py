@@ -0,0 +1,116 @@
+import hashlib
+import json
+import os
+import pickle
+from pathlib import Path
+from typing import Union, Optional, List, Any
+
+
+class RecordsJournal:
+    """
+    An append-only log of records, kept alongside a records file.
+
+    New records are appended to the journal as they arrive, instead of re-writing the whole records file.
+    The journal is compacted into the records file by the server caller (see `ServerCaller.save_records`).
+
+    The first frame of the journal is a header with the digest of the records file on which the journal is based.
+    A journal whose base does not match the current records file is stale (e.g. left over after the records file
+    was compacted, but before the journal was deleted) and is ignored.
+    """
+    extension = '.journal'
+
+    def __init__(self, records_file_path: Union[str, Path]):
+        self.records_file_path = Path(records_file_path)
+        self.file_path = Path(str(records_file_path) + self.extension)
+        self.num_records = 0
+
+    @classmethod
+    def get_journal_file_path(cls, records_file_path: Union[str, Path]) -> Path:
+        return Path(str(records_file_path) + cls.extension)
+
+    def _get_records_file_digest(self) -> Optional[str]:
+        if not self.records_file_path.is_file():
+            return None
+        with open(self.records_file_path, 'rb') as file:
+            return hashlib.md5(file.read()).hexdigest()
+
+    def _write_frames(self, frames: List[Any]):
+        raise NotImplementedError()
+
+    def _read_frames(self) -> List[Any]:
+        """
+        Read all the complete frames of the journal file.
+        An incomplete last frame (e.g. due to a crash while writing) is ignored.
+        """
+        raise NotImplementedError()
+
+    def append(self, entry):
+        frames = [entry]
+        if not self.file_path.exists():
+            self.file_path.parent.mkdir(parents=True, exist_ok=True)
+            frames.insert(0, {'base': self._get_records_file_digest()})
+        self._write_frames(frames)
+        self.num_records += 1
+
+    def read(self) -> list:
+        """
+        Return the entries of the journal.
+        Returns an empty list if the journal does not exist or is stale.
+        """
+        self.num_records = 0
+        if not self.file_path.exists():
+            return []
+        frames = self._read_frames()
+        if not frames or frames[0] != {'base': self._get_records_file_digest()}:
+            # stale journal; its records are already in the records file:
+            self.delete()
+            return []
+        entries = frames[1:]
+        self.num_records = len(entries)
+        return entries
+
+    def delete(self):
+        if self.file_path.exists():
+            os.remove(self.file_path)
+        self.num_records = 0
+
+
+class JsonLinesRecordsJournal(RecordsJournal):
+    """
+    A journal of json-serializable records, saved one json per line.
+    """
+
+    def _write_frames(self, frames: List[Any]):
+        with open(self.file_path, 'a') as file:
+            file.write(''.join(json.dumps(frame) + '\n' for frame in frames))
+
+    def _read_frames(self) -> List[Any]:
+        frames = []
+        with open(self.file_path, 'r') as file:
+            for line in file:
+                try:
+                    frames.append(json.loads(line))
+                except json.JSONDecodeError:
+                    break
+        return frames
+
+
+class PickleRecordsJournal(RecordsJournal):
+    """
+    A journal of picklable records, saved as consecutive pickle frames.
+    """
+
+    def _write_frames(self, frames: List[Any]):
+        with open(self.file_path, 'ab') as file:
+            for frame in frames:
+                pickle.dump(frame, file)
+
+    def _read_frames(self) -> List[Any]:
+        frames = []
+        with open(self.file_path, 'rb') as file:
+            while True:
+                try:
+                    frames.append(pickle.load(file))
+                except (EOFError, pickle.UnpicklingError, ValueError):
+                    break
+        return frames
@@ -1,18 +1,16 @@
-import time
-
 import numpy as np
-import requests
 import re
 
 from dataclasses import dataclass
 from typing import List, Dict, Optional, Tuple
 
-from data_to_paper.env import SEMANTIC_SCHOLAR_API_KEY
+from data_to_paper.env import SEMANTIC_SCHOLAR_API_KEY, SEMANTIC_SCHOLAR_MAX_REQUESTS_PER_SECOND
 from data_to_paper.exceptions import data_to_paperException
 from data_to_paper.latex.clean_latex import replace_special_latex_chars
 from data_to_paper.servers.base_server import ParameterizedQueryServerCaller
 from data_to_paper.servers.crossref import ServerErrorCitationException
-from data_to_paper.servers.custom_types import Citation
+from data_to_paper.servers.http_client import HttpClient, TokenBucketRateLimiter
+from data_to_paper.servers.custom_types import Citation, cached_rendering
 from data_to_paper.utils.print_to_file import print_and_log_red
 from data_to_paper.utils.nice_list import NiceList
 
@@ -31,17 +29,18 @@ HEADERS = {
 PAPER_SEARCH_URL = 'https://api.semanticscholar.org/graph/v1/paper/search'
 EMBEDDING_URL = 'https://model-apis.semanticscholar.org/specter/v1/invoke'
 
+# Shared by all the (concurrent) requests to Semantic Scholar:
+SEMANTIC_SCHOLAR_HTTP_CLIENT = HttpClient(
+    rate_limiter=TokenBucketRateLimiter(rate=SEMANTIC_SCHOLAR_MAX_REQUESTS_PER_SECOND))
+
 
 get_bibtex_id_from_bibtex = lambda bibtex: bibtex.split('{', 1)[1].split(',\n', 1)[0]
 
 
 class SemanticCitation(Citation):
 
-    def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
-        self._bibtex_id = None
-
     @property
+    @cached_rendering
     def bibtex(self) -> str:
         bibtex = self['citationStyles']['bibtex']
 
@@ -66,11 +65,9 @@ class SemanticCitation(Citation):
         return bibtex
 
     @property
+    @cached_rendering
     def bibtex_id(self) -> str:
-        if self._bibtex_id is None:
-            bibtex_id = get_bibtex_id_from_bibtex(self.bibtex)
-            self._bibtex_id = bibtex_id
-        return self._bibtex_id
+        return get_bibtex_id_from_bibtex(self.bibtex)
 
     @property
     def title(self) -> Optional[str]:
@@ -145,13 +142,8 @@ class SemanticScholarPaperServerCaller(ParameterizedQueryServerCaller):
                 "fields": "title,url,abstract,tldr,journal,year,citationStyles,embedding,influentialCitationCount",
             }
             print_and_log_red(f'QUERYING SEMANTIC SCHOLAR FOR: "{query}"', should_log=False)
-            response = requests.get(PAPER_SEARCH_URL, headers=HEADERS, params=params)
-
-            if response.status_code in (504, 429):
-                print_and_log_red("ERROR: Server timed out or too many requests. "
-                                  "We wait for 5 sec and try again.", should_log=False)
-                time.sleep(5)
-                continue
+            # rate limits (429) and server timeouts (504) are retried by the client:
+            response = SEMANTIC_SCHOLAR_HTTP_CLIENT.get(PAPER_SEARCH_URL, headers=HEADERS, params=params)
 
             if response.status_code != 200:
                 raise ServerErrorCitationException(status_code=response.status_code, text=response.text)
@@ -240,7 +232,7 @@ class SemanticScholarEmbeddingServerCaller(ParameterizedQueryServerCaller):
         if not all(key in paper for key in ["paper_id", "title", "abstract"]):
             raise ValueError("Paper must have 'paper_id', 'title' and 'abstract' attributes.")
 
-        response = requests.post(EMBEDDING_URL, json=[paper])
+        response = SEMANTIC_SCHOLAR_HTTP_CLIENT.post(EMBEDDING_URL, json=[paper])
 
         if response.status_code != 200:
             raise ServerErrorCitationException(status_code=response.status_code, text=response.text)
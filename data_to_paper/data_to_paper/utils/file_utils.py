@@ -1,6 +1,7 @@
 import os
 import shutil
 import tempfile
+import threading
 import uuid
 import re
 from contextlib import contextmanager
@@ -19,6 +20,16 @@ def is_valid_filename(filename):
         return False
 
 
+def write_file_atomically(file_path: Path, content: bytes):
+    """
+    Write the file so that concurrent readers never see it partially written.
+    """
+    temp_file_path = file_path.with_name(file_path.name + f'.{os.getpid()}.{threading.get_ident()}.tmp')
+    with open(temp_file_path, 'wb') as f:
+        f.write(content)
+    os.replace(temp_file_path, file_path)
+
+
 def clear_directory(directory: Union[Path, str], create_if_missing: bool = True):
     """
     Clear the directory of all files and subdirectories.
@@ -1,6 +1,7 @@
 from __future__ import annotations
+import functools
 from dataclasses import dataclass
-from typing import List, Optional
+from typing import List, Optional, Tuple
 
 
 @dataclass
@@ -52,30 +53,9 @@ class FormattedSections(List[FormattedSection]):
         """
         Create FormattedSections from text.
         strip_label: if True, then ``` python \n etc``` is converted to label='python', not ' python '
+        The parsing is cached (see `_parse_text`); each call returns new FormattedSection objects.
         """
-        sections = text.split('```')
-        is_block = True
-        self = cls()
-        for i, section in enumerate(sections):
-            is_block = not is_block
-            if section == '':
-                continue
-            if is_block:
-                is_single_line = '\n' not in section
-                text_in_quote_line = section.split('\n')[0]
-                if strip_label:
-                    text_in_quote_line = text_in_quote_line.strip()
-                if not is_single_line and (text_in_quote_line == '' or text_in_quote_line.isalpha()):
-                    label = text_in_quote_line
-                    section = '\n' + '\n'.join(section.split('\n')[1:])
-                else:
-                    label = ''
-            else:
-                label = None
-            is_last = i == len(sections) - 1
-            is_incomplete = is_last and is_block
-            self.append(FormattedSection(label, section, not is_incomplete))
-        return self
+        return cls(FormattedSection(*section) for section in _parse_text(text, strip_label))
 
     def to_text(self) -> str:
         text = ''
@@ -101,3 +81,41 @@ class FormattedSections(List[FormattedSection]):
     def is_last_block_incomplete(self):
         last_block = self.get_last_block()
         return last_block is not None and not last_block.is_complete
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_text(text: str, strip_label: bool) -> Tuple[Tuple[Optional[str], str, bool], ...]:
+    """
+    Split the text into (label, section, is_complete) of its triple-backtick sections (see `FormattedSections`).
+    """
+    sections = text.split('```')
+    is_block = True
+    parsed_sections = []
+    for i, section in enumerate(sections):
+        is_block = not is_block
+        if section == '':
+            continue
+        if is_block:
+            is_single_line = '\n' not in section
+            text_in_quote_line = section.split('\n')[0]
+            if strip_label:
+                text_in_quote_line = text_in_quote_line.strip()
+            if not is_single_line and (text_in_quote_line == '' or text_in_quote_line.isalpha()):
+                label = text_in_quote_line
+                section = '\n' + '\n'.join(section.split('\n')[1:])
+            else:
+                label = ''
+        else:
+            label = None
+        is_last = i == len(sections) - 1
+        is_incomplete = is_last and is_block
+        parsed_sections.append((label, section, not is_incomplete))
+    return tuple(parsed_sections)
+
+
+def is_second_block_started(text: str) -> bool:
+    """
+    Return True if the text already has (the beginning of) a second triple-backtick block.
+    Cheap for texts with fewer than three triple-backticks, so it can be applied repeatedly to a streamed response.
+    """
+    return text.count('```') > 2 and len(FormattedSections.from_text(text).get_all_blocks()) > 1
@@ -1,4 +1,9 @@
+import hashlib
 import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
 from typing import Optional, Dict, Tuple, Callable
 from functools import partial
 
@@ -11,7 +16,7 @@ from pygments.styles import get_style_by_name
 from pygments import highlight, token
 from typing import List
 
-from data_to_paper.latex.latex_to_html import convert_latex_to_html
+from data_to_paper.latex.latex_to_html import convert_latex_to_html, convert_latexes_to_html
 from data_to_paper.env import CHOSEN_APP
 
 from .formatted_sections import FormattedSections
@@ -218,15 +223,92 @@ def is_text_md(text: str) -> bool:
     return text.strip().startswith('#')
 
 
+@dataclass
+class RenderCache:
+    """
+    A bounded cache of rendered sections, shared by the console and the html rendering
+    (see `format_text_with_code_blocks`).
+    Keeps statistics of the hit rate and of the rendering time saved by the cache.
+    """
+    max_size: int = 4096  # number of rendered sections
+
+    num_hits: int = 0
+    num_misses: int = 0
+    time_saved: float = 0.  # seconds
+
+    _keys_to_renders: OrderedDict = field(default_factory=OrderedDict, init=False, repr=False)
+    _lock: threading.Lock = field(default_factory=threading.Lock, init=False, repr=False)
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self._keys_to_renders
+
+    def render(self, key: tuple, render_func: Callable[[], str]) -> str:
+        """
+        Return the cached rendering of the key, or render it with `render_func` and cache it.
+        """
+        with self._lock:
+            cached = self._keys_to_renders.get(key)
+            if cached is not None:
+                self._keys_to_renders.move_to_end(key)
+                rendered, render_time = cached
+                self.num_hits += 1
+                self.time_saved += render_time
+                return rendered
+        start = time.perf_counter()
+        rendered = render_func()
+        render_time = time.perf_counter() - start
+        with self._lock:
+            self.num_misses += 1
+            self._keys_to_renders[key] = (rendered, render_time)
+            while len(self._keys_to_renders) > self.max_size:
+                self._keys_to_renders.popitem(last=False)
+        return rendered
+
+    @property
+    def hit_rate(self) -> float:
+        num_renders = self.num_hits + self.num_misses
+        return self.num_hits / num_renders if num_renders else 0.
+
+    def get_stats(self) -> str:
+        return f'Render cache: {self.hit_rate:.0%} hits ({self.num_hits} of {self.num_hits + self.num_misses}), ' \
+               f'{self.time_saved:.2f} sec saved'
+
+    def clear(self):
+        with self._lock:
+            self._keys_to_renders.clear()
+            self.num_hits = self.num_misses = 0
+            self.time_saved = 0.
+
+
+RENDER_CACHE = RenderCache()
+
+
+def _render_section(formatter: Callable, section: str, label: Optional[str], is_html: bool, from_md: bool,
+                    width: Optional[int], text_color: str) -> str:
+    if is_html:
+        if formatter == text_to_html:
+            return formatter(section, from_md=from_md)
+        elif formatter == _block_to_html:
+            return formatter(section, label=label)
+        else:
+            return formatter(section)
+    else:
+        section = wrap_string(section, width=width)
+        return formatter(section, color=text_color, label=label)
+
+
 def format_text_with_code_blocks(text: str, text_color: str = '', from_md: Optional[bool] = None,
                                  width: Optional[int] = 150, is_html: bool = False,
                                  do_not_format: List[str] = None) -> str:
+    """
+    Format the text and its triple-backtick blocks, for the console or as html.
+    The formatting of each section is cached (see `RenderCache`).
+    """
     if from_md is None:
         from_md = is_text_md(text)
     do_not_format = do_not_format or []
-    s = ''
-    formatted_sections = FormattedSections.from_text(text)
-    for formatted_section in formatted_sections:
+    keys_and_sections = []
+    for formatted_section in FormattedSections.from_text(text):
         label, section, is_complete = formatted_section.to_tuple()
         if not is_complete:
             formatters = NORMAL_FORMATTERS
@@ -237,14 +319,18 @@ def format_text_with_code_blocks(text: str, text_color: str = '', from_md: Optio
             else:
                 formatters = TAGS_TO_FORMATTERS.get(label, BLOCK_FORMATTERS)
         formatter = formatters[is_html]
-        if is_html:
-            if formatter == text_to_html:
-                s += formatter(section, from_md=from_md)
-            elif formatter == _block_to_html:
-                s += formatter(section, label=label)
-            else:
-                s += formatter(section)
-        else:
-            section = wrap_string(section, width=width)
-            s += formatter(section, color=text_color, label=label)
-    return s
+        section_hash = hashlib.blake2b(section.encode('utf-8', errors='surrogatepass'), digest_size=16).digest()
+        key = (label, section_hash, is_html, width, text_color, from_md, formatter)
+        keys_and_sections.append((key, formatter, section, label))
+
+    if is_html:
+        # convert all the latex blocks with a single pandoc run (the conversions are cached):
+        latex_blocks = [section for key, formatter, section, _ in keys_and_sections
+                        if formatter == convert_latex_to_html and key not in RENDER_CACHE]
+        if len(latex_blocks) > 1:
+            convert_latexes_to_html(latex_blocks)
+
+    return ''.join(
+        RENDER_CACHE.render(key, partial(_render_section, formatter, section, label, is_html, from_md, width,
+                                         text_color))
+        for key, formatter, section, label in keys_and_sections)
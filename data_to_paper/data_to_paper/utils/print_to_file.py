@@ -1,11 +1,18 @@
+import atexit
+import os
+import queue
+import sys
+import threading
 from contextlib import contextmanager
-from typing import Optional
+from typing import List, Optional, Tuple
 
 import colorama
 from functools import partial
 
 from pathlib import Path
 
+from data_to_paper.env import CONSOLE_LOG_WRITE_MODE, CONSOLE_LOG_MAX_QUEUED_LINES
+
 from .console_log_to_html import convert_console_log_to_html
 from .highlighted_text import colored_text
 from .mutable import Mutable
@@ -13,41 +20,201 @@ from .mutable import Mutable
 CONSOLE_LOG_FILE = Mutable(None)
 
 
+def get_bw_file_path(file_path: Path) -> Path:
+    return file_path.with_stem(file_path.stem + '_bw')
+
+
+def _append_to_file(file_path: Path, text: str):
+    try:
+        with open(file_path, 'a', encoding='utf-8') as f:
+            f.write(text)
+    except Exception as e:
+        print(f'Failed to write to the console log {file_path}: {e!r}', file=sys.stderr)
+
+
+def _append_to_log_files(file_path: Path, text_in_color: str, text_in_bw: str):
+    _append_to_file(file_path, text_in_color)
+    _append_to_file(get_bw_file_path(file_path), text_in_bw)
+
+
+class ConsoleLogWriter:
+    """
+    Write to the console log files (in color, and in black-and-white), keeping the files open.
+
+    mode:
+        'async': texts are queued, and are written by a background thread, which flushes the files whenever
+            the queue is drained. The queue is bounded by `max_queued_lines`, so that a crash loses at most
+            the queued lines and the lines of the batch being written.
+        'sync': texts are written and flushed as they are printed.
+    The files are flushed upon `flush()`, and are closed upon `close()` (or at exit).
+    Processes forked from the process that created the writer, and writes after closing, append to the files
+    directly. Errors in writing to the open files are reported to stderr, and the text is appended to the file
+    directly instead.
+    """
+
+    PUT_TIMEOUT = 0.1  # seconds; checking that the background thread is alive, while waiting for the queue
+
+    def __init__(self, file_path: Path, mode: str = 'async', max_queued_lines: int = 1000):
+        if mode not in ('async', 'sync'):
+            raise ValueError(f'Unknown console log write mode: {mode}')
+        self.file_path = file_path
+        self.mode = mode
+        self._pid = os.getpid()
+        self._is_closed = False
+        self._num_writing = 0  # number of writes in progress
+        self._state_changed = threading.Condition()  # guards `_is_closed` and `_num_writing`
+        self._files_lock = threading.Lock()
+        self._file_paths = [file_path, get_bw_file_path(file_path)]
+        self._files = [open(path, 'a', encoding='utf-8') for path in self._file_paths]
+        self._queue: Optional[queue.Queue] = None
+        self._thread: Optional[threading.Thread] = None
+        if mode == 'async':
+            self._queue = queue.Queue(maxsize=max_queued_lines)
+            self._thread = threading.Thread(target=self._write_queued_texts, name='ConsoleLogWriter', daemon=True)
+            self._thread.start()
+        atexit.register(self.close)
+
+    def _write_to_files(self, texts: List[Tuple[str, str]]):
+        with self._files_lock:
+            for index, (file_path, file) in enumerate(zip(self._file_paths, self._files)):
+                for text in texts:
+                    try:
+                        file.write(text[index])
+                    except Exception as e:
+                        print(f'Failed to write to the console log {file_path}: {e!r}', file=sys.stderr)
+                        _append_to_file(file_path, text[index])
+                try:
+                    file.flush()
+                except Exception as e:
+                    print(f'Failed to flush the console log {file_path}: {e!r}', file=sys.stderr)
+
+    def _write_queued_texts(self):
+        while True:
+            texts = [self._queue.get()]
+            while True:
+                try:
+                    texts.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._write_to_files([text for text in texts if text is not None])
+            except Exception as e:
+                print(f'Failed to write to the console log {self.file_path}: {e!r}', file=sys.stderr)
+            finally:
+                for _ in texts:
+                    self._queue.task_done()
+            if None in texts:
+                return
+
+    def _is_writing_in_background(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _put(self, texts: Tuple[str, str]) -> bool:
+        """
+        Queue the texts. Return False if the background thread is not running.
+        """
+        while self._is_writing_in_background():
+            try:
+                self._queue.put(texts, timeout=self.PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def write(self, text_in_color: str, text_in_bw: str):
+        if os.getpid() == self._pid:
+            with self._state_changed:
+                is_closed = self._is_closed
+                if not is_closed:
+                    self._num_writing += 1
+            if not is_closed:
+                try:
+                    if not self._put((text_in_color, text_in_bw)):
+                        self._write_to_files([(text_in_color, text_in_bw)])
+                finally:
+                    with self._state_changed:
+                        self._num_writing -= 1
+                        self._state_changed.notify_all()
+                return
+        _append_to_log_files(self.file_path, text_in_color, text_in_bw)
+
+    def flush(self):
+        """
+        Wait until all the texts written so far are written to the files.
+        """
+        if os.getpid() == self._pid and not self._is_closed and self._is_writing_in_background():
+            self._queue.join()
+
+    def close(self):
+        if os.getpid() != self._pid:
+            return
+        with self._state_changed:
+            if self._is_closed:
+                return
+            self._is_closed = True
+            # let the writes in progress complete:
+            self._state_changed.wait_for(lambda: self._num_writing == 0)
+        self._put(None)
+        if self._thread is not None:
+            self._thread.join()
+        with self._files_lock:
+            for file in self._files:
+                try:
+                    file.close()
+                except Exception as e:
+                    print(f'Failed to close the console log {file.name}: {e!r}', file=sys.stderr)
+        atexit.unregister(self.close)
+
+
+_CONSOLE_LOG_WRITER: Optional[ConsoleLogWriter] = None
+
+
 @contextmanager
 def console_log_file_context(file_path: Path):
     """
     Context manager to temporarily change the console log file.
+    The log files are kept open (see `ConsoleLogWriter`) until exiting the context.
     If run is successful, also converts the console log to html.
     """
-    global CONSOLE_LOG_FILE
-    old_val = CONSOLE_LOG_FILE.val
-    CONSOLE_LOG_FILE.val = file_path
+    global _CONSOLE_LOG_WRITER
+    old_val, old_writer = CONSOLE_LOG_FILE.val, _CONSOLE_LOG_WRITER
+    writer = ConsoleLogWriter(file_path, mode=CONSOLE_LOG_WRITE_MODE.val,
+                              max_queued_lines=CONSOLE_LOG_MAX_QUEUED_LINES.val)
+    CONSOLE_LOG_FILE.val, _CONSOLE_LOG_WRITER = file_path, writer
     try:
         yield
-    except Exception:
-        raise
-    else:
-        convert_console_log_to_html(CONSOLE_LOG_FILE.val)
     finally:
-        CONSOLE_LOG_FILE.val = old_val
+        CONSOLE_LOG_FILE.val, _CONSOLE_LOG_WRITER = old_val, old_writer
+        writer.close()
+    convert_console_log_to_html(file_path)
+
+
+def flush_console_log():
+    """
+    Wait until all the printed lines are written to the console log files.
+    """
+    if _CONSOLE_LOG_WRITER is not None:
+        _CONSOLE_LOG_WRITER.flush()
 
 
 def print_and_log(text_in_bw: str, text_in_color: Optional[str] = None, color: Optional[str] = None,
-                  should_log: bool = True, **kwargs):
+                  should_log: bool = True, should_print: bool = True, **kwargs):
     if color is not None:
         assert text_in_color is None
         text_in_color = colored_text(text_in_bw, color)
     else:
         if text_in_color is None:
             text_in_color = text_in_bw
-    print(text_in_color, **kwargs)
+    if should_print:
+        print(text_in_color, **kwargs)
     if should_log and CONSOLE_LOG_FILE.val is not None:
-        file_path_color = CONSOLE_LOG_FILE.val  # pathlib.Path
-        with open(file_path_color, 'a', encoding='utf-8') as f:
-            print(text_in_color, file=f, **kwargs)
-        file_path_bw = file_path_color.with_stem(file_path_color.stem + '_bw')
-        with open(file_path_bw, 'a', encoding='utf-8') as f:
-            print(text_in_bw, file=f, **kwargs)
+        end = kwargs.get('end')
+        end = '\n' if end is None else end
+        writer = _CONSOLE_LOG_WRITER
+        if writer is not None and writer.file_path == CONSOLE_LOG_FILE.val:
+            writer.write(f'{text_in_color}{end}', f'{text_in_bw}{end}')
+        else:
+            _append_to_log_files(CONSOLE_LOG_FILE.val, f'{text_in_color}{end}', f'{text_in_bw}{end}')
 
 
 print_and_log_red = partial(print_and_log, color=colorama.Fore.RED)
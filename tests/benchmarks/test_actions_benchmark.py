@@ -0,0 +1,49 @@
+import time
+
+import pytest
+
+from data_to_paper import Message, Role
+from data_to_paper.conversation.actions_and_conversations import Actions, Conversations
+from data_to_paper.conversation.conversation_actions import AppendMessage
+
+pytestmark = pytest.mark.benchmark
+
+NUM_ACTIONS = 20_000
+NUM_CONVERSATIONS = 50
+NUM_UNIQUE_CONTENTS = 5000
+NUM_ACTIONS_FOR_SCAN = 2000  # the legacy full scan is quadratic; we time it on a shorter log
+
+
+def _get_action(conversations: Conversations, index: int) -> AppendMessage:
+    return AppendMessage(
+        conversations=conversations,
+        conversation_name=f'conversation {index % NUM_CONVERSATIONS}',
+        message=Message(Role.USER, f'content {index % NUM_UNIQUE_CONTENTS}\n' + 'x' * 200),
+    )
+
+
+def test_benchmark_dedupe_check_on_20k_actions(record_property):
+    conversations = Conversations()
+    actions = Actions()
+    num_repeated = 0
+    start = time.perf_counter()
+    for index in range(NUM_ACTIONS):
+        action = _get_action(conversations, index)
+        num_repeated += actions.is_content_printed(action.message.content)
+        actions.append(action)
+    index_time = time.perf_counter() - start
+
+    conversation_actions = actions.get_actions_for_conversation('conversation 0')
+
+    actions = Actions()
+    start = time.perf_counter()
+    for index in range(NUM_ACTIONS_FOR_SCAN):
+        action = _get_action(conversations, index)
+        action.message.content in actions.get_all_message_contents(only_printed=True)
+        actions.append(action)
+    scan_time = time.perf_counter() - start
+
+    record_property('index_time', index_time)
+    record_property('scan_time', scan_time)
+    assert num_repeated == NUM_ACTIONS - NUM_UNIQUE_CONTENTS
+    assert len(conversation_actions) == NUM_ACTIONS // NUM_CONVERSATIONS
@@ -0,0 +1,60 @@
+import os
+import pickle
+import time
+
+import pytest
+
+from data_to_paper import Message, Role
+from data_to_paper.conversation.actions_and_conversations import Actions, Conversations
+from data_to_paper.conversation.actions_log import ActionsLogReader
+from data_to_paper.conversation.conversation_actions import AppendMessage
+
+pytestmark = pytest.mark.benchmark
+
+NUM_CONVERSATIONS = 20
+NUM_MESSAGES_PER_CONVERSATION = 20
+BACKGROUND_CONTENT = 'Here is the data description:\n' + 'column, value\n' * 2000
+
+
+def _get_actions() -> Actions:
+    conversations = Conversations()
+    actions = Actions()
+    for conversation_index in range(NUM_CONVERSATIONS):
+        conversation_name = f'conversation {conversation_index}'
+        # each conversation gets its own copy of the background products:
+        context = [Message(Role.USER, ''.join(list(BACKGROUND_CONTENT)))]
+        for message_index in range(NUM_MESSAGES_PER_CONVERSATION):
+            message = Message(Role.ASSISTANT, f'response {message_index}\n' + 'x' * 500, context=list(context))
+            actions.append(AppendMessage(conversations=conversations, conversation_name=conversation_name,
+                                         message=message))
+            context.append(message)
+    return actions
+
+
+def test_benchmark_actions_log_size_and_partial_replay(tmpdir, record_property):
+    actions = _get_actions()
+
+    with open(tmpdir.join('legacy.pkl'), 'wb') as f:
+        pickle.dump(actions, f)
+    start = time.perf_counter()
+    actions.save_actions_to_file(tmpdir.join('actions.pkl'))
+    save_time = time.perf_counter() - start
+    legacy_size = os.path.getsize(tmpdir.join('legacy.pkl'))
+    log_size = os.path.getsize(tmpdir.join('actions.pkl'))
+
+    start = time.perf_counter()
+    with open(tmpdir.join('legacy.pkl'), 'rb') as f:
+        pickle.load(f)
+    legacy_load_time = time.perf_counter() - start
+    start = time.perf_counter()
+    selected_actions = [action for _, action in
+                        ActionsLogReader(tmpdir.join('actions.pkl')).iterate_actions(
+                            conversation_names=['conversation 0'])]
+    partial_load_time = time.perf_counter() - start
+
+    record_property('legacy_size', legacy_size)
+    record_property('log_size', log_size)
+    record_property('save_time', save_time)
+    record_property('legacy_load_time', legacy_load_time)
+    record_property('partial_load_time', partial_load_time)
+    assert len(selected_actions) == NUM_MESSAGES_PER_CONVERSATION
@@ -0,0 +1,56 @@
+import time
+import traceback
+
+import pytest
+
+from data_to_paper.run_gpt_code import base_run_contexts, user_script_name
+from data_to_paper.run_gpt_code.dynamic_code import RunCode
+from data_to_paper.run_gpt_code.overrides.dataframes.override_dataframe import TrackDataFrames
+from data_to_paper.utils import dedent_triple_quote_str
+
+pytestmark = pytest.mark.benchmark
+
+NUM_FILES = 10_000
+NUM_DATAFRAME_OPERATIONS = 50_000
+
+CODE = dedent_triple_quote_str("""
+    import pandas as pd
+
+    for i in range(%d):
+        with open(f'file_{i}.txt') as f:
+            f.read()
+
+    df = pd.DataFrame({'a': [1, 2, 3]})
+    for i in range(%d):
+        df['b'] = df['a']
+    """) % (NUM_FILES, NUM_DATAFRAME_OPERATIONS // 2)  # each iteration: a getitem and a setitem
+
+
+def legacy_is_called_from_user_script(offset: int = 3) -> bool:
+    tb = traceback.extract_stack()
+    filename = tb[-offset].filename
+    return user_script_name.is_filename_gpt_code(filename) or user_script_name.is_filename_test(filename)
+
+
+def _run_script(run_folder) -> float:
+    run_code = RunCode(run_folder=run_folder, allowed_open_read_files=['file_*.txt'],
+                       additional_contexts={'TrackDataFrames': TrackDataFrames()})
+    start = time.perf_counter()
+    result = run_code.run(CODE)
+    assert result[-1] is None  # no exception
+    return time.perf_counter() - start
+
+
+@pytest.fixture()
+def run_folder(tmpdir):
+    for i in range(NUM_FILES):
+        tmpdir.join(f'file_{i}.txt').write('x')
+    return tmpdir
+
+
+def test_benchmark_caller_classification(run_folder, monkeypatch, record_property):
+    frame_walking_time = _run_script(run_folder)
+    monkeypatch.setattr(base_run_contexts, 'is_called_from_user_script', legacy_is_called_from_user_script)
+    legacy_time = _run_script(run_folder)
+    record_property('legacy_time', legacy_time)
+    record_property('frame_walking_time', frame_walking_time)
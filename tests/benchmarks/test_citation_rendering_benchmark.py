@@ -0,0 +1,46 @@
+import os
+import pickle
+import time
+
+import pytest
+
+from data_to_paper.servers.custom_types import render_bib_file
+from data_to_paper.servers.semantic_scholar import SemanticScholarPaperServerCaller
+
+pytestmark = pytest.mark.benchmark
+
+RECORDED_RESPONSES_FILE = os.path.join(os.path.dirname(__file__), '..', 'integration', 'scientific_conversers',
+                                       'recorded_responses', 'test_literature_search_semanticscholar_paper.bin')
+NUM_CITATIONS = 2000
+NUM_RENDERINGS = 5  # e.g. pretty_repr for the LLM, \cite validation, and the final bib file
+
+
+def _get_citations():
+    with open(RECORDED_RESPONSES_FILE, 'rb') as f:
+        records = pickle.load(f)
+    citations = []
+    while len(citations) < NUM_CITATIONS:
+        for (args, kwargs), response in records.items():
+            citations.extend(SemanticScholarPaperServerCaller._post_process_response(response, args, dict(kwargs)))
+    return citations[:NUM_CITATIONS]
+
+
+def test_benchmark_rendering_2000_semantic_scholar_citations(record_property):
+    citations = _get_citations()
+    start = time.perf_counter()
+    for _ in range(NUM_RENDERINGS):
+        for citation in citations:
+            citation.pretty_repr()
+        allowed_ids = {citation.bibtex_id for citation in citations}
+        bib = render_bib_file(citations)
+    rendering_time = time.perf_counter() - start
+
+    first_rendering_times = []
+    for citation in _get_citations():
+        start = time.perf_counter()
+        citation.pretty_repr()
+        citation.bibtex
+        first_rendering_times.append(time.perf_counter() - start)
+    record_property('rendering_time', rendering_time)
+    record_property('first_rendering_time', sum(first_rendering_times))
+    assert all(f'{{{bibtex_id},' in bib for bibtex_id in allowed_ids)
@@ -0,0 +1,42 @@
+import time
+
+import pytest
+
+from data_to_paper.env import PREWARM_CODE_RUNS
+from data_to_paper.run_gpt_code.code_execution_engine import CodeExecutionEngine
+
+pytestmark = pytest.mark.benchmark
+
+NUM_RUNS = 5
+
+
+def enter_statistics_overrides():
+    """
+    What each code run does before executing the LLM code: import the packages and enter the overrides.
+    """
+    import pandas  # noqa
+    import statsmodels.api  # noqa
+    from data_to_paper.run_gpt_code.overrides.contexts import OverrideStatisticsPackages
+    with OverrideStatisticsPackages():
+        pass
+    return time.perf_counter()
+
+
+def _get_startup_latencies(engine: CodeExecutionEngine):
+    latencies = []
+    for _ in range(NUM_RUNS):
+        start = time.perf_counter()
+        ready = engine.run(enter_statistics_overrides)
+        latencies.append(ready - start)
+    return latencies
+
+
+def test_benchmark_code_run_startup_latency(record_property):
+    with PREWARM_CODE_RUNS.temporary_set(False):
+        cold_latencies = _get_startup_latencies(CodeExecutionEngine(start_method='spawn'))
+    engine = CodeExecutionEngine(start_method='fork')
+    engine.prewarm(in_background=False)
+    warm_latencies = _get_startup_latencies(engine)
+    # median latencies until the overrides are entered:
+    record_property('spawn_latency', sorted(cold_latencies)[NUM_RUNS // 2])
+    record_property('prewarmed_fork_latency', sorted(warm_latencies)[NUM_RUNS // 2])
@@ -0,0 +1,39 @@
+import io
+import time
+from contextlib import redirect_stdout
+
+import pytest
+
+from data_to_paper.env import CONSOLE_LOG_WRITE_MODE
+from data_to_paper.utils.print_to_file import print_and_log, console_log_file_context, get_bw_file_path, \
+    CONSOLE_LOG_FILE
+
+pytestmark = pytest.mark.benchmark
+
+NUM_LINES = 20000
+
+
+def _print_lines() -> float:
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):
+        for i in range(NUM_LINES):
+            print_and_log(f'Querying Semantic Scholar. Found {i % 25} / 25 citations. Query: "query {i}".')
+    return time.perf_counter() - start
+
+
+def test_benchmark_logging_many_lines(tmp_path, record_property):
+    # opening the log files for each line (without a `console_log_file_context`):
+    file_path = tmp_path / 'per_line_console_log.txt'
+    with CONSOLE_LOG_FILE.temporary_set(file_path):
+        per_line_time = _print_lines()
+
+    modes_to_times = {}
+    for mode in ('sync', 'async'):
+        file_path = tmp_path / f'{mode}_console_log.txt'
+        with CONSOLE_LOG_WRITE_MODE.temporary_set(mode), console_log_file_context(file_path):
+            modes_to_times[mode] = _print_lines()
+        assert get_bw_file_path(file_path).read_text(encoding='utf-8').count('\n') == NUM_LINES
+
+    record_property('per_line_time', per_line_time)
+    record_property('sync_time', modes_to_times['sync'])
+    record_property('async_time', modes_to_times['async'])
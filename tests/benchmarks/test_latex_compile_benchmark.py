@@ -0,0 +1,59 @@
+import shutil
+import time
+
+import pytest
+
+from data_to_paper.env import LATEX_COMPILATION_CACHE_FOLDER, LATEX_FORMATS_FOLDER
+from data_to_paper.latex.latex_compiler import LatexCompiler
+from data_to_paper.latex.latex_doc import LatexDocument
+
+pytestmark = pytest.mark.benchmark
+
+NUM_SECTIONS = 6
+NUM_REVISIONS = 3
+
+
+def get_paper_like_sections():
+    """
+    Sections like those written in a run: each section is checked for compilation after each of its revisions.
+    """
+    sections = []
+    for i_section in range(NUM_SECTIONS):
+        for i_revision in range(NUM_REVISIONS):
+            paragraphs = [f'Paragraph {i_paragraph} of revision {i_revision} of section {i_section}, '
+                          f'with some math $\\beta_{i_paragraph} = {i_paragraph}.{i_revision}$.'
+                          for i_paragraph in range(5)]
+            if i_section % 2:
+                paragraphs.append(r'See Table \ref{table:results}.')
+            sections.append({f'Section {i_section}': '\n\n'.join(paragraphs)})
+    # sections are often re-checked without changes:
+    return sections + sections[:NUM_SECTIONS]
+
+
+def _compile_sections(compiler: LatexCompiler, sections) -> float:
+    start = time.perf_counter()
+    for section in sections:
+        latex, _ = LatexDocument().get_document(dict(section), file_stem='section', raise_on_too_wide=False)
+        assert not compiler.compile(latex, 'section').is_error
+    return time.perf_counter() - start
+
+
+@pytest.mark.skipif(shutil.which('pdflatex') is None, reason='pdflatex is not installed')
+def test_benchmark_latex_compilation(tmpdir, monkeypatch, record_property):
+    sections = get_paper_like_sections()
+    # `get_document` compiles with the module compiler; we time our own compilers:
+    monkeypatch.setattr('data_to_paper.latex.latex_doc.save_latex_and_compile_to_pdf', lambda *args, **kwargs: '')
+
+    cold_compiler = LatexCompiler()
+    with LATEX_FORMATS_FOLDER.temporary_set(None), LATEX_COMPILATION_CACHE_FOLDER.temporary_set(None):
+        cold_time = _compile_sections(cold_compiler, sections)
+
+    compiler = LatexCompiler()
+    with LATEX_FORMATS_FOLDER.temporary_set(str(tmpdir / 'formats')), \
+            LATEX_COMPILATION_CACHE_FOLDER.temporary_set(str(tmpdir / 'cache')):
+        cached_time = _compile_sections(compiler, sections)
+
+    record_property('cold_time', cold_time)
+    record_property('cached_time', cached_time)
+    record_property('num_compilations', compiler.num_compilations)
+    record_property('num_cache_hits', compiler.num_cache_hits)
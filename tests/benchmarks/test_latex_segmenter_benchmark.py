@@ -0,0 +1,53 @@
+import random
+import time
+
+import pytest
+
+from data_to_paper.latex.clean_latex import process_latex_text_and_math, split_latex_text_and_math
+
+from tests.functional.latex.legacy_process_latex import legacy_process_latex_text_and_math
+
+pytestmark = pytest.mark.benchmark
+
+PARAGRAPH_SIZE = 50_000
+LEGACY_PARAGRAPH_SIZE = 400  # the legacy regex takes over a minute on 1,000 characters of this paragraph
+
+WORDS = ['the', 'cost', 'was', '$5', 'and', '$$', 'x_1', '50%', r'\ref{a}', '{', 'b}', r'\(', '$x$']
+
+
+def get_adversarial_paragraph(size: int) -> str:
+    """
+    A single line with many unbalanced `$` and `$$`, and unclosed `\\(` and `{`.
+    """
+    rng = random.Random(0)
+    words = []
+    while sum(len(word) + 1 for word in words) < size:
+        words.append(rng.choice(WORDS))
+    return ' '.join(words)
+
+
+def _time_process(process, text: str) -> float:
+    split_latex_text_and_math.cache_clear()
+    start = time.perf_counter()
+    process(text, process_text=str.lower, process_math=str.upper)
+    return time.perf_counter() - start
+
+
+def test_benchmark_latex_segmenter_on_adversarial_paragraph(record_property):
+    paragraph = get_adversarial_paragraph(PARAGRAPH_SIZE)
+    short_paragraph = paragraph[:LEGACY_PARAGRAPH_SIZE]
+
+    legacy_time = _time_process(legacy_process_latex_text_and_math, short_paragraph)
+    short_time = _time_process(process_latex_text_and_math, short_paragraph)
+    long_time = _time_process(process_latex_text_and_math, paragraph)
+
+    start = time.perf_counter()
+    for _ in range(10):
+        process_latex_text_and_math(paragraph, process_text=str.lower, process_math=str.upper)
+    reuse_time = (time.perf_counter() - start) / 10
+
+    record_property('legacy_time', legacy_time)
+    record_property('short_time', short_time)
+    record_property('long_time', long_time)
+    record_property('reuse_time', reuse_time)
+    assert ''.join(segment.text for segment in split_latex_text_and_math(paragraph)) == paragraph
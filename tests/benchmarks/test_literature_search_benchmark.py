@@ -0,0 +1,100 @@
+import json
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from data_to_paper.env import SEMANTIC_SCHOLAR_MAX_REQUESTS_PER_SECOND
+from data_to_paper.servers import semantic_scholar
+from data_to_paper.servers.semantic_scholar import SemanticScholarPaperServerCaller
+
+pytestmark = pytest.mark.benchmark
+
+NUM_QUERIES = 24
+LATENCY = 0.3  # seconds
+RATE_LIMIT_EVERY = 4  # every 4th request gets a 429
+
+
+def _get_paper(query: str, index: int) -> dict:
+    bibtex_id = f'{query.replace(" ", "")}{index}'
+    return {'title': f'{query} {index}', 'citationStyles': {'bibtex': f'@article{{{bibtex_id},\n title = {{x}}\n}}'}}
+
+
+class StubSemanticScholarHandler(BaseHTTPRequestHandler):
+    """
+    A local stand-in for the Semantic Scholar search API, with latency and injected rate limits.
+    """
+    num_requests = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with self.lock:
+            type(self).num_requests += 1
+            is_rate_limited = self.num_requests % RATE_LIMIT_EVERY == 0
+        time.sleep(LATENCY)
+        if is_rate_limited:
+            body = b'Too Many Requests'
+            self.send_response(429)
+        else:
+            query = self.path.split('query=')[1].split('&')[0].replace('+', ' ')
+            body = json.dumps({'data': [_get_paper(query, index) for index in range(10)]}).encode()
+            self.send_response(200)
+        self.send_header('Retry-After', '0.1')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def stub_semantic_scholar(monkeypatch):
+    StubSemanticScholarHandler.num_requests = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubSemanticScholarHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(semantic_scholar, 'PAPER_SEARCH_URL', f'http://127.0.0.1:{server.server_address[1]}/search')
+    monkeypatch.setattr(semantic_scholar, 'SEMANTIC_SCHOLAR_API_KEY', 'key')
+    yield
+    server.shutdown()
+    server.server_close()
+
+
+def _get_queries():
+    return [f'query {index}' for index in range(NUM_QUERIES)]
+
+
+# At the default rate limit, the requests are spaced by the limiter, whether the queries are sent serially or
+# concurrently. Concurrency pays off with a higher limit (e.g., with an API key allowing more requests):
+@pytest.mark.parametrize('max_requests_per_second', [SEMANTIC_SCHOLAR_MAX_REQUESTS_PER_SECOND.val, None],
+                         ids=['default_rate_limit', 'no_rate_limit'])
+def test_benchmark_serial_vs_concurrent_literature_search(stub_semantic_scholar, max_requests_per_second,
+                                                          record_property):
+    with SEMANTIC_SCHOLAR_MAX_REQUESTS_PER_SECOND.temporary_set(max_requests_per_second):
+        _benchmark_serial_vs_concurrent_literature_search(record_property)
+
+
+def _benchmark_serial_vs_concurrent_literature_search(record_property):
+    queries = _get_queries()
+
+    server = SemanticScholarPaperServerCaller()
+    start = time.perf_counter()
+    with server.mock(record_more_if_needed=True):
+        serial_results = [server.get_server_response(query, rows=5) for query in queries]
+    serial_time = time.perf_counter() - start
+
+    server = SemanticScholarPaperServerCaller()
+    start = time.perf_counter()
+    with server.mock(record_more_if_needed=True) as mock:
+        concurrent_results = server.get_server_responses([((query, ), {'rows': 5}) for query in queries],
+                                                         max_workers=8)
+        recorded_queries = [args[0] for args, kwargs in mock.new_records.keys()]
+    concurrent_time = time.perf_counter() - start
+
+    record_property('serial_time', serial_time)
+    record_property('concurrent_time', concurrent_time)
+    assert [[c.title for c in citations] for citations in serial_results] == \
+        [[c.title for c in citations] for citations in concurrent_results]
+    assert recorded_queries == queries
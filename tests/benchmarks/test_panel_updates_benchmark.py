@@ -0,0 +1,73 @@
+import os
+import time
+
+import pytest
+from PySide6.QtCore import QMutex, QWaitCondition
+from PySide6.QtTest import QTest
+from PySide6.QtWidgets import QApplication
+
+from data_to_paper.env import MAX_PANEL_RENDERS_PER_SECOND
+from data_to_paper.interactive.enum_types import PanelNames
+from data_to_paper.interactive.pyside_app import PysideApp
+
+pytestmark = pytest.mark.benchmark
+
+NUM_UPDATES = 5000
+
+
+def get_fragment(i: int) -> str:
+    return f'<p><b style="color: #1E90FF;">Query:</b> "query {i}".<br><b>Found:</b> {i % 25} citations.</p>'
+
+
+def _push_updates(app: PysideApp, is_append: bool, num_updates: int) -> float:
+    """
+    Push updates to the feedback panel from the worker thread, as the steps do, and return the time until
+    all the updates are rendered.
+    """
+    panel = app.panels[PanelNames.FEEDBACK]
+    panel.set_text('')
+    panel.render_pending_updates(force=True)
+
+    def send_updates():
+        html = ''
+        for i in range(num_updates):
+            if is_append:
+                app.append_text(PanelNames.FEEDBACK, get_fragment(i), is_html=True, scroll_to_bottom=True)
+            else:
+                html += get_fragment(i)
+                app.show_text(PanelNames.FEEDBACK, html, is_html=True, scroll_to_bottom=True)
+
+    start = time.perf_counter()
+    app.start_worker(send_updates)
+    while app.worker.isRunning():
+        QTest.qWait(1)
+    QApplication.sendPostedEvents()  # deliver the signals that are still queued
+    while panel.has_pending_updates():
+        QTest.qWait(1)
+    run_time = time.perf_counter() - start
+    assert panel.text_edit.toPlainText().endswith(f'"query {num_updates - 1}".\nFound: {(num_updates - 1) % 25} '
+                                                  f'citations.')
+    return run_time
+
+
+def test_benchmark_pushing_updates_to_a_panel(record_property):
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    QApplication.instance() or QApplication([])
+    app = PysideApp(QMutex(), QWaitCondition())
+    app.show()
+    panel = app.panels[PanelNames.FEEDBACK]
+
+    # Re-setting the whole html on each update is quadratic; we time it on fewer updates:
+    num_legacy_updates = NUM_UPDATES // 10
+    with MAX_PANEL_RENDERS_PER_SECOND.temporary_set(None):
+        legacy_time = _push_updates(app, is_append=False, num_updates=num_legacy_updates)
+
+    panel.num_renders = 0
+    with MAX_PANEL_RENDERS_PER_SECOND.temporary_set(20):
+        append_time = _push_updates(app, is_append=True, num_updates=NUM_UPDATES)
+    num_renders = panel.num_renders
+
+    record_property('legacy_time', legacy_time)
+    record_property('append_time', append_time)
+    record_property('num_renders', num_renders)
+    app.close()
@@ -0,0 +1,54 @@
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_to_paper.run_gpt_code.overrides.pvalue import convert_to_p_value, is_containing_p_value, OnStr, \
+    OnStrPValue, PValue, format_p_values_in_df
+
+pytestmark = pytest.mark.benchmark
+
+NUM_ROWS = 20_000
+
+
+def legacy_convert_series(series: pd.Series, created_by: str):
+    for i in range(len(series)):
+        series.iloc[i] = PValue(series.iloc[i], created_by=created_by, var_name=series.index[i])
+    return series
+
+
+def test_benchmark_columnar_p_values(record_property):
+    rng = np.random.default_rng(0)
+    series = pd.Series(rng.random(NUM_ROWS) * 0.5, index=[f'var{i}' for i in range(NUM_ROWS)])
+
+    start = time.perf_counter()
+    legacy_convert_series(series.copy(), created_by='OLS')
+    legacy_convert_time = time.perf_counter() - start
+    start = time.perf_counter()
+    p_values = convert_to_p_value(series.copy(), created_by='OLS')
+    convert_time = time.perf_counter() - start
+
+    df = pd.DataFrame({'coef': rng.random(NUM_ROWS), 'se': rng.random(NUM_ROWS), 'p': p_values})
+    start = time.perf_counter()
+    df.applymap(lambda x: hasattr(x, 'this_is_a_p_value')).any().any()
+    legacy_contains_time = time.perf_counter() - start
+    start = time.perf_counter()
+    assert is_containing_p_value(df)
+    contains_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with OnStrPValue(OnStr.SMALLER_THAN):
+        legacy_strings = [str(p_value) for p_value in df['p']]
+    legacy_format_time = time.perf_counter() - start
+    start = time.perf_counter()
+    strings = list(format_p_values_in_df(df, OnStr.SMALLER_THAN)['p'])
+    format_time = time.perf_counter() - start
+    assert strings == legacy_strings
+
+    record_property('legacy_convert_time', legacy_convert_time)
+    record_property('convert_time', convert_time)
+    record_property('legacy_contains_time', legacy_contains_time)
+    record_property('contains_time', contains_time)
+    record_property('legacy_format_time', legacy_format_time)
+    record_property('format_time', format_time)
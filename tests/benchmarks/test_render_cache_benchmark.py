@@ -0,0 +1,56 @@
+import time
+
+import pytest
+
+from data_to_paper.utils import highlighted_text
+from data_to_paper.utils.formatted_sections import _parse_text
+from data_to_paper.utils.highlighted_text import format_text_with_code_blocks, RenderCache
+
+pytestmark = pytest.mark.benchmark
+
+NUM_MESSAGES = 400
+
+CODE = '\n'.join(f'df{i} = df.groupby("group{i}")["value"].agg(["mean", "std"])  # summary {i}' for i in range(40))
+OUTPUT = '\n'.join(f'group{i},{i * 0.37:.3f},{i * 0.11:.3f}' for i in range(30))
+
+
+def get_conversation():
+    """
+    A conversation like that of a data-analysis stage: requests, code responses, and code outputs.
+    """
+    messages = []
+    for i in range(NUM_MESSAGES):
+        if i % 4 == 0:
+            messages.append(f'## Request {i}\nPlease write **code** to analyze the data.\n' * 5)
+        elif i % 4 == 1:
+            messages.append(f'Here is the code:\n```python\n# attempt {i // 8}\n{CODE}\n```\n')
+        elif i % 4 == 2:
+            messages.append(f'The code created the output:\n```output\n{OUTPUT}\n```\nPlease check it.\n')
+        else:
+            messages.append(f'The code looks good (message {i // 16}).')
+    return messages
+
+
+def _render(messages) -> float:
+    start = time.perf_counter()
+    for message in messages:
+        format_text_with_code_blocks(message, is_html=True, width=None, from_md=True)
+        format_text_with_code_blocks(message, text_color='\x1b[32m')
+    return time.perf_counter() - start
+
+
+def test_benchmark_re_rendering_a_conversation(monkeypatch, record_property):
+    messages = get_conversation()
+
+    monkeypatch.setattr(highlighted_text, 'RENDER_CACHE', RenderCache(max_size=0))
+    _parse_text.cache_clear()
+    uncached_times = [_render(messages), _render(messages)]
+
+    render_cache = RenderCache()
+    monkeypatch.setattr(highlighted_text, 'RENDER_CACHE', render_cache)
+    _parse_text.cache_clear()
+    cached_times = [_render(messages), _render(messages)]
+
+    record_property('uncached_times', uncached_times)
+    record_property('cached_times', cached_times)
+    record_property('hit_rate', render_cache.hit_rate)
@@ -0,0 +1,61 @@
+import os
+import time
+
+import pytest
+
+from data_to_paper.servers.json_dump import dump_to_json
+from data_to_paper.servers.base_server import OrderedKeyToListServerCaller
+
+pytestmark = pytest.mark.benchmark
+
+NUM_RECORDS = 5000
+NUM_STAGES = 10
+
+
+class BenchmarkOrderedKeyToListServerCaller(OrderedKeyToListServerCaller):
+    num_saves = 0
+
+    @staticmethod
+    def _get_server_response(key: str, response: str = 'response'):
+        return response
+
+    def _generate_key(self, args, kwargs):
+        return args[0]
+
+    def _save_records(self, records, filepath):
+        self.num_saves += 1
+        super()._save_records(records, filepath)
+
+
+def _get_key_and_response(index: int):
+    return f'stage{index * NUM_STAGES // NUM_RECORDS}', f'response {index}\n' + 'x' * 1000
+
+
+def test_benchmark_replay_5000_records_file(tmpdir, record_property):
+    file_path = os.path.join(tmpdir, 'openai_responses.txt')
+    records = {}
+    for index in range(NUM_RECORDS):
+        key, response = _get_key_and_response(index)
+        records.setdefault(key, []).append(response)
+    dump_to_json(records, file_path)  # the legacy format
+
+    server = BenchmarkOrderedKeyToListServerCaller()
+    start = time.perf_counter()
+    with server.mock_with_file(file_path=file_path, record_more_if_needed=False) as mock:
+        for index in range(NUM_RECORDS):
+            key, response = _get_key_and_response(index)
+            assert mock.get_server_response(key) == response
+    replay_time = time.perf_counter() - start
+    record_property('replay_time', replay_time)
+
+
+def test_benchmark_record_5000_responses(tmpdir, record_property):
+    file_path = os.path.join(tmpdir, 'openai_responses.txt')
+    server = BenchmarkOrderedKeyToListServerCaller()
+    start = time.perf_counter()
+    with server.mock_with_file(file_path=file_path) as mock:
+        for index in range(NUM_RECORDS):
+            mock.get_server_response(*_get_key_and_response(index))
+    record_time = time.perf_counter() - start
+    record_property('record_time', record_time)
+    record_property('num_saves', server.num_saves)
@@ -0,0 +1,40 @@
+import shutil
+import time
+
+import pandas as pd
+import pytest
+
+from data_to_paper.env import LATEX_COMPILATION_CACHE_FOLDER
+from data_to_paper.latex.latex_doc import LatexDocument
+from data_to_paper.research_types.hypothesis_testing.coding.original_utils import to_latex_with_note
+
+pytestmark = pytest.mark.benchmark
+
+NUM_TABLES = 8
+
+
+@pytest.mark.skipif(shutil.which('pdflatex') is None, reason='pdflatex is not installed')
+def test_benchmark_table_width_measurement(tmpdir, record_property):
+    tables = [to_latex_with_note(pd.DataFrame({f'column {i}': range(10), 'values': [0.5 * i] * 10}), None,
+                                 caption=f'Table {i}', label=f'table:{i}', note='A note.')
+              for i in range(NUM_TABLES)]
+
+    with LATEX_COMPILATION_CACHE_FOLDER.temporary_set(None):
+        start = time.perf_counter()
+        one_by_one = [LatexDocument().compile_table(table, file_stem='table', output_directory=str(tmpdir))
+                      for table in tables]
+        one_by_one_time = time.perf_counter() - start
+
+        latex_document = LatexDocument()
+        start = time.perf_counter()
+        batched = latex_document.measure_tables(tables)
+        batch_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        latex_document.measure_tables(tables)
+        cached_time = time.perf_counter() - start
+
+    record_property('one_by_one_time', one_by_one_time)
+    record_property('batch_time', batch_time)
+    record_property('cached_time', cached_time)
+    assert batched == pytest.approx(one_by_one)
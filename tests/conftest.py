@@ -3,14 +3,21 @@ from pytest import fixture
 
 from data_to_paper.conversation.actions_and_conversations import ActionsAndConversations, Conversations, Actions
 from data_to_paper.env import SAVE_INTERMEDIATE_LATEX, CHOSEN_APP, DELAY_CODE_RUN_CACHE_RETRIEVAL, \
-    DELAY_SERVER_CACHE_RETRIEVAL
+    DELAY_SERVER_CACHE_RETRIEVAL, FILE_FINGERPRINTS_FILEPATH, EXTRACTED_ARCHIVES_FOLDER, LATEX_FORMATS_FOLDER, \
+    LATEX_COMPILATION_CACHE_FOLDER, LATEX_TO_HTML_CACHE_FOLDER, CONSOLE_LOG_WRITE_MODE
 
 
 @pytest.fixture(scope="session", autouse=True)
 def set_env():
     with CHOSEN_APP.temporary_set(None), \
             DELAY_CODE_RUN_CACHE_RETRIEVAL.temporary_set(0), \
-            DELAY_SERVER_CACHE_RETRIEVAL.temporary_set(0):
+            DELAY_SERVER_CACHE_RETRIEVAL.temporary_set(0), \
+            FILE_FINGERPRINTS_FILEPATH.temporary_set(None), \
+            EXTRACTED_ARCHIVES_FOLDER.temporary_set(None), \
+            LATEX_FORMATS_FOLDER.temporary_set(None), \
+            LATEX_COMPILATION_CACHE_FOLDER.temporary_set(None), \
+            LATEX_TO_HTML_CACHE_FOLDER.temporary_set(None), \
+            CONSOLE_LOG_WRITE_MODE.temporary_set('sync'):
         yield
 
 
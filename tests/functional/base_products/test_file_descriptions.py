@@ -0,0 +1,49 @@
+import os
+
+import pandas as pd
+import pytest
+
+from data_to_paper.base_products import DataFileDescription
+from data_to_paper.base_products import file_descriptions
+from data_to_paper.base_products.file_descriptions import get_file_preview
+
+
+def test_text_file_preview_shows_first_lines(tmpdir):
+    file_path = os.path.join(tmpdir, 'data.csv')
+    with open(file_path, 'w') as f:
+        f.write(''.join(f'{i},{i * 2}\n' for i in range(100)))
+    preview = DataFileDescription(file_path=file_path).get_file_header(3)
+    assert '```output\n0,0\n1,2\n2,4\n\n```' in preview
+    assert '3,6' not in preview
+
+
+def test_text_file_preview_reads_a_bounded_number_of_bytes(tmpdir, monkeypatch):
+    monkeypatch.setattr(file_descriptions, 'MAX_PREVIEW_BYTES', 100)
+    file_path = os.path.join(tmpdir, 'long_line.txt')
+    with open(file_path, 'w') as f:
+        f.write('x' * 1000 + '\n')
+    preview = get_file_preview(file_path, 4)
+    assert 'x' * 100 + ' ...\n' in preview
+    assert 'x' * 101 not in preview
+
+
+def test_file_preview_is_cached_until_file_changes(tmpdir):
+    file_path = os.path.join(tmpdir, 'data.txt')
+    with open(file_path, 'w') as f:
+        f.write('a\nb\n')
+    assert get_file_preview(file_path, 4) is get_file_preview(file_path, 4)
+    with open(file_path, 'w') as f:
+        f.write('a\nb\nc\n')
+    assert 'c\n' in get_file_preview(file_path, 4)
+
+
+def test_excel_file_preview_shows_first_rows_of_each_sheet(tmpdir):
+    pytest.importorskip('openpyxl')
+    file_path = os.path.join(tmpdir, 'data.xlsx')
+    with pd.ExcelWriter(file_path) as writer:
+        pd.DataFrame({'a': range(100)}).to_excel(writer, sheet_name='first', index=False)
+        pd.DataFrame({'b': range(100, 200)}).to_excel(writer, sheet_name='second', index=False)
+    preview = get_file_preview(file_path, 2)
+    assert 'Excel file with 2 sheets' in preview
+    assert '### Sheet: "first"\n```output\n a\n 0\n 1\n```' in preview
+    assert '### Sheet: "second"\n```output\n   b\n100\n101\n```' in preview
@@ -0,0 +1,93 @@
+import numpy as np
+import pytest
+
+from data_to_paper.base_steps.literature_search import CitationEmbeddingIndex, LiteratureSearch
+from data_to_paper.servers.custom_types import Citation
+
+
+class EmbeddedCitation(Citation):
+    @property
+    def bibtex_id(self) -> str:
+        return self['id']
+
+    @property
+    def embedding(self):
+        return self.get('embedding')
+
+
+def _get_citation(bibtex_id, embedding, search_rank=0, query='query'):
+    return EmbeddedCitation(id=bibtex_id, embedding=None if embedding is None else np.array(embedding),
+                            search_rank=search_rank, query=query)
+
+
+TARGET = np.array([1., 0., 0.])
+
+
+@pytest.fixture()
+def citations():
+    return [
+        _get_citation('far', [0., 1., 0.], search_rank=0),
+        _get_citation('close', [2., 0.1, 0.], search_rank=1),
+        _get_citation('none', None, search_rank=2),
+        _get_citation('middle', [1., 1., 0.], search_rank=3),
+    ]
+
+
+def test_embedding_index_similarities_match_citation_similarities(citations):
+    index = CitationEmbeddingIndex(citations)
+    assert len(index) == 3
+    assert index.get_citations_similarities(citations, TARGET) == pytest.approx(
+        [citation.get_embedding_similarity(TARGET) for citation in citations], abs=1e-6)
+
+
+def test_embedding_index_deduplicates_by_bibtex_id(citations):
+    index = CitationEmbeddingIndex(citations + [_get_citation('close', [0., 0., 1.])])
+    assert len(index) == 3
+    assert index.get_citations_similarities([citations[1]], TARGET)[0] > 0.99
+
+
+def test_embedding_index_without_embeddings():
+    citations = [_get_citation('a', None), _get_citation('b', None)]
+    index = CitationEmbeddingIndex(citations)
+    assert len(index) == 0
+    assert index.get_most_similar_citations(citations, TARGET, 1) == citations[:1]
+
+
+def test_embedding_index_caches_similarities_per_target(citations):
+    index = CitationEmbeddingIndex(citations)
+    assert index.get_similarities(TARGET) is index.get_similarities(TARGET.copy())
+
+
+def test_embedding_index_get_most_similar(citations):
+    index = CitationEmbeddingIndex(citations)
+    assert [c.bibtex_id for c in index.get_most_similar_citations(citations, TARGET, 2)] == ['close', 'middle']
+    assert [c.bibtex_id for c in index.get_most_similar_citations(citations, TARGET, 10)] == \
+        ['close', 'middle', 'far', 'none']
+    assert index.get_most_similar_citations(citations, TARGET, 0) == []
+
+
+def test_embedding_index_get_most_similar_breaks_ties_by_order(citations):
+    index = CitationEmbeddingIndex(citations)
+    # 'far' and 'none' are tied (similarity 0):
+    assert [c.bibtex_id for c in index.get_most_similar_citations(citations, TARGET, 3)] == \
+        ['close', 'middle', 'far']
+    assert [c.bibtex_id for c in index.get_most_similar_citations(citations[::-1], TARGET, 3)] == \
+        ['close', 'middle', 'none']
+
+
+def test_literature_search_sorts_by_similarity(citations):
+    literature_search = LiteratureSearch(value={'scope': {'query': citations}}, embedding_target=TARGET)
+    assert [c.bibtex_id for c in literature_search.get_citations(sort_by_similarity=True)] == \
+        ['close', 'middle', 'far', 'none']
+    assert [c.bibtex_id for c in literature_search.get_citations()] == ['far', 'close', 'none', 'middle']
+    assert [c.bibtex_id for c in literature_search.get_citations(total=1, sort_by_similarity=True)] == ['close']
+    assert [c.bibtex_id for c in literature_search.get_citations(total=-1, sort_by_similarity=True)] == ['none']
+
+
+def test_literature_search_rebuilds_index_when_citations_change(citations):
+    literature_search = LiteratureSearch(value={'scope': {'query': citations}}, embedding_target=TARGET)
+    index = literature_search.get_embedding_index()
+    assert literature_search.get_embedding_index() is index
+    literature_search['scope2'] = {'query2': [_get_citation('closest', [1., 0., 0.], query='query2')]}
+    assert literature_search.get_embedding_index() is not index
+    assert [c.bibtex_id for c in literature_search.get_citations(total=1, sort_by_similarity=True)] == ['closest']
@@ -149,3 +149,13 @@ def test_request_python_ends_with_reposting_fresh_response():
 
     # Response is reposted as fresh:
     assert requester.conversation[-1].content == f"```python\n{correct_list_str_value}\n```"
+
+
+@pytest.mark.parametrize('json_mode, should_stop', [
+    (False, True),
+    (True, False),
+])
+def test_request_python_value_stops_streaming_upon_second_block(json_mode, should_stop):
+    converser = TestPythonValueReviewBackgroundProductsConverser(value_type=List[str], json_mode=json_mode)
+    assert not converser._should_stop_streaming_response("```python\n['a', 'b']\n```\n")
+    assert converser._should_stop_streaming_response("```python\n['a', 'b']\n```\n```python\n['c']") is should_stop
@@ -0,0 +1,174 @@
+import threading
+import time
+
+import pytest
+
+from data_to_paper.base_steps.base_steps_runner import StagesScheduler, get_stages_to_dependencies
+from data_to_paper.conversation.stage import Stage
+
+
+class ToyStage(Stage):
+    FIRST = ('First', False)
+    SECOND = ('Second', False)
+    THIRD = ('Third', False)
+    FOURTH = ('Fourth', False)
+
+
+PRODUCTS_TO_STAGES = {
+    'first_product': ToyStage.FIRST,
+    'second_product': ToyStage.SECOND,
+    'third_product': ToyStage.THIRD,
+    'fourth_product': ToyStage.FOURTH,
+}
+
+
+def _get_dependencies(stages_to_background_product_fields):
+    return get_stages_to_dependencies(list(ToyStage), stages_to_background_product_fields,
+                                      PRODUCTS_TO_STAGES.get)
+
+
+def test_get_stages_to_dependencies_from_product_fields():
+    dependencies = _get_dependencies({
+        ToyStage.FIRST: (),
+        ToyStage.SECOND: ('first_product', ),
+        ToyStage.THIRD: ('first_product', ),
+        ToyStage.FOURTH: ('second_product', 'third_product'),
+    })
+    assert dependencies == {
+        ToyStage.FIRST: set(),
+        ToyStage.SECOND: {ToyStage.FIRST},
+        ToyStage.THIRD: {ToyStage.FIRST},
+        ToyStage.FOURTH: {ToyStage.SECOND, ToyStage.THIRD},
+    }
+
+
+def test_get_stages_to_dependencies_undeclared_stage_runs_alone():
+    dependencies = _get_dependencies({
+        ToyStage.FIRST: (),
+        ToyStage.THIRD: (),
+        ToyStage.FOURTH: (),
+    })
+    assert dependencies[ToyStage.SECOND] == {ToyStage.FIRST}
+    assert dependencies[ToyStage.THIRD] == {ToyStage.SECOND}
+    assert dependencies[ToyStage.FOURTH] == {ToyStage.SECOND}
+
+
+def test_get_stages_to_dependencies_reading_a_product_of_a_later_stage():
+    dependencies = _get_dependencies({
+        ToyStage.FIRST: (),
+        ToyStage.SECOND: ('fourth_product', ),
+        ToyStage.THIRD: (),
+        ToyStage.FOURTH: (),
+    })
+    # the fourth stage must not run before the second stage reads the (not-yet-available) fourth product:
+    assert dependencies[ToyStage.FOURTH] == {ToyStage.SECOND}
+    assert dependencies[ToyStage.SECOND] == set()
+
+
+def _get_scheduler(stages_to_dependencies, stages_to_results=None, max_workers=1, run_stage=None):
+    runs = []
+
+    def _run_stage(stage):
+        runs.append(stage)
+        return (stages_to_results or {}).get(stage)
+
+    return StagesScheduler(stages_to_dependencies, run_stage or _run_stage, max_workers), runs
+
+
+SEQUENTIAL_DEPENDENCIES = {
+    ToyStage.FIRST: set(),
+    ToyStage.SECOND: {ToyStage.FIRST},
+    ToyStage.THIRD: {ToyStage.SECOND},
+    ToyStage.FOURTH: {ToyStage.THIRD},
+}
+
+INDEPENDENT_MIDDLE_DEPENDENCIES = {
+    ToyStage.FIRST: set(),
+    ToyStage.SECOND: {ToyStage.FIRST},
+    ToyStage.THIRD: {ToyStage.FIRST},
+    ToyStage.FOURTH: {ToyStage.SECOND, ToyStage.THIRD},
+}
+
+
+@pytest.mark.parametrize('max_workers', [1, 3])
+def test_scheduler_runs_dependent_stages_in_order(max_workers):
+    scheduler, runs = _get_scheduler(SEQUENTIAL_DEPENDENCIES, max_workers=max_workers)
+    scheduler.run(ToyStage.FIRST)
+    assert runs == list(ToyStage)
+
+
+def test_scheduler_with_single_worker_runs_independent_stages_in_order():
+    scheduler, runs = _get_scheduler(INDEPENDENT_MIDDLE_DEPENDENCIES)
+    scheduler.run(ToyStage.FIRST)
+    assert runs == list(ToyStage)
+
+
+def test_scheduler_runs_independent_stages_concurrently():
+    both_started = threading.Barrier(2, timeout=5)
+    runs = []
+
+    def run_stage(stage):
+        if stage in (ToyStage.SECOND, ToyStage.THIRD):
+            both_started.wait()  # raises BrokenBarrierError if the stages do not run concurrently
+        runs.append(stage)
+
+    scheduler, _ = _get_scheduler(INDEPENDENT_MIDDLE_DEPENDENCIES, max_workers=2, run_stage=run_stage)
+    scheduler.run(ToyStage.FIRST)
+    assert runs[0] == ToyStage.FIRST
+    assert set(runs[1:3]) == {ToyStage.SECOND, ToyStage.THIRD}
+    assert runs[3] == ToyStage.FOURTH
+
+
+@pytest.mark.parametrize('max_workers', [1, 3])
+def test_scheduler_redirects_to_an_earlier_stage(max_workers):
+    num_redirects = 0
+
+    def run_stage(stage):
+        nonlocal num_redirects
+        runs.append(stage)
+        if stage == ToyStage.THIRD and num_redirects < 2:
+            num_redirects += 1
+            return ToyStage.SECOND
+
+    runs = []
+    scheduler, _ = _get_scheduler(SEQUENTIAL_DEPENDENCIES, max_workers=max_workers, run_stage=run_stage)
+    scheduler.run(ToyStage.FIRST)
+    assert runs == [ToyStage.FIRST] + [ToyStage.SECOND, ToyStage.THIRD] * 3 + [ToyStage.FOURTH]
+
+
+def test_scheduler_redirects_to_a_later_stage():
+    scheduler, runs = _get_scheduler(SEQUENTIAL_DEPENDENCIES, stages_to_results={ToyStage.FIRST: ToyStage.THIRD})
+    scheduler.run(ToyStage.FIRST)
+    assert runs == [ToyStage.FIRST, ToyStage.THIRD, ToyStage.FOURTH]
+
+
+def test_scheduler_completes_the_run_when_a_stage_returns_true():
+    scheduler, runs = _get_scheduler(SEQUENTIAL_DEPENDENCIES, stages_to_results={ToyStage.SECOND: True})
+    scheduler.run(ToyStage.FIRST)
+    assert runs == [ToyStage.FIRST, ToyStage.SECOND]
+
+
+def test_scheduler_lets_running_stages_finish_upon_exception():
+    runs = []
+
+    def run_stage(stage):
+        if stage == ToyStage.SECOND:
+            raise ValueError('failed')
+        if stage == ToyStage.THIRD:
+            time.sleep(0.1)
+        runs.append(stage)
+
+    scheduler, _ = _get_scheduler(INDEPENDENT_MIDDLE_DEPENDENCIES, max_workers=2, run_stage=run_stage)
+    with pytest.raises(ValueError, match='failed'):
+        scheduler.run(ToyStage.FIRST)
+    assert runs == [ToyStage.FIRST, ToyStage.THIRD]
+
+
+def test_scheduler_critical_path_and_speedup_report():
+    scheduler, _ = _get_scheduler(INDEPENDENT_MIDDLE_DEPENDENCIES)
+    scheduler.stages_to_run_times = {ToyStage.FIRST: 1., ToyStage.SECOND: 4., ToyStage.THIRD: 2., ToyStage.FOURTH: 1.}
+    scheduler.run_time = 6.
+    assert scheduler.get_critical_path_time() == 6.
+    report = scheduler.get_speedup_report()
+    assert 'Speedup: 1.33x' in report
+    assert 'critical-path bound: 1.33x' in report
@@ -1,6 +1,9 @@
+import pickle
+
 from pytest import fixture
 
 from data_to_paper import Message, Role
+from data_to_paper.conversation.actions_and_conversations import Actions
 from data_to_paper.conversation.conversation_actions import AppendMessage, AppendLLMResponse, \
     FailedLLMResponse, CreateConversation, \
     NullConversationAction, ResetToTag, DeleteMessages, ReplaceLastMessage
@@ -95,3 +98,39 @@ def test_replace_last_response(conversations, conversation, assistant_message):
     print('\n' + action.pretty_repr())
     action.apply()
     assert conversation == expected
+
+
+def _append_message_action(conversations, conversation_name, content):
+    return AppendMessage(conversations=conversations, conversation_name=conversation_name,
+                         message=Message(Role.USER, content))
+
+
+def test_actions_index_is_updated_upon_append(conversations):
+    actions = Actions()
+    actions.append(_append_message_action(conversations, 'conversation1', 'content1'))
+    assert actions.is_content_printed('content1')
+    assert not actions.is_content_printed('content2')
+    actions.append(_append_message_action(conversations, 'conversation2', 'content2'))
+    actions.append(_append_message_action(conversations, 'conversation1', 'content3'))
+    assert actions.is_content_printed('content2')
+    assert actions.get_actions_for_conversation('conversation1') == [actions[0], actions[2]]
+
+
+def test_actions_index_is_rebuilt_upon_deletion(conversations):
+    actions = Actions()
+    for i in range(3):
+        actions.append(_append_message_action(conversations, 'conversation1', f'content{i}'))
+    assert actions.is_content_printed('content2')
+    del actions[1:]
+    assert not actions.is_content_printed('content2')
+    assert actions.get_actions_for_conversation('conversation1') == [actions[0]]
+    actions.clear()
+    assert actions.get_actions_for_conversation('conversation1') == []
+
+
+def test_actions_index_is_not_pickled(conversations):
+    actions = Actions()
+    actions.append(_append_message_action(None, 'conversation1', 'content1'))
+    assert actions.is_content_printed('content1')
+    assert '_index' not in pickle.loads(pickle.dumps(actions)).__dict__
+    assert pickle.loads(pickle.dumps(actions)).is_content_printed('content1')
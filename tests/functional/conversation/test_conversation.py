@@ -78,3 +78,38 @@ def test_conversation_ignores_ignored_messages():
     indices_and_messages = conversation.get_chosen_indices_and_messages()
     indices = [index for index, _ in indices_and_messages]
     assert indices == [1]
+
+
+def test_conversation_number_of_tokens_is_updated_upon_changes(conversation):
+    def assert_number_of_tokens_correct(hidden_messages=None):
+        assert conversation.get_number_of_tokens(ModelEngine.GPT4, hidden_messages) == \
+            count_number_of_tokens_in_message(conversation.get_chosen_messages(hidden_messages), ModelEngine.GPT4)
+
+    assert_number_of_tokens_correct()
+    conversation.append(Message(Role.ASSISTANT, 'I am fine, thank you.'))
+    conversation.append(Message(Role.COMMENTER, 'A comment that is not sent to the LLM.'))
+    assert_number_of_tokens_correct()
+    assert_number_of_tokens_correct(hidden_messages=[1, 2])
+    conversation.pop(1)
+    assert_number_of_tokens_correct()
+    del conversation[2:]
+    assert_number_of_tokens_correct()
+
+
+def test_message_number_of_tokens_is_memoized(monkeypatch):
+    from data_to_paper.conversation import message as message_module
+    num_counts = 0
+    original_count = message_module.count_number_of_tokens_in_text
+
+    def count(*args, **kwargs):
+        nonlocal num_counts
+        num_counts += 1
+        return original_count(*args, **kwargs)
+
+    monkeypatch.setattr(message_module, 'count_number_of_tokens_in_text', count)
+    message = Message(Role.USER, 'How are you?')
+    assert message.get_number_of_tokens(ModelEngine.GPT4) == message.get_number_of_tokens(ModelEngine.GPT4)
+    assert num_counts == 1
+    message.content = 'How are you doing?'
+    message.get_number_of_tokens(ModelEngine.GPT4)
+    assert num_counts == 2
@@ -1,9 +1,12 @@
 import pytest
 from pytest import fixture
 
+from data_to_paper.conversation.context_fitting import plan_context_fitting, DropOldestMessages, \
+    DropLargestMessages
 from data_to_paper.conversation.conversation_actions import ReplaceLastMessage
 from data_to_paper.conversation.conversation_manager import ConversationManager
-from data_to_paper.servers.llm_call import OPENAI_SERVER_CALLER
+from data_to_paper.servers.llm_call import OPENAI_SERVER_CALLER, count_number_of_tokens_in_message
+from data_to_paper.servers.model_engine import ModelEngine
 from data_to_paper.conversation.message_designation import RangeMessageDesignation
 
 
@@ -125,3 +128,46 @@ def test_conversation_manager_adds_python_header(manager):
     ]):
         content = manager.get_and_append_assistant_message(is_code=True).content
     assert content == 'the code is:\n```python\nprint("hello world")\n```\n\nthe output is:\n```\nhello world\n```\n'
+
+
+@pytest.mark.parametrize('strategy, expected_hidden_messages', [
+    (DropOldestMessages(), [1, 2]),
+    (DropLargestMessages(), [3]),
+])
+def test_plan_context_fitting_hides_messages(manager, strategy, expected_hidden_messages):
+    manager.append_user_message('short ' * 10)
+    manager.append_surrogate_message('short ' * 10)
+    manager.append_user_message('long ' * 100)
+    manager.append_user_message('How much is 2 + 2')
+    model_engine = ModelEngine.LLAMA_2_7b
+    num_tokens = manager.conversation.get_number_of_tokens(model_engine)
+    plan = plan_context_fitting(manager.conversation, model_engine=model_engine,
+                                expected_tokens_in_response=model_engine.max_tokens - num_tokens + 20,
+                                strategy=strategy)
+    assert plan.is_fitting
+    assert plan.model_engine == model_engine
+    assert plan.hidden_messages == expected_hidden_messages
+    assert plan.num_tokens == count_number_of_tokens_in_message(
+        manager.conversation.get_chosen_messages(expected_hidden_messages), model_engine)
+
+
+def test_plan_context_fitting_bumps_model(manager):
+    manager.append_user_message('How much is 2 + 2')
+    plan = plan_context_fitting(manager.conversation, model_engine=ModelEngine.GPT4,
+                                expected_tokens_in_response=ModelEngine.GPT4.max_tokens)
+    assert plan.is_fitting
+    assert plan.model_engine == ModelEngine.GPT4.get_model_with_more_context()
+    assert plan.hidden_messages == []
+
+
+def test_conversation_manager_hides_messages_with_a_single_action(manager, actions):
+    manager.append_user_message('long ' * 1000)
+    manager.append_surrogate_message('I see.')
+    manager.append_user_message('How much is 2 + 2')
+    num_actions = len(actions)
+    with OPENAI_SERVER_CALLER.mock(['The answer is 4'], record_more_if_needed=False):
+        manager.get_and_append_assistant_message(
+            model_engine=ModelEngine.GPT4o,
+            expected_tokens_in_response=ModelEngine.GPT4o.max_tokens - 500)
+    assert len(actions) == num_actions + 1
+    assert actions[-1].hidden_messages == [1]
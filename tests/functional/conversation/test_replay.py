@@ -1,7 +1,18 @@
+import os
+import pickle
+
 from data_to_paper import Role
+from data_to_paper.conversation.actions_and_conversations import Actions
+from data_to_paper.conversation.actions_log import ActionsLogReader, is_actions_log_file
 from data_to_paper.conversation.conversation_actions import AppendMessage, Message, AppendLLMResponse
 from data_to_paper.conversation.conversation_manager import ConversationManager
 from data_to_paper.conversation.replay import replay_actions
+from data_to_paper.conversation.stage import Stage
+
+
+class ToyStage(Stage):
+    FIRST = ('First', False)
+    SECOND = ('Second', False)
 
 
 def test_save_load_actions(tmpdir, actions, conversations):
@@ -38,3 +49,106 @@ def test_replay_actions(tmpdir, actions, conversations, actions_and_conversation
     actions.clear()
 
     replay_actions(tmpdir.join('actions.pkl'))
+
+
+def _create_two_conversations(actions_and_conversations):
+    conversation_manager1 = ConversationManager(actions_and_conversations=actions_and_conversations,
+                                                conversation_name='conversation1')
+    conversation_manager2 = ConversationManager(actions_and_conversations=actions_and_conversations,
+                                                conversation_name='conversation2')
+    conversation_manager1.create_conversation()
+    conversation_manager2.create_conversation()
+    return conversation_manager1, conversation_manager2
+
+
+def test_load_legacy_pickle_actions_file(tmpdir, actions, conversations):
+    actions.append(AppendMessage(
+        conversations=conversations,
+        conversation_name='default',
+        message=Message(role=Role.USER, content='what is 2 + 3 ?')))
+    with open(tmpdir.join('actions.pkl'), 'wb') as f:
+        pickle.dump(actions, f)
+
+    assert not is_actions_log_file(tmpdir.join('actions.pkl'))
+    assert Actions().load_actions_from_file(tmpdir.join('actions.pkl')) == actions
+
+
+def test_replay_legacy_pickle_actions_file(tmpdir, actions, actions_and_conversations):
+    conversation_manager1, conversation_manager2 = _create_two_conversations(actions_and_conversations)
+    conversation_manager1.append_user_message('what is 2 + 3 ?')
+    conversation_manager2.append_user_message('what is 10 - 3 ?')
+    with open(tmpdir.join('actions.pkl'), 'wb') as f:
+        pickle.dump(actions, f)
+
+    replayed_actions = replay_actions(tmpdir.join('actions.pkl'))
+    assert replayed_actions.get_all_message_contents() == ['what is 2 + 3 ?', 'what is 10 - 3 ?']
+    assert len(replayed_actions) == len(actions)
+
+
+def test_actions_log_round_trip_shares_messages_and_contexts(tmpdir, actions, actions_and_conversations):
+    conversation_manager1, conversation_manager2 = _create_two_conversations(actions_and_conversations)
+    conversation_manager1.append_user_message('what is 2 + 3 ?')
+    conversation_manager1.append_surrogate_message('the answer is 5', context=[actions[-1].message])
+    actions.save_actions_to_file(tmpdir.join('actions.pkl'))
+
+    loaded_actions = Actions().load_actions_from_file(tmpdir.join('actions.pkl'))
+    assert [type(action) for action in loaded_actions] == [type(action) for action in actions]
+    assert loaded_actions.get_all_message_contents() == actions.get_all_message_contents()
+    assert loaded_actions[-1].message.context[0] is loaded_actions[-2].message
+    conversations = loaded_actions[0].conversations
+    assert all(action.conversations is conversations for action in loaded_actions)
+
+
+def test_actions_log_stores_repeated_content_once(tmpdir, actions, actions_and_conversations):
+    conversation_manager1, conversation_manager2 = _create_two_conversations(actions_and_conversations)
+    long_content = 'the data is:\n' + 'x' * 10_000
+    for conversation_manager in (conversation_manager1, conversation_manager2):
+        for _ in range(5):
+            conversation_manager.append_user_message(''.join(list(long_content)))  # equal, but not same, strings
+    actions.save_actions_to_file(tmpdir.join('actions.pkl'))
+
+    assert 10_000 < os.path.getsize(tmpdir.join('actions.pkl')) < 20_000
+    replayed_actions = replay_actions(tmpdir.join('actions.pkl'), is_color=False)
+    assert replayed_actions.get_all_message_contents() == [long_content] * 10
+
+
+def test_replay_actions_log_of_selected_conversations(tmpdir, actions, actions_and_conversations):
+    conversation_manager1, conversation_manager2 = _create_two_conversations(actions_and_conversations)
+    conversation_manager1.append_user_message('what is 2 + 3 ?')
+    conversation_manager2.append_user_message('what is 10 - 3 ?')
+    actions.save_actions_to_file(tmpdir.join('actions.pkl'))
+
+    replayed_actions = replay_actions(tmpdir.join('actions.pkl'), conversation_names=['conversation2'])
+    assert replayed_actions.get_all_message_contents() == ['what is 10 - 3 ?']
+    assert list(replayed_actions[0].conversations.keys()) == ['conversation2']
+
+
+def test_replay_actions_log_until_stage(tmpdir, actions, actions_and_conversations):
+    stage = ToyStage.FIRST
+    actions.log_to_file(tmpdir.join('actions.pkl'), get_stage=lambda: stage)
+    conversation_manager1, _ = _create_two_conversations(actions_and_conversations)
+    conversation_manager1.append_user_message('what is 2 + 3 ?')
+    stage = ToyStage.SECOND
+    conversation_manager1.append_surrogate_message('the answer is 5')
+    actions.stop_logging()
+
+    replayed_actions = replay_actions(tmpdir.join('actions.pkl'), until_stage=ToyStage.SECOND)
+    assert replayed_actions.get_all_message_contents() == ['what is 2 + 3 ?']
+    assert [stage for stage, _ in ActionsLogReader(tmpdir.join('actions.pkl')).iterate_actions()][-1] == \
+        ToyStage.SECOND
+
+
+def test_actions_log_ignores_incomplete_last_frame_and_resumes(tmpdir, actions, actions_and_conversations):
+    conversation_manager1, _ = _create_two_conversations(actions_and_conversations)
+    actions.log_to_file(tmpdir.join('actions.pkl'))
+    conversation_manager1.append_user_message('what is 2 + 3 ?')
+    actions.stop_logging()
+    with open(tmpdir.join('actions.pkl'), 'ab') as f:
+        f.write(b'\x03\xff\xff\x00\x00partial')
+
+    assert len(Actions().load_actions_from_file(tmpdir.join('actions.pkl'))) == 1
+    actions.log_to_file(tmpdir.join('actions.pkl'))
+    conversation_manager1.append_surrogate_message('the answer is 5')
+    actions.stop_logging()
+    assert Actions().load_actions_from_file(tmpdir.join('actions.pkl')).get_all_message_contents() == \
+        ['what is 2 + 3 ?', 'the answer is 5']
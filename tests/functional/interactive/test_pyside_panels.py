@@ -0,0 +1,104 @@
+import os
+import time
+
+import pytest
+from PySide6.QtTest import QTest
+from PySide6.QtWidgets import QApplication
+
+from data_to_paper.env import MAX_PANEL_RENDERS_PER_SECOND
+from data_to_paper.interactive.pyside_app import EditableTextPanel, create_tabs
+
+HEADER = '<h2>Querying Citations</h2><p>Searching for papers:</p>'
+QUERY = '<h3>Dataset-related queries:</h3><p><b>Query:</b> "diabetes".<br><b>Found:</b> 25 citations.</p>'
+
+
+@pytest.fixture(scope='module')
+def q_application():
+    os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture()
+def panel(q_application):
+    panel = EditableTextPanel('Feedback')
+    panel.show()
+    yield panel
+    panel.close()
+
+
+def _wait_for_rendering(panel, timeout: float = 2.):
+    deadline = time.monotonic() + timeout
+    while panel.has_pending_updates() and time.monotonic() < deadline:
+        QTest.qWait(10)
+
+
+def test_appended_html_is_rendered_as_part_of_the_whole_html(q_application, panel):
+    whole_panel = EditableTextPanel('Feedback')
+    whole_panel.set_text(HEADER + QUERY + 'Done.', is_html=True)
+    whole_panel.render_pending_updates(force=True)
+
+    panel.set_text(HEADER, is_html=True)
+    panel.render_pending_updates()
+    panel.append_text(QUERY, is_html=True)
+    panel.render_pending_updates()
+    panel.append_text('Done.', is_html=True)
+    panel.render_pending_updates()
+    assert panel.get_text() == whole_panel.get_text()
+    assert panel.num_renders == 3
+
+
+def test_appended_plain_text(panel):
+    panel.set_text('Line 1\n')
+    panel.append_text('Line 2')
+    panel.append_text('\nLine 3')
+    assert panel.get_text() == 'Line 1\nLine 2\nLine 3'
+
+
+def test_bursts_of_updates_are_coalesced(panel):
+    with MAX_PANEL_RENDERS_PER_SECOND.temporary_set(10):
+        panel.set_text(HEADER, is_html=True)
+        for i in range(100):
+            panel.append_text(f'<p>Query {i}</p>', is_html=True)
+        assert panel.num_renders == 0
+        _wait_for_rendering(panel)
+    assert panel.num_renders == 1
+    assert panel.get_text().endswith('Query 98\nQuery 99')
+
+
+def test_each_update_is_rendered_when_not_throttled(panel):
+    with MAX_PANEL_RENDERS_PER_SECOND.temporary_set(None):
+        for i in range(5):
+            panel.set_text(f'Text {i}')
+    assert panel.num_renders == 5
+
+
+def test_set_text_replaces_pending_appends(panel):
+    panel.append_text('Old')
+    panel.set_text('New')
+    panel.append_text(' text')
+    assert panel.get_text() == 'New text'
+
+
+def test_edit_text_discards_pending_updates(panel):
+    panel.set_text('Shown text')
+    panel.edit_text('Edited text')
+    _wait_for_rendering(panel)
+    assert panel.get_text() == 'Edited text'
+    assert not panel.text_edit.isReadOnly()
+
+
+def test_hidden_panels_are_rendered_once_shown(q_application):
+    response_panel, product_panel = EditableTextPanel('Response'), EditableTextPanel('Product')
+    tabs = create_tabs({'Response': response_panel, 'Product': product_panel})
+    tabs.show()
+    product_panel.set_text('Product text')
+    QTest.qWait(200)
+    assert not product_panel.is_shown()
+    assert product_panel.has_pending_updates()
+    assert product_panel.num_renders == 0
+
+    tabs.setCurrentWidget(product_panel)
+    _wait_for_rendering(product_panel)
+    assert product_panel.num_renders == 1
+    assert product_panel.text_edit.toPlainText() == 'Product text'
+    tabs.close()
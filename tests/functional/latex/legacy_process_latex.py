@@ -0,0 +1,62 @@
+"""
+The regex-based splitting of latex into text and math, which `split_latex_text_and_math` replaced.
+Used for testing the equivalence of the two.
+"""
+import regex
+
+from data_to_paper.latex.clean_latex import process_inside_and_outside_command
+
+LEGACY_MATH_PATTERN = r"""
+(?<!\\)    # negative look-behind to make sure start is not escaped
+(?:        # start non-capture group for all possible match starts
+  # group 1, match dollar signs only
+  # single or double dollar sign enforced by look-arounds
+  ((?<!\$)\${1,2}(?!\$))|
+  # group 2, match escaped parenthesis
+  (\\\()|
+  # group 3, match escaped bracket
+  (\\\[)|
+  # group 4,
+  (\\begin\{(?:equation\*?|align\*?)\})|
+  # group 5, match table and figure environments
+  (\\begin\{(?:figure|lstlisting)\})|
+  # group 6, match non-typesetting commands
+  (\\(?:ref|label|autoref)\{)
+)
+# if group 1 was start
+(?(1)
+  # non greedy match everything in between
+  # group 1 matches do not support recursion
+  (.*?)(?<!\\)
+  # match ending double or single dollar signs
+  (?<!\$)\1(?!\$)|
+# else
+(?:
+  # greedily and recursively match everything in between
+  # groups 2, 3, 4, and 5 support recursion
+  ((?:.|\n|\r)*?(?R)?(?:.|\n|\r)*?)(?<!\\)
+  (?:
+    # if group 2 was start, escaped parenthesis is end
+    (?(2)\\\)|
+    # if group 3 was start, escaped bracket is end
+    (?(3)\\\]|
+    # if group 4 was start, match end equation or end align
+    (?(4)\\end\{(?:equation\*?|align\*?)\}|
+    # if group 5 was start, match end figure or end table
+    (?(5)\\end\{(?:figure|lstlisting)\}|
+    # else, match end of non-typesetting command
+    \})
+  )
+)))))
+"""
+
+
+def legacy_process_latex_text_and_math(text, process_text, process_math):
+    result = []
+    last_end = 0
+    for match in regex.finditer(LEGACY_MATH_PATTERN, text, flags=regex.VERBOSE):
+        result.append(process_text(text[last_end:match.start()]))
+        result.append(process_inside_and_outside_command(match.group(), process_text, process_math))
+        last_end = match.end()
+    result.append(process_text(text[last_end:]))
+    return ''.join(result)
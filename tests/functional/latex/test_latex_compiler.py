@@ -0,0 +1,152 @@
+import pickle
+import re
+import shutil
+
+import pytest
+
+from data_to_paper.env import LATEX_COMPILATION_CACHE_FOLDER
+from data_to_paper.latex import save_latex_and_compile_to_pdf
+from data_to_paper.latex.exceptions import LatexCompilationError
+from data_to_paper.latex.latex_compiler import LATEX_COMPILER, LatexCompiler, LatexCompilationResult, \
+    CITATION_PATTERN, CROSS_REFERENCE_PATTERN, END_OF_DUMP, _get_digest
+from data_to_paper.latex.latex_doc import LatexDocument
+
+no_pdflatex = pytest.mark.skipif(shutil.which('pdflatex') is None, reason='pdflatex is not installed')
+
+LATEX_CONTENT = r'''
+\documentclass{article}
+\begin{document}
+Hello World!
+\end{document}
+'''
+
+
+@pytest.mark.parametrize('text, has_citations, has_cross_references', [
+    (r'Hello World!', False, False),
+    (r'As shown in \cite{smith2020}.', True, True),
+    (r'See \citet{smith2020} and \citep{doe2021}.', True, True),
+    (r'See Table \ref{table:results}.', False, True),
+    (r'See Equation \eqref{eq:model}.', False, True),
+    (r'\citefield and \reference are other commands.', False, False),
+])
+def test_latex_compiler_pass_detection(text, has_citations, has_cross_references):
+    assert bool(CITATION_PATTERN.search(text)) == has_citations
+    assert bool(CROSS_REFERENCE_PATTERN.search(text)) == has_cross_references
+
+
+def _cache_result(compiler: LatexCompiler, latex_content: str, result: LatexCompilationResult):
+    key = _get_digest(compiler.get_pdflatex_version(), latex_content, None, 'test', str(True))
+    cache_path = compiler._get_cache_path(key)
+    cache_path.parent.mkdir(parents=True)
+    cache_path.write_bytes(pickle.dumps(result))
+
+
+def test_latex_compiler_reuses_cached_result(tmpdir):
+    compiler = LatexCompiler()
+    with LATEX_COMPILATION_CACHE_FOLDER.temporary_set(str(tmpdir)):
+        _cache_result(compiler, LATEX_CONTENT, LatexCompilationResult(pdflatex_output='cached output'))
+        result = compiler.compile(LATEX_CONTENT, 'test')
+    assert result.pdflatex_output == 'cached output'
+    assert compiler.num_cache_hits == 1
+    assert compiler.num_compilations == 0
+
+
+def test_save_latex_and_compile_to_pdf_raises_on_cached_error(tmpdir):
+    with LATEX_COMPILATION_CACHE_FOLDER.temporary_set(str(tmpdir)):
+        _cache_result(LATEX_COMPILER, LATEX_CONTENT,
+                      LatexCompilationResult(pdflatex_output='! Misplaced alignment tab character &.', is_error=True))
+        with pytest.raises(LatexCompilationError):
+            save_latex_and_compile_to_pdf(LATEX_CONTENT, 'test')
+
+
+@no_pdflatex
+def test_latex_document_precompilable_preamble():
+    latex, _ = LatexDocument().get_document('Hello World!', file_stem='test')
+    preamble, end_of_dump, body = latex.partition(END_OF_DUMP)
+    assert end_of_dump
+    assert r'\usepackage{hyperref}' not in preamble
+    assert r'\usepackage{hyperref}' in body
+    assert r'\begin{document}' in body
+
+
+@no_pdflatex
+def test_latex_compiler_caches_compilation(tmpdir):
+    compiler = LatexCompiler()
+    with LATEX_COMPILATION_CACHE_FOLDER.temporary_set(str(tmpdir)):
+        first = compiler.compile(LATEX_CONTENT, 'test')
+        second = compiler.compile(LATEX_CONTENT, 'test')
+    assert not first.is_error
+    assert second.pdflatex_output == first.pdflatex_output
+    assert compiler.num_compilations == 1
+
+
+@no_pdflatex
+def test_latex_compiler_with_precompiled_preamble(tmpdir):
+    from data_to_paper.env import LATEX_FORMATS_FOLDER
+    compiler = LatexCompiler()
+    latex, _ = LatexDocument().get_document('Hello World! See Section \\ref{sec:methods}.')
+    with LATEX_FORMATS_FOLDER.temporary_set(str(tmpdir)):
+        result = compiler.compile(latex, 'test', output_directory=str(tmpdir))
+        assert compiler.get_format_path(latex) is not None
+    assert not result.is_error
+    assert (tmpdir / 'test.pdf').exists()
+
+
+def _fake_compile_draft(latex_content: str) -> LatexCompilationResult:
+    if 'BAD' in latex_content:
+        return LatexCompilationResult(pdflatex_output='! Undefined control sequence.\nl.3 BAD', is_error=True)
+    tables = re.findall(r'\\typeout\{Table (\d+) width', latex_content)
+    return LatexCompilationResult(pdflatex_output='Page margin width: 200.0pt\n' + ''.join(
+        f'Table {i} width: {100. + int(i)}pt\n' for i in tables))
+
+
+@pytest.fixture()
+def fake_compile_draft(monkeypatch):
+    calls = []
+
+    def compile_draft(latex_content):
+        calls.append(latex_content)
+        return _fake_compile_draft(latex_content)
+
+    monkeypatch.setattr(LATEX_COMPILER, 'compile_draft', compile_draft)
+    return calls
+
+
+def _get_table(text: str) -> str:
+    return '\\begin{table}\n\\begin{tabular}{l}\n' + text + '\n\\end{tabular}\n\\end{table}'
+
+
+def test_measure_tables_in_a_single_pass(fake_compile_draft):
+    widths = LatexDocument().measure_tables([_get_table('a'), _get_table('b'), _get_table('c')])
+    assert widths == [0.5, 0.505, 0.51]
+    assert len(fake_compile_draft) == 1
+
+
+def test_measure_tables_caches_widths(fake_compile_draft):
+    latex_document = LatexDocument()
+    latex_document.measure_tables([_get_table('a'), _get_table('b')])
+    widths = latex_document.measure_tables([_get_table('b'), _get_table('c')])
+    assert len(fake_compile_draft) == 2
+    assert '{l}\nb\n' not in fake_compile_draft[1]
+    assert widths == [0.505, 0.5]
+
+
+def test_measure_tables_isolates_the_table_that_does_not_compile(fake_compile_draft):
+    latex_document = LatexDocument()
+    tables = [_get_table('a'), _get_table('b'), _get_table('BAD'), _get_table('d')]
+    with pytest.raises(LatexCompilationError) as e:
+        latex_document.measure_tables(tables)
+    assert '{l}\nBAD\n' in e.value.latex_content
+    assert '{l}\na\n' not in e.value.latex_content
+    # the widths of the other tables are cached:
+    num_compilations = len(fake_compile_draft)
+    assert latex_document.measure_tables([tables[0], tables[1], tables[3]]) == [0.5, 0.505, 0.5]
+    assert len(fake_compile_draft) == num_compilations
+
+
+@no_pdflatex
+def test_measure_tables_is_consistent_with_compile_table(tmpdir):
+    tables = [_get_table('a'), _get_table(r'a much wider table than the first one')]
+    widths = LatexDocument().measure_tables(tables)
+    assert widths == pytest.approx([LatexDocument().compile_table(table, file_stem='test', output_directory=tmpdir)
+                                    for table in tables])
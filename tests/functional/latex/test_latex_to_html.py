@@ -1,4 +1,12 @@
-from data_to_paper.latex.latex_to_html import convert_latex_to_html
+import subprocess
+
+import pytest
+
+from data_to_paper.env import LATEX_TO_HTML_CACHE_FOLDER
+from data_to_paper.latex import latex_to_html
+from data_to_paper.latex.latex_to_html import convert_latex_to_html, convert_latexes_to_html, LatexToHtmlConverter
+from data_to_paper.utils import highlighted_text
+from data_to_paper.utils.highlighted_text import format_text_with_code_blocks, RenderCache
 
 
 def test_convert_latex_to_html():
@@ -9,3 +17,73 @@ Hello, world!
     html = convert_latex_to_html(latex)
     assert '>Hello</h2>' in html
     assert '>Hello, world!</p>' in html
+
+
+WRITING_STAGE_MESSAGES = [
+    'Here is the title and abstract:\n\n```latex\n\\title{The effect of X on Y}\n```\n\n'
+    '```latex\n\\begin{abstract}\nWe found that X affects Y ($p<0.05$).\n\\end{abstract}\n```\n',
+    'Here is the Introduction section:\n\n```latex\n\\section{Introduction}\nX is known to affect Y.\n```\n',
+    'Here is the Results section:\n\n```latex\n\\section{Results}\nX affects Y (Table 1).\n\n'
+    'The effect was 50% larger in Z.\n```\n',
+    'Here are the revised sections:\n\n```latex\n\\section{Methods}\nWe used a linear model.\n```\n\n'
+    '```latex\n\\section{Discussion}\nOur results show that X affects Y.\n```\n\n'
+    '```latex\n\\section{Conclusion}\nX affects Y.\n```\n',
+]
+
+
+def _fake_pandoc(command, input=None, **kwargs):
+    if '--version' in command:
+        return subprocess.CompletedProcess(command, 0, stdout='pandoc 3.1\n')
+    if 'BROKEN' in input:
+        raise subprocess.CalledProcessError(64, command)
+    body = '\n'.join(f'<p>{paragraph.strip()}</p>' for paragraph in input.split('\n\n') if paragraph.strip())
+    if '-s' in command:
+        body = f'<html><body>\n{body}\n</body></html>'
+    return subprocess.CompletedProcess(command, 0, stdout=body)
+
+
+@pytest.fixture()
+def pandoc_runs(monkeypatch):
+    runs = []
+
+    def run(command, *args, **kwargs):
+        runs.append(command)
+        return _fake_pandoc(command, **kwargs)
+
+    monkeypatch.setattr(latex_to_html.subprocess, 'run', run)
+    monkeypatch.setattr(latex_to_html, 'LATEX_TO_HTML_CONVERTER', LatexToHtmlConverter())
+    monkeypatch.setattr(highlighted_text, 'RENDER_CACHE', RenderCache())
+    latex_to_html.get_pandoc_version.cache_clear()
+    yield runs
+    latex_to_html.get_pandoc_version.cache_clear()
+
+
+def test_rendering_a_writing_stage_conversation_launches_few_subprocesses(pandoc_runs):
+    for _ in range(3):  # panels re-render the same messages
+        for message in WRITING_STAGE_MESSAGES:
+            format_text_with_code_blocks(message, is_html=True)
+    # one pandoc probe, and one pandoc run per message (the title block is converted separately):
+    assert len(pandoc_runs) == 1 + len(WRITING_STAGE_MESSAGES) + 1
+
+
+def test_convert_latexes_to_html_in_a_single_run(pandoc_runs):
+    htmls = convert_latexes_to_html(['\\section{A}\nFirst.', '\\section{B}\nSecond.', '\\section{A}\nFirst.'])
+    assert len(pandoc_runs) == 2
+    assert 'First.' in htmls[0] and 'Second.' not in htmls[0]
+    assert 'Second.' in htmls[1] and 'First.' not in htmls[1]
+    assert htmls[2] == htmls[0]
+
+
+def test_convert_latexes_to_html_falls_back_to_escaped_latex(pandoc_runs):
+    htmls = convert_latexes_to_html(['First.', 'BROKEN & latex', 'Second.'])
+    assert htmls[1] == 'BROKEN \\&amp; latex'
+    assert '<p>First.</p>' in htmls[0]
+    assert '<p>Second.</p>' in htmls[2]
+
+
+def test_convert_latex_to_html_cached_on_disk(pandoc_runs, tmpdir):
+    with LATEX_TO_HTML_CACHE_FOLDER.temporary_set(str(tmpdir)):
+        html = convert_latex_to_html('Hello.')
+        num_runs = len(pandoc_runs)
+        assert LatexToHtmlConverter().convert('Hello.') == html
+    assert len(pandoc_runs) == num_runs
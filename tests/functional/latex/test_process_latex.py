@@ -1,6 +1,11 @@
+import random
+
 import pytest
 
-from data_to_paper.latex.clean_latex import process_latex_text_and_math
+from data_to_paper.latex.clean_latex import process_latex_text_and_math, split_latex_text_and_math, \
+    LatexSegmentKind as K
+
+from .legacy_process_latex import legacy_process_latex_text_and_math
 
 
 @pytest.mark.parametrize(
@@ -43,3 +48,79 @@ from data_to_paper.latex.clean_latex import process_latex_text_and_math
 def test_process_latex_parts(text, expected):
     result = process_latex_text_and_math(text, str.lower, str.upper)
     assert result == expected
+
+
+@pytest.mark.parametrize(
+    "text, expected_kinds",
+    [
+        ("Text $a$ text $$b$$", [K.TEXT, K.INLINE_MATH, K.TEXT, K.DISPLAY_MATH]),
+        ("\\(a\\) \\[b\\]", [K.INLINE_MATH, K.TEXT, K.DISPLAY_MATH]),
+        ("\\begin{equation}a\\end{equation}", [K.DISPLAY_MATH]),
+        ("\\begin{figure}\\caption{A}\\end{figure}", [K.ENVIRONMENT]),
+        ("See \\ref{table:a}.", [K.TEXT, K.COMMAND, K.TEXT]),
+        ("Costs \\$5 and $6", [K.TEXT]),
+        ("$a\nb$", [K.TEXT]),
+        ("$a$$b$", [K.INLINE_MATH]),
+        ("\\ref{a{b}c}", [K.COMMAND]),
+        ("\\(\\ref{a}x\\)y\\(z\\)", [K.INLINE_MATH, K.TEXT, K.INLINE_MATH]),
+    ],
+)
+def test_split_latex_text_and_math(text, expected_kinds):
+    segments = split_latex_text_and_math(text)
+    assert [segment.kind for segment in segments] == expected_kinds
+    assert ''.join(segment.text for segment in segments) == text
+
+
+def _get_random_math(rng: random.Random) -> str:
+    return ''.join(rng.choice(['x', 'Y', ' ', '^2', '_i', '\\frac{a}{B}', '\\alpha', '<'])
+                   for _ in range(rng.randint(0, 5)))
+
+
+def _get_random_latex(rng: random.Random, depth: int = 0) -> str:
+    """
+    Random latex, with unbalanced `$`, escaped and unmatched closings, and nested spans.
+    Spans do not start with a nested span (the legacy regex then closes the outer span at a later closing,
+    see test above), and figures are not nested in figures.
+    """
+    pieces = []
+    for _ in range(rng.randint(1, 12)):
+        choice = rng.randint(0, 14)
+        if choice < 5:
+            pieces.append(rng.choice(['Alpha', 'beta ', ' ', '&', '50%', 'x_1', '\\$', '\\{', '\\}', '\\\\', '\n',
+                                      '}', '{', '\\)', '\\]', '$', '$$', '\\end{figure}', 'Table~1']))
+        elif choice == 5:
+            pieces.append('$' + _get_random_math(rng) + '$')
+        elif choice == 6:
+            pieces.append('$$' + _get_random_math(rng) + '$$')
+        elif choice == 7:
+            pieces.append('\\(' + _get_random_math(rng) + '\\)')
+        elif choice == 8:
+            pieces.append('\\[' + _get_random_math(rng) + '\n' + _get_random_math(rng) + '\\]')
+        elif choice == 9:
+            environment = rng.choice(['equation', 'equation*', 'align', 'align*'])
+            pieces.append(f'\\begin{{{environment}}}{_get_random_math(rng)}\\end{{{environment}}}')
+        elif choice == 10 and depth == 0:
+            pieces.append('\\begin{figure}Figure ' + _get_random_latex(rng, depth + 1) + '\\caption{A Caption_1}'
+                          + '\\label{fig:a}\\end{figure}')
+        elif choice == 11:
+            pieces.append(' ' + rng.choice(['\\ref', '\\label', '\\autoref']) + '{table:A_b}')
+        elif choice == 12:
+            pieces.append('\\begin{tabular}{ll}' + _get_random_math(rng) + '\\end{tabular}')
+    return ''.join(pieces)
+
+
+def _mark_text(text: str) -> str:
+    return '[' + text.lower() + ']' if text else ''
+
+
+def _mark_math(text: str) -> str:
+    return '<' + text.upper() + '>'
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_split_latex_text_and_math_is_equivalent_to_legacy_regex(seed):
+    rng = random.Random(seed)
+    for _ in range(50):
+        text = _get_random_latex(rng)
+        assert process_latex_text_and_math(text, _mark_text, _mark_math) == \
+            legacy_process_latex_text_and_math(text, _mark_text, _mark_math), text
@@ -0,0 +1,74 @@
+import os
+import time
+
+import pytest
+
+from data_to_paper.env import MAX_EXEC_TIME
+from data_to_paper.run_gpt_code.code_execution_engine import CodeExecutionEngine, ProcessTimeoutError, \
+    ProcessDiedError
+
+
+def get_pid(sleep_sec: float = 0):
+    time.sleep(sleep_sec)
+    return os.getpid()
+
+
+def raise_value_error():
+    raise ValueError('bad value')
+
+
+def exit_process():
+    os._exit(3)
+
+
+def get_max_exec_time():
+    return MAX_EXEC_TIME.val
+
+
+def test_engine_runs_in_separate_process():
+    assert CodeExecutionEngine().run(get_pid) != os.getpid()
+
+
+def test_engine_returns_exception():
+    result = CodeExecutionEngine().run(raise_value_error)
+    assert isinstance(result, ValueError)
+    assert 'bad value' in str(result)
+
+
+def test_engine_kills_process_on_timeout():
+    start = time.time()
+    with pytest.raises(ProcessTimeoutError):
+        CodeExecutionEngine().run(get_pid, (100, ), timeout_sec=0.5)
+    assert time.time() - start < 50
+
+
+def test_engine_raises_when_process_dies():
+    with pytest.raises(ProcessDiedError) as e:
+        CodeExecutionEngine().run(exit_process)
+    assert e.value.exitcode == 3
+
+
+@pytest.mark.parametrize('start_method', ['fork', 'spawn'])
+def test_engine_transfers_temporarily_set_env_values(start_method):
+    with MAX_EXEC_TIME.temporary_set(17):
+        assert CodeExecutionEngine(start_method=start_method).run(get_max_exec_time) == 17
+
+
+def test_engine_runs_in_parallel():
+    start = time.time()
+    pids = CodeExecutionEngine(max_workers=4).run_in_parallel([(get_pid, (1, ))] * 4)
+    assert len(set(pids)) == 4
+    assert time.time() - start < 3.5
+
+
+def test_engine_runs_with_prewarmed_forkserver():
+    assert CodeExecutionEngine(start_method='forkserver').run(get_pid) != os.getpid()
+
+
+def test_override_tables_are_built_once():
+    from data_to_paper.run_gpt_code.interpreter_template import build_override_tables
+    from data_to_paper.run_gpt_code.overrides.scipy.override_scipy import ScipyPValueOverride
+    build_override_tables()
+    table = ScipyPValueOverride().get_parents_and_attr_names()
+    assert len(table) > 0
+    assert ScipyPValueOverride().get_parents_and_attr_names() is table
@@ -0,0 +1,56 @@
+import os
+import zipfile
+
+from pytest import raises
+
+from data_to_paper.env import EXTRACTED_ARCHIVES_FOLDER
+from data_to_paper.run_gpt_code.data_staging import stage_file, stage_zip_archive
+from data_to_paper.run_gpt_code.exceptions import CodeWriteForbiddenFile
+from data_to_paper.run_gpt_code.run_contexts import PreventFileOpen
+from data_to_paper.utils.file_utils import run_in_directory
+
+
+def _create_data_file(tmpdir, content='a,b\n1,2\n'):
+    data_dir = tmpdir.mkdir('data')
+    with open(data_dir / 'data.csv', 'w') as f:
+        f.write(content)
+    return data_dir / 'data.csv'
+
+
+def test_stage_file_does_not_copy(tmpdir):
+    data_file = _create_data_file(tmpdir)
+    run_dir = tmpdir.mkdir('run')
+    method = stage_file(data_file, run_dir / 'data.csv')
+    assert method in ('reflink', 'hardlink', 'symlink')
+    with open(run_dir / 'data.csv') as f:
+        assert f.read() == 'a,b\n1,2\n'
+
+
+def test_stage_zip_archive_extracts_once(tmpdir):
+    data_file = _create_data_file(tmpdir)
+    with zipfile.ZipFile(tmpdir / 'data.csv.zip', 'w') as zip_ref:
+        zip_ref.write(data_file, 'data.csv')
+    with EXTRACTED_ARCHIVES_FOLDER.temporary_set(str(tmpdir / 'extracted')):
+        for run in ['run1', 'run2']:
+            run_dir = tmpdir.mkdir(run)
+            assert stage_zip_archive(tmpdir / 'data.csv.zip', run_dir) == ['data.csv']
+            with open(run_dir / 'data.csv') as f:
+                assert f.read() == 'a,b\n1,2\n'
+    assert len(os.listdir(tmpdir / 'extracted')) == 1
+
+
+def test_prevent_file_open_protects_staged_input_files(tmpdir):
+    data_file = _create_data_file(tmpdir)
+    run_dir = tmpdir.mkdir('run')
+    stage_file(data_file, run_dir / 'data.csv')
+    with run_in_directory(run_dir), \
+            PreventFileOpen(allowed_read_files=['data.csv'], allowed_write_files=['*.csv']):
+        with open('data.csv') as f:
+            assert f.read() == 'a,b\n1,2\n'
+        for mode in ['w', 'a', 'r+']:
+            with raises(CodeWriteForbiddenFile):
+                open('data.csv', mode)
+        with open('output.csv', 'w') as f:
+            f.write('output')
+    with open(data_file) as f:
+        assert f.read() == 'a,b\n1,2\n'
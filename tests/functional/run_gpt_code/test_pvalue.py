@@ -1,10 +1,15 @@
 import pickle
 
+import numpy as np
+import pytest
 from pytest import fixture
 from pandas.core.dtypes.inference import is_list_like
-from pandas import DataFrame
+from pandas import DataFrame, Series
 
-from data_to_paper.run_gpt_code.overrides.pvalue import PValue, is_p_value
+from data_to_paper.run_gpt_code.overrides.pvalue import PValue, is_p_value, convert_to_p_value, \
+    is_containing_p_value, format_p_value, format_p_values, format_p_values_in_df, InvalidPValueRunIssue, \
+    OnStr, OnStrPValue, ON_STR_TO_FORMAT_KWARGS
+from data_to_paper.run_gpt_code.run_issues import RunIssue
 
 
 @fixture()
@@ -42,3 +47,46 @@ def test_pvalue_unique():
     data_unique = data.unique()
     assert len(data_unique) == 2
     assert isinstance(data_unique[0], PValue)
+
+
+def test_convert_float_series_to_p_values_in_place():
+    series = Series([0.01, 0.5], index=['x', 'y'])
+    converted = convert_to_p_value(series, created_by='OLS')
+    assert converted is series
+    assert all(is_p_value(value) for value in series)
+    assert [value.var_name for value in series] == ['x', 'y']
+    assert series.iloc[0].created_by == 'OLS'
+
+
+def test_convert_float_array_with_nan_to_p_values_raises():
+    with pytest.raises(InvalidPValueRunIssue):
+        convert_to_p_value(np.array([0.01, np.nan]), created_by='ttest_ind')
+
+
+def test_converted_p_values_still_forbid_arithmetic():
+    series = convert_to_p_value(Series([0.01, 0.5]), created_by='OLS')
+    with pytest.raises(RunIssue):
+        series.iloc[0] + 1
+
+
+@pytest.mark.parametrize('on_str', [OnStr.SMALLER_THAN, OnStr.LATEX_SMALLER_THAN, OnStr.WITH_ZERO])
+def test_format_p_values_is_same_as_format_p_value(on_str):
+    values = [0., 1e-8, 1e-6, 0.0123456, 0.5, 1., np.nan]
+    minimal_value, smaller_than_sign = ON_STR_TO_FORMAT_KWARGS[on_str]
+    assert list(format_p_values(values, minimal_value, smaller_than_sign)) == \
+        [format_p_value(value, minimal_value, smaller_than_sign) for value in values]
+
+
+def test_format_p_values_in_df_is_same_as_on_str_rendering():
+    df = DataFrame({'coef': [1.5, 2.5], 'p': [PValue(1e-9), PValue(0.0412)], 'mixed': ['a', PValue(0.2)]})
+    formatted_df = format_p_values_in_df(df, OnStr.LATEX_SMALLER_THAN)
+    with OnStrPValue(OnStr.LATEX_SMALLER_THAN):
+        assert formatted_df.to_latex() == df.to_latex()
+    assert not is_containing_p_value(formatted_df)
+    assert is_p_value(df['p'].iloc[0])  # the original df is not changed
+
+
+def test_is_containing_p_value():
+    assert not is_containing_p_value(DataFrame({'a': [0.1, 0.2], 'b': ['x', 'y']}))
+    assert is_containing_p_value(DataFrame({'a': [0.1, 0.2], 'b': ['x', PValue(0.2)]}))
+    assert is_containing_p_value({'table': [1, (2, PValue(0.3))]})
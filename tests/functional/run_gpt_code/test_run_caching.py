@@ -1,8 +1,10 @@
 import os
+import pickle
 from dataclasses import dataclass
 from pathlib import Path
 
-from data_to_paper.run_gpt_code.cache_runs import CacheRunToFile
+from data_to_paper.run_gpt_code.cache_runs import CacheRunToFile, directory_hash, FileFingerprinter
+from data_to_paper.run_gpt_code.run_cache_store import RunCacheStore
 
 
 @dataclass
@@ -76,3 +78,98 @@ def test_cache_method_output_to_file_with_created_files(tmpdir):
     # check that the file was written:
     with open('output/result.txt') as f:
         assert f.read() == 'hello'
+
+
+def test_cache_stores_identical_created_files_once(tmpdir):
+    os.chdir(tmpdir)
+    os.mkdir('cache')
+    os.mkdir('output')
+    assert get_runner('hello', write_files=True).run() == 'hello'
+    # change the input files of the run, so that the run is not cached:
+    os.remove('output/result.txt')
+    with open('output/input.txt', 'w') as f:
+        f.write('input')
+    runner = get_runner('hello', write_files=True)
+    assert runner.run() == 'hello'
+    assert runner.called_count == 1
+    store_directory = RunCacheStore.get_store_directory(runner.cache_filepath)
+    assert len(list(store_directory.glob('entries/*/*'))) == 2
+    assert len(list(store_directory.glob('blobs/*/*'))) == 1
+
+
+def test_cache_reads_legacy_cache_file(tmpdir):
+    os.chdir(tmpdir)
+    os.mkdir('cache')
+    os.mkdir('output')
+    runner = get_runner('hello')
+    key = runner._get_instance_key() + runner._get_run_directory_legacy_keys()[0]
+    with open(runner.cache_filepath, 'wb') as f:
+        pickle.dump({key: ('legacy hello', {})}, f)
+    assert runner.run() == 'legacy hello'
+    assert runner.called_count == 0
+
+
+def test_run_cache_store_evicts_least_recently_used_entries_from_memory(tmpdir):
+    store = RunCacheStore(Path(tmpdir) / 'store', memory_size_cap=1000)
+    for index in range(3):
+        store.put((index, ), 'x' * 400, {})
+    assert len(store._entries) == 2
+    assert store.get((0, )) == ('x' * 400, {})  # read back from disk
+    assert list(store._entries) == [store.get_key_digest((2, )), store.get_key_digest((0, ))]
+
+
+def test_directory_hash_is_updated_when_files_change(tmpdir):
+    with open(os.path.join(tmpdir, 'data.csv'), 'w') as f:
+        f.write('a,b\n1,2\n')
+    first_hash = directory_hash(tmpdir)
+    assert directory_hash(tmpdir) == first_hash
+    with open(os.path.join(tmpdir, 'data.csv'), 'w') as f:
+        f.write('a,b\n1,2\n3,4\n')
+    assert directory_hash(tmpdir) != first_hash
+
+
+def _write(file_path, content: str):
+    with open(file_path, 'w') as f:
+        f.write(content)
+
+
+def test_file_fingerprinter_rehashes_only_changed_files(tmpdir):
+    _write(tmpdir / 'a.csv', 'a' * 100)
+    _write(tmpdir / 'b.csv', 'b' * 100)
+    fingerprinter = FileFingerprinter()
+    first_fingerprint = fingerprinter.get_directory_fingerprint(tmpdir)
+    assert fingerprinter.stats.num_files_hashed == 2
+    assert fingerprinter.get_directory_fingerprint(tmpdir) == first_fingerprint
+    assert fingerprinter.stats.num_files_hashed == 2
+    assert fingerprinter.stats.num_bytes_skipped == 200
+    _write(tmpdir / 'b.csv', 'c' * 100)
+    assert fingerprinter.get_directory_fingerprint(tmpdir) != first_fingerprint
+    assert fingerprinter.stats.num_files_hashed == 3
+
+
+def test_file_fingerprinter_keeps_table_persistently(tmpdir):
+    data_dir = tmpdir.mkdir('data')
+    _write(data_dir / 'a.csv', 'a' * 100)
+    table_filepath = str(tmpdir / 'cache' / 'fingerprints.pkl')
+    fingerprint = FileFingerprinter(table_filepath=table_filepath).get_directory_fingerprint(data_dir)
+    fingerprinter = FileFingerprinter(table_filepath=table_filepath)
+    assert fingerprinter.get_directory_fingerprint(data_dir) == fingerprint
+    assert fingerprinter.stats.num_files_hashed == 0
+
+
+def test_file_fingerprinter_chunked_hashing_does_not_depend_on_workers(tmpdir):
+    _write(tmpdir / 'a.csv', 'abcdefghij' * 100)
+    digests = {FileFingerprinter(chunk_size=64, max_workers=max_workers).get_file_digest(tmpdir / 'a.csv')
+               for max_workers in [1, 4]}
+    assert len(digests) == 1
+    assert digests != {FileFingerprinter().get_file_digest(tmpdir / 'a.csv')}
+
+
+def test_file_fingerprinter_does_not_hash_registered_copies(tmpdir):
+    _write(tmpdir / 'a.csv', 'a' * 100)
+    tmpdir.mkdir('copy')
+    _write(tmpdir / 'copy' / 'a.csv', 'a' * 100)
+    fingerprinter = FileFingerprinter()
+    fingerprinter.register_copy(tmpdir / 'a.csv', tmpdir / 'copy' / 'a.csv')
+    assert fingerprinter.get_file_digest(tmpdir / 'copy' / 'a.csv') == fingerprinter.get_file_digest(tmpdir / 'a.csv')
+    assert fingerprinter.stats.num_files_hashed == 1
@@ -0,0 +1,64 @@
+import threading
+import traceback
+
+import pytest
+
+from data_to_paper.run_gpt_code.exceptions import FailedRunningCode
+from data_to_paper.run_gpt_code.user_script_name import is_called_from_user_script, is_called_from_data_to_paper, \
+    data_to_paper_internals, module_filename, IS_IN_INTERNALS
+
+
+def hook():
+    # like a run-context hook, called by the code it checks:
+    return is_called_from_user_script(offset=3), is_called_from_data_to_paper(offset=3)
+
+
+def _call_hook_from_file(filename: str):
+    namespace = {'hook': hook}
+    exec(compile('result = hook()', filename, 'exec'), namespace)
+    return namespace['result']
+
+
+def test_is_called_from_user_script():
+    assert _call_hook_from_file(module_filename) == (True, False)
+    assert _call_hook_from_file('/usr/lib/python3/json/decoder.py') == (False, False)
+
+
+def test_is_called_from_user_script_with_offset_beyond_the_stack():
+    assert is_called_from_user_script(offset=10_000) is False
+
+
+def test_data_to_paper_internals_are_not_checked():
+    with data_to_paper_internals():
+        assert _call_hook_from_file(module_filename) == (False, False)
+    assert _call_hook_from_file(module_filename) == (True, False)
+
+
+def test_data_to_paper_internals_flag_is_context_local():
+    results = []
+    with data_to_paper_internals():
+        thread = threading.Thread(target=lambda: results.append(_call_hook_from_file(module_filename)))
+        thread.start()
+        thread.join()
+    assert results == [(True, False)]
+
+
+@pytest.mark.parametrize('create_failure', [
+    FailedRunningCode.from_exception,
+    lambda e: FailedRunningCode.from_exception_with_py_spy(e, ('', '')),
+])
+def test_failures_extract_their_traceback_as_data_to_paper_internals(create_failure, monkeypatch):
+    is_in_internals = []
+    extract_tb = traceback.extract_tb
+
+    def recording_extract_tb(tb):
+        is_in_internals.append(IS_IN_INTERNALS.get())
+        return extract_tb(tb)
+
+    monkeypatch.setattr(traceback, 'extract_tb', recording_extract_tb)
+    try:
+        raise ValueError('error')
+    except ValueError as e:
+        failure = create_failure(e)
+    assert is_in_internals == [True]
+    assert failure.tb[-1].name == 'test_failures_extract_their_traceback_as_data_to_paper_internals'
@@ -0,0 +1,59 @@
+import copy
+import os
+import pickle
+
+from data_to_paper.servers.crossref import CrossrefCitation
+from data_to_paper.servers.custom_types import render_bib_file
+
+
+def _get_citation(title='Citation 1', first_author_family='Family'):
+    return CrossrefCitation(type='journal-article', title=title, first_author_family=first_author_family,
+                            journal='Journal 1', year='2020', volume='1')
+
+
+def test_citation_bibtex_is_rendered_once():
+    citation = _get_citation()
+    bibtex = citation.bibtex
+    assert citation.bibtex is bibtex
+    assert citation.bibtex_id == 'Family2020Citation'
+
+
+def test_citation_bibtex_is_re_rendered_upon_modification():
+    citation = _get_citation()
+    assert citation.bibtex_id == 'Family2020Citation'
+    citation['year'] = '2021'
+    assert citation.bibtex_id == 'Family2021Citation'
+    citation.update(title='Another title')
+    assert citation.bibtex_id == 'Family2021Another'
+    assert 'Another title' in citation.bibtex
+
+
+def test_citation_pretty_repr_is_cached_only_for_content_fields():
+    citation = _get_citation()
+    citation.search_rank = 1
+    assert citation.pretty_repr(fields=('title', )) is citation.pretty_repr(fields=('title', ))
+    assert 'Search rank: 1' in citation.pretty_repr(fields=('title', 'search_rank'))
+    citation.search_rank = 2
+    assert 'Search rank: 2' in citation.pretty_repr(fields=('title', 'search_rank'))
+
+
+def test_copied_and_unpickled_citations_are_rendered_correctly():
+    citation = _get_citation()
+    assert citation.bibtex_id == 'Family2020Citation'
+    copied_citation = copy.copy(citation)
+    copied_citation['year'] = '2022'
+    assert copied_citation.bibtex_id == 'Family2022Citation'
+    assert citation.bibtex_id == 'Family2020Citation'
+    unpickled_citation = pickle.loads(pickle.dumps(citation))
+    assert unpickled_citation.bibtex_id == 'Family2020Citation'
+    assert unpickled_citation.search_rank == citation.search_rank
+
+
+def test_render_bib_file_writes_each_entry_once(tmpdir):
+    citations = [_get_citation(), _get_citation(), _get_citation(first_author_family='Other')]
+    file_path = os.path.join(tmpdir, 'citations.bib')
+    content = render_bib_file(citations, file_path)
+    assert content.count('@article{Family2020Citation,') == 1
+    assert content.count('@article{Other2020Citation,') == 1
+    with open(file_path) as f:
+        assert f.read() == content
@@ -0,0 +1,66 @@
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+from data_to_paper.servers.http_client import HttpClient, TokenBucketRateLimiter
+
+
+class RateLimitingHandler(BaseHTTPRequestHandler):
+    """
+    Respond with 429 to every other request.
+    """
+    num_requests = 0
+
+    def do_GET(self):
+        type(self).num_requests += 1
+        status = 429 if self.num_requests % 2 == 1 else 200
+        self.send_response(status)
+        self.send_header('Retry-After', '0')
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def stub_server_url():
+    RateLimitingHandler.num_requests = 0
+    server = ThreadingHTTPServer(('127.0.0.1', 0), RateLimitingHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_address[1]}'
+    server.shutdown()
+    server.server_close()
+
+
+def test_http_client_retries_on_rate_limit(stub_server_url):
+    client = HttpClient()
+    response = client.get(stub_server_url)
+    assert response.status_code == 200
+    assert RateLimitingHandler.num_requests == 2
+
+
+def test_http_client_returns_last_error_response_after_max_retries(stub_server_url):
+    client = HttpClient(max_retries=0)
+    assert client.get(stub_server_url).status_code == 429
+
+
+def test_token_bucket_rate_limiter_limits_rate():
+    rate_limiter = TokenBucketRateLimiter(rate=20., burst=2)
+    start = time.monotonic()
+    for _ in range(6):
+        rate_limiter.acquire()
+    # 2 requests are allowed at once, and the next 4 are spaced by 1/20 sec:
+    assert 4 / 20 - 0.02 < time.monotonic() - start < 1.
+
+
+def test_token_bucket_rate_limiter_without_rate_does_not_wait():
+    rate_limiter = TokenBucketRateLimiter(rate=None)
+    start = time.monotonic()
+    for _ in range(100):
+        rate_limiter.acquire()
+    assert time.monotonic() - start < 0.1
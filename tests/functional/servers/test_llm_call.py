@@ -0,0 +1,85 @@
+import openai
+import pytest
+import requests
+
+from data_to_paper.conversation import Message, Role
+from data_to_paper.env import LLM_MODELS_TO_API_KEYS_AND_BASE_URL, STREAM_LLM_RESPONSES, LLM_RESPONSE_TIMEOUT
+from data_to_paper.servers import llm_call
+from data_to_paper.servers.llm_call import OPENAI_SERVER_CALLER, LLMResponse, LLMResponseTimeoutError, \
+    get_streamed_content, iterate_llm_response_chunks
+from data_to_paper.servers.model_engine import ModelEngine
+
+
+class FakeStreamedResponse:
+    def __init__(self, chunks, on_chunk=None, exception_after_chunks=None):
+        self.chunks = chunks
+        self.on_chunk = on_chunk
+        self.exception_after_chunks = exception_after_chunks
+        self.num_chunks_sent = 0
+        self.is_closed = False
+
+    def __iter__(self):
+        for chunk in self.chunks:
+            if self.exception_after_chunks is not None and self.num_chunks_sent == self.exception_after_chunks:
+                raise requests.exceptions.ChunkedEncodingError('Connection broken')
+            if self.on_chunk is not None:
+                self.on_chunk()
+            self.num_chunks_sent += 1
+            yield {'choices': [{'delta': {'content': chunk}}]}
+
+    def close(self):
+        self.is_closed = True
+
+
+def test_iterate_llm_response_chunks_skips_empty_chunks():
+    response = [{'choices': []}, {'choices': [{'delta': {'role': 'assistant'}}]},
+                {'choices': [{'delta': {'content': 'Hello'}}]}, {'choices': [{'delta': {'content': ' world'}}]}]
+    assert list(iterate_llm_response_chunks(response)) == ['Hello', ' world']
+
+
+def test_get_streamed_content_stops_early():
+    response = FakeStreamedResponse(['a', 'b', 'STOP', 'c', 'd'])
+    content = get_streamed_content(response, stop_streaming_when=lambda text: 'STOP' in text)
+    assert content == 'abSTOP'
+    assert response.num_chunks_sent == 3
+    assert response.is_closed
+
+
+def test_get_streamed_content_raises_on_timeout():
+    response = FakeStreamedResponse(['a', 'b', 'c'])
+    with pytest.raises(LLMResponseTimeoutError):
+        get_streamed_content(response, deadline=0.)
+    assert response.is_closed
+
+
+def test_streamed_response_is_recorded_as_single_response(monkeypatch):
+    requests = []
+
+    def create(**kwargs):
+        requests.append(kwargs)
+        return FakeStreamedResponse(['Here is the code:\n```python\na = 2\n```\n', 'and the output:\n```', '\n2\n'])
+
+    monkeypatch.setattr(openai.ChatCompletion, 'create', create)
+    monkeypatch.setitem(LLM_MODELS_TO_API_KEYS_AND_BASE_URL, ModelEngine.GPT4o_MINI, ('key', 'url'))
+    with STREAM_LLM_RESPONSES.temporary_set(True), LLM_RESPONSE_TIMEOUT.temporary_set(10), \
+            OPENAI_SERVER_CALLER.mock(record_more_if_needed=True):
+        response = OPENAI_SERVER_CALLER.get_server_response(
+            [Message(Role.USER, 'Write code')], model_engine=ModelEngine.GPT4o_MINI,
+            stop_streaming_when=lambda text: text.count('```') > 2)
+        assert OPENAI_SERVER_CALLER.new_records == {'GENERAL': [response]}
+    assert requests[0]['stream'] is True
+    assert response == LLMResponse('Here is the code:\n```python\na = 2\n```\nand the output:\n```')
+
+
+def test_streamed_response_is_retried_when_dropped_mid_stream(monkeypatch):
+    responses = [FakeStreamedResponse(['Hello', ' world'], exception_after_chunks=1),
+                 FakeStreamedResponse(['Hello', ' world'])]
+    monkeypatch.setattr(openai.ChatCompletion, 'create', lambda **kwargs: responses.pop(0))
+    monkeypatch.setattr(llm_call.time, 'sleep', lambda seconds: None)
+    monkeypatch.setitem(LLM_MODELS_TO_API_KEYS_AND_BASE_URL, ModelEngine.GPT4o_MINI, ('key', 'url'))
+    with STREAM_LLM_RESPONSES.temporary_set(True), LLM_RESPONSE_TIMEOUT.temporary_set(10), \
+            OPENAI_SERVER_CALLER.mock(record_more_if_needed=True):
+        response = OPENAI_SERVER_CALLER.get_server_response(
+            [Message(Role.USER, 'Say hello')], model_engine=ModelEngine.GPT4o_MINI)
+    assert response == LLMResponse('Hello world')
+    assert not responses
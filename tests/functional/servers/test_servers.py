@@ -1,4 +1,5 @@
 import os
+import time
 
 from typing import Union
 
@@ -68,6 +69,31 @@ def test_ordered_key_server_mock_responses_raise_on_incorrect_key():
             mock.get_server_response('key2')
 
 
+def test_ordered_key_server_replay_by_key_allows_interleaved_keys():
+    server = TestOrderedKeyToListServerCaller()
+    server.replay_by_key = True
+    with server.mock(old_records={'key1': ['response1', 'response2'], 'key2': ['response3']},
+                     record_more_if_needed=False) as mock:
+        assert mock.get_server_response('key2') == 'response3'
+        assert mock.get_server_response('key1') == 'response1'
+        assert mock.are_more_records_available()
+        assert mock.get_server_response('key1') == 'response2'
+        assert not mock.are_more_records_available()
+        with pytest.raises(NoMoreResponsesToMockError):
+            mock.get_server_response('key2')
+
+
+def test_ordered_key_server_replay_by_key_records_more_per_key():
+    server = TestOrderedKeyToListServerCaller()
+    server.replay_by_key = True
+    with server.mock(old_records={'key1': ['response1'], 'key2': ['response2']},
+                     fail_if_not_all_responses_used=False) as mock:
+        assert mock.get_server_response('key1') == 'response1'
+        assert mock.get_server_response('key1', 'new_response') == 'new_response'
+        assert mock.get_server_response('key2') == 'response2'
+    assert server.new_records == {'key1': ['new_response']}
+
+
 def test_list_server_mock_exception_when_no_responses_left():
     server = TestListServerCaller()
     with server.mock(old_records=['response1'], record_more_if_needed=False) as mock:
@@ -173,3 +199,121 @@ def test_mock_server_saves_upon_error(tmpdir):
     new_server = TestListServerCaller()
     with new_server.mock_with_file(file_path=file_path) as mock:
         assert mock.get_server_response() == 'response1'
+
+
+def test_mock_server_appends_new_responses_to_journal(tmpdir):
+    server = TestOrderedKeyToListServerCaller()
+    file_path = os.path.join(tmpdir, 'responses.txt')
+    with server.mock_with_file(file_path=file_path) as mock:
+        assert mock.get_server_response('key1', 'response1') == 'response1'
+        assert mock.get_server_response('key2', 'response2') == 'response2'
+        assert not os.path.exists(file_path)
+        assert mock.journal.num_records == 2
+    assert os.path.exists(file_path)
+    assert not os.path.exists(mock.journal.file_path)
+
+
+def test_mock_server_recovers_responses_from_journal(tmpdir):
+    server = TestOrderedKeyToListServerCaller()
+    file_path = os.path.join(tmpdir, 'responses.txt')
+    with server.mock_with_file(file_path=file_path) as mock:
+        assert mock.get_server_response('key1', 'response1') == 'response1'
+
+    # simulate a crash while recording, after new responses were appended to the journal:
+    server = TestOrderedKeyToListServerCaller()
+    mock = server.mock_with_file(file_path=file_path).__enter__()
+    assert mock.get_server_response('key1') == 'response1'
+    assert mock.get_server_response('key1', 'response2') == 'response2'
+    with pytest.raises(ValueError):
+        mock.get_server_response('key2', ValueError('exception1'))
+
+    new_server = TestOrderedKeyToListServerCaller()
+    with new_server.mock_with_file(file_path=file_path, record_more_if_needed=False) as mock:
+        assert mock.get_server_response('key1') == 'response1'
+        assert mock.get_server_response('key1') == 'response2'
+        with pytest.raises(ValueError) as e:
+            mock.get_server_response('key2')
+        assert str(e.value) == 'exception1'
+
+
+def test_mock_server_ignores_stale_journal(tmpdir):
+    server = TestListServerCaller()
+    file_path = os.path.join(tmpdir, 'responses.txt')
+    mock = server.mock_with_file(file_path=file_path).__enter__()
+    assert mock.get_server_response('response1') == 'response1'
+    # simulate a crash after compacting the records, but before deleting the journal:
+    journal_content = mock.journal.file_path.read_text()
+    mock.save_records()
+    mock.journal.file_path.write_text(journal_content)
+
+    new_server = TestListServerCaller()
+    with new_server.mock_with_file(file_path=file_path, record_more_if_needed=False) as mock:
+        assert mock.get_server_response() == 'response1'
+        with pytest.raises(NoMoreResponsesToMockError):
+            mock.get_server_response()
+
+
+def test_mock_server_compacts_journal_periodically(tmpdir):
+    server = TestListServerCaller()
+    server.min_journal_records_before_compaction = 4
+    file_path = os.path.join(tmpdir, 'responses.txt')
+    with server.mock_with_file(file_path=file_path) as mock:
+        for i in range(3):
+            mock.get_server_response(f'response{i}')
+        assert not os.path.exists(file_path)
+        mock.get_server_response('response3')
+        assert os.path.exists(file_path)
+        assert mock.journal.num_records == 0 and mock.num_compacted_records == 4
+        # the journal is compacted again only once it is as large as the compacted records:
+        for i in range(4, 7):
+            mock.get_server_response(f'response{i}')
+        assert mock.journal.num_records == 3 and mock.num_compacted_records == 4
+        mock.get_server_response('response7')
+        assert mock.journal.num_records == 0 and mock.num_compacted_records == 8
+
+
+def test_dict_server_recovers_responses_from_journal(tmpdir):
+    server = TestParameterizedQueryServerCaller()
+    file_path = os.path.join(tmpdir, 'responses.bin')
+    mock = server.mock_with_file(file_path=file_path).__enter__()
+    assert mock.get_server_response('arg1') == 'arg1'
+
+    new_server = TestParameterizedQueryServerCaller()
+    with new_server.mock_with_file(file_path=file_path, record_more_if_needed=False) as mock:
+        assert mock.get_server_response('arg1') == 'arg1'
+
+
+class TestConcurrentParameterizedQueryServerCaller(ParameterizedQueryServerCaller):
+    @staticmethod
+    def _get_server_response(response: Union[str, Exception] = 'response', delay: float = 0.):
+        time.sleep(delay)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+
+def test_dict_server_get_server_responses_records_in_query_order():
+    server = TestConcurrentParameterizedQueryServerCaller()
+    # later queries respond first:
+    args_and_kwargs = [(('response1', ), {'delay': 0.2}), (('response2', ), {'delay': 0.1}), (('response3', ), {})]
+    with server.mock(old_records={convert_args_kwargs_to_tuple(('response2', ), {'delay': 0.1}): 'old_response2'},
+                     record_more_if_needed=True) as mock:
+        assert mock.get_server_responses(args_and_kwargs) == ['response1', 'old_response2', 'response3']
+        assert list(mock.new_records.keys()) == [convert_args_kwargs_to_tuple(*args_and_kwargs[0]),
+                                                 convert_args_kwargs_to_tuple(*args_and_kwargs[2])]
+
+
+def test_dict_server_get_server_responses_sends_repeated_queries_once():
+    server = TestConcurrentParameterizedQueryServerCaller()
+    with server.mock(record_more_if_needed=True) as mock:
+        assert mock.get_server_responses([(('a', ), {}), (('b', ), {}), (('a', ), {})]) == ['a', 'b', 'a']
+        assert len(mock.new_records) == 2
+
+
+def test_dict_server_get_server_responses_raises_first_exception_after_recording():
+    server = TestConcurrentParameterizedQueryServerCaller()
+    with server.mock(record_more_if_needed=True) as mock:
+        with pytest.raises(ValueError) as e:
+            mock.get_server_responses([(('a', ), {}), ((ValueError('first'), ), {}), ((KeyError('second'), ), {})])
+        assert str(e.value) == 'first'
+        assert len(mock.new_records) == 3
@@ -1,7 +1,7 @@
 import pytest
 import os
 
-from data_to_paper.run_gpt_code.code_runner import CodeRunner
+from data_to_paper.run_gpt_code.code_runner import CodeRunner, run_code_runners_in_parallel
 from data_to_paper.run_gpt_code.exceptions import CodeUsesForbiddenFunctions, FailedRunningCode
 from data_to_paper.run_gpt_code.code_utils import FailedExtractingBlock
 from data_to_paper.code_and_output_files.output_file_requirements import TextContentOutputFileRequirement, \
@@ -118,10 +118,28 @@ def test_runner_create_issue_on_print():
     assert 'print' in issues[0].issue
 
 
-@pytest.mark.skip("This test is not working with the threading implementation.")
 def test_runner_raise_code_timeout_exception():
     _, _, _, exception = \
         CodeRunner(response=code_runs_more_than_1_second,
                    timeout_sec=1,
                    ).run_code_in_separate_process()
     assert f"1 seconds" in str(exception.exception)
+
+
+def test_runners_run_in_parallel(tmpdir):
+    code_runners = []
+    for text in ['hello', 'world']:
+        run_folder = tmpdir.mkdir(text)
+        code_runners.append(CodeRunner(
+            response=valid_response.replace('"hello"', f'"{text}"'),
+            output_file_requirements=OutputFileRequirements([TextContentOutputFileRequirement('output.txt')]),
+            run_folder=run_folder,
+        ))
+    results = run_code_runners_in_parallel(code_runners)
+    assert [result[0].created_files.get_single_output() for result in results] == ['hello', 'world']
+
+
+def test_runners_run_in_parallel_require_distinct_run_folders(tmpdir):
+    code_runners = [CodeRunner(response=valid_response, run_folder=tmpdir) for _ in range(2)]
+    with pytest.raises(ValueError):
+        run_code_runners_in_parallel(code_runners)
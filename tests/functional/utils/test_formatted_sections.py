@@ -1,6 +1,6 @@
 import pytest
 
-from data_to_paper.utils.formatted_sections import FormattedSections
+from data_to_paper.utils.formatted_sections import FormattedSection, FormattedSections, is_second_block_started
 
 
 @pytest.mark.parametrize('text, labels, is_complete', [
@@ -29,3 +29,21 @@ def test_empty_formatted_sections():
     assert formatted_sections.to_text() == ''
     assert not formatted_sections.is_last_block_incomplete()
     assert len(formatted_sections) == 0
+
+
+@pytest.mark.parametrize('text, expected', [
+    ("Here is our code:\n```python\na = 2\n```\n", False),
+    ("Here is our code:\n```python\na = 2\n```\nand the output:\n```", False),
+    ("Here is our code:\n```python\na = 2\n```\nand the output:\n```\n2", True),
+    ("```python\na = 2\n```\n```python\nb = 3\n```", True),
+])
+def test_is_second_block_started(text, expected):
+    assert is_second_block_started(text) == expected
+
+
+def test_formatted_sections_from_text_returns_new_sections():
+    text = "Here is our code:\n```python\na = 2\n```\n"
+    formatted_sections = FormattedSections.from_text(text)
+    formatted_sections[1].section = 'changed'
+    formatted_sections.append(FormattedSection(None, 'more'))
+    assert FormattedSections.from_text(text).to_text() == text
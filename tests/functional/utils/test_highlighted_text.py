@@ -0,0 +1,43 @@
+import colorama
+import pytest
+
+from data_to_paper.utils import highlighted_text
+from data_to_paper.utils.highlighted_text import format_text_with_code_blocks, RenderCache
+
+TEXT = 'Here is the code:\n```python\na = 1\nprint(a)\n```\nand its **output**:\n```output\n1\n```\n'
+
+
+@pytest.fixture()
+def render_cache(monkeypatch):
+    render_cache = RenderCache()
+    monkeypatch.setattr(highlighted_text, 'RENDER_CACHE', render_cache)
+    return render_cache
+
+
+@pytest.mark.parametrize('is_html', [True, False])
+def test_format_text_with_code_blocks_is_cached(render_cache, is_html):
+    first = format_text_with_code_blocks(TEXT, is_html=is_html, text_color=colorama.Fore.GREEN)
+    assert render_cache.num_hits == 0
+    second = format_text_with_code_blocks(TEXT, is_html=is_html, text_color=colorama.Fore.GREEN)
+    assert second == first
+    assert render_cache.num_hits == render_cache.num_misses == 5
+    assert render_cache.hit_rate == 0.5
+    assert 'Render cache: 50% hits (5 of 10)' in render_cache.get_stats()
+
+
+def test_format_text_with_code_blocks_cache_is_keyed_by_format(render_cache):
+    html = format_text_with_code_blocks(TEXT, is_html=True)
+    text = format_text_with_code_blocks(TEXT, is_html=False)
+    colored_text = format_text_with_code_blocks(TEXT, is_html=False, text_color=colorama.Fore.GREEN)
+    narrow_text = format_text_with_code_blocks(TEXT, is_html=False, width=10)
+    assert len({html, text, colored_text, narrow_text}) == 4
+    assert render_cache.num_hits == 0
+
+
+def test_render_cache_is_bounded():
+    render_cache = RenderCache(max_size=2)
+    for key in ['a', 'b', 'c']:
+        render_cache.render((key, ), lambda: key.upper())
+    assert ('a', ) not in render_cache
+    assert ('c', ) in render_cache
+    assert render_cache.render(('c', ), lambda: 'not used') == 'C'
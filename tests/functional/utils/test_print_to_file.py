@@ -0,0 +1,113 @@
+import threading
+import time
+
+import colorama
+import pytest
+
+from data_to_paper.env import CONSOLE_LOG_WRITE_MODE
+from data_to_paper.utils.print_to_file import print_and_log, console_log_file_context, flush_console_log, \
+    get_bw_file_path, ConsoleLogWriter, CONSOLE_LOG_FILE
+
+
+def _print_lines(num_lines: int = 100):
+    for i in range(num_lines):
+        print_and_log(f'line {i}', color=colorama.Fore.RED if i % 2 else None)
+    print_and_log('no newline', end='')
+    print_and_log(' two newlines', end='\n\n')
+    print_and_log('not logged', should_log=False)
+    print_and_log('not printed', should_print=False)
+
+
+EXPECTED_BW_LOG = ''.join(f'line {i}\n' for i in range(100)) + 'no newline two newlines\n\nnot printed\n'
+
+
+@pytest.mark.parametrize('mode', ['sync', 'async'])
+def test_console_log_file_context(tmp_path, mode, capsys):
+    file_path = tmp_path / 'console_log.txt'
+    with CONSOLE_LOG_WRITE_MODE.temporary_set(mode), console_log_file_context(file_path):
+        _print_lines()
+        flush_console_log()
+        assert get_bw_file_path(file_path).read_text(encoding='utf-8') == EXPECTED_BW_LOG
+    printed = capsys.readouterr().out
+    assert 'not logged' in printed
+    assert 'not printed' not in printed
+    assert CONSOLE_LOG_FILE.val is None
+    assert colorama.Fore.RED + 'line 1' in file_path.read_text(encoding='utf-8')
+    assert (tmp_path / 'console_log.html').exists()
+
+
+def test_console_log_file_context_writes_the_log_upon_exception(tmp_path):
+    file_path = tmp_path / 'console_log.txt'
+    with pytest.raises(ValueError), CONSOLE_LOG_WRITE_MODE.temporary_set('async'), \
+            console_log_file_context(file_path):
+        _print_lines()
+        raise ValueError()
+    assert get_bw_file_path(file_path).read_text(encoding='utf-8') == EXPECTED_BW_LOG
+    assert not (tmp_path / 'console_log.html').exists()
+
+
+def test_console_log_writer_queue_is_bounded(tmp_path):
+    file_path = tmp_path / 'console_log.txt'
+    writer = ConsoleLogWriter(file_path, mode='async', max_queued_lines=10)
+    with writer._files_lock:  # stalls the background writing
+        thread = threading.Thread(target=lambda: [writer.write(f'{i}\n', f'{i}\n') for i in range(100)])
+        thread.start()
+        time.sleep(0.2)
+        # the first line is being written, and 10 lines are waiting:
+        assert thread.is_alive()
+        assert writer._queue.full()
+    thread.join()
+    writer.close()
+    assert get_bw_file_path(file_path).read_text(encoding='utf-8') == ''.join(f'{i}\n' for i in range(100))
+
+
+def test_console_log_writer_appends_after_close(tmp_path):
+    file_path = tmp_path / 'console_log.txt'
+    writer = ConsoleLogWriter(file_path, mode='async')
+    writer.write('a\n', 'a\n')
+    writer.close()
+    writer.write('b\n', 'b\n')
+    assert file_path.read_text(encoding='utf-8') == 'a\nb\n'
+
+
+class FailingFile:
+    """
+    A file whose writes of lines starting with 'bad' fail.
+    """
+
+    def __init__(self, file):
+        self.file = file
+        self.name = file.name
+
+    def write(self, text):
+        if text.startswith('bad'):
+            raise OSError('No space left on device')
+        return self.file.write(text)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+@pytest.mark.parametrize('mode', ['sync', 'async'])
+def test_console_log_writer_recovers_from_write_errors(tmp_path, mode, capsys):
+    file_path = tmp_path / 'console_log.txt'
+    writer = ConsoleLogWriter(file_path, mode=mode, max_queued_lines=5)
+    writer._files[1] = FailingFile(writer._files[1])
+    lines = [f'bad {i}\n' if i % 10 == 3 else f'good {i}\n' for i in range(50)]
+
+    def write_and_close():
+        for line in lines:
+            writer.write(line, line)
+        writer.close()
+
+    thread = threading.Thread(target=write_and_close, daemon=True)
+    thread.start()
+    thread.join(timeout=10)
+    assert not thread.is_alive()
+    assert file_path.read_text(encoding='utf-8') == ''.join(lines)
+    # the lines that failed are appended to the file directly:
+    assert sorted(get_bw_file_path(file_path).read_text(encoding='utf-8').splitlines(keepends=True)) == sorted(lines)
+    assert 'No space left on device' in capsys.readouterr().err